@@ -0,0 +1,188 @@
+import asyncio
+import re
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+from telegram.ext import ContextTypes, JobQueue
+
+from app.stock_analyzer import StockNewsAnalyzer
+from utils.executor import BlockingExecutor
+from utils.lazy_import import lazy_import
+from utils.rate_limiter import PRIORITY_BACKGROUND
+from utils.send_queue import SendQueue
+from utils.watchlist_store import WatchlistStore
+
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+
+# ידיעות חדשות נבדקות לפי זמן התפוגה של החדשות במטמון - בדיקה תכופה יותר לא תביא כלום חדש
+NEWS_CHECK_INTERVAL = 10 * 60
+MAX_NEWS_PER_ALERT = 3
+# מספר הסימולים בבקשת מחירים מרוכזת אחת ל-Yahoo
+QUOTE_BATCH = 20
+
+# /watch בלי תנאים: ידיעות חדשות ותנועה יומית של 5%
+DEFAULT_CONDITIONS = [("news", 0.0), ("move", 5.0)]
+_CONDITION_RE = re.compile(r"^(?:(?P<op>[<>])\$?(?P<price>\d+(?:\.\d+)?)|(?P<move>\d+(?:\.\d+)?)%)$")
+NEWS_WORDS = {"news", "חדשות"}
+
+
+def parse_watch_args(args: List[str]) -> Tuple[str, List[Tuple[str, float]]]:
+    """
+    פירוק הארגומנטים של /watch לשם המניה ולתנאים: ">200", "<150", "5%", "news"
+    """
+    name_parts, conditions = [], []
+    for arg in args:
+        match = _CONDITION_RE.match(arg)
+        if arg.lower() in NEWS_WORDS:
+            conditions.append(("news", 0.0))
+        elif match and match["op"]:
+            conditions.append(("above" if match["op"] == ">" else "below", float(match["price"])))
+        elif match:
+            conditions.append(("move", float(match["move"])))
+        else:
+            name_parts.append(arg)
+    return " ".join(name_parts), conditions or list(DEFAULT_CONDITIONS)
+
+
+def describe_condition(kind: str, threshold: float) -> str:
+    if kind == "above":
+        return f"מחיר מעל ${threshold:,.2f}"
+    if kind == "below":
+        return f"מחיר מתחת ל-${threshold:,.2f}"
+    if kind == "move":
+        return f"תנועה יומית של {threshold:g}%"
+    return "ידיעות חדשות"
+
+
+def _price_alert_text(ticker: str, kind: str, threshold: float, price: float, change: float) -> str:
+    if kind == "above":
+        return f"🔔 {ticker} עלתה מעל ${threshold:,.2f} (כעת ${price:,.2f})"
+    if kind == "below":
+        return f"🔔 {ticker} ירדה מתחת ל-${threshold:,.2f} (כעת ${price:,.2f})"
+    return f"🔔 {ticker} זזה {change:+.2f}% היום (סף {threshold:g}%, כעת ${price:,.2f})"
+
+
+class AlertEngine:
+    def __init__(self, analyzer: StockNewsAnalyzer, store: WatchlistStore, outbox: SendQueue,
+                 interval: float = 60.0, news_interval: float = NEWS_CHECK_INTERVAL,
+                 executor: Optional[BlockingExecutor] = None):
+        """
+        בדיקה תקופתית של כל ההתראות: כל מניה מובאת פעם אחת בכל סבב (בבקשה מרוכזת),
+        כל התנאים נבדקים יחד, ונשלחים רק מעברים מ"לא התקיים" ל"התקיים".
+        הגישה ל-SQLite של רשימות המעקב עוברת ב-executor, מחוץ ל-event loop
+        """
+        self.analyzer = analyzer
+        self.store = store
+        self.executor = executor or BlockingExecutor()
+        self.outbox = outbox
+        self.interval = interval
+        self.news_interval = news_interval
+        self._last_news_check = 0.0
+        self.ticks = 0
+        self.tickers_checked = 0
+        self.alerts_sent = 0
+        self.last_tick_seconds = 0.0
+
+    def evaluate(self, subscriptions: "pd.DataFrame", quotes: Dict[str, Dict]):
+        """
+        בדיקה וקטורית של התראות המחיר מול המחירים העדכניים.
+        מחזיר (התראות שהתקיימו עכשיו, מזהי התראות שחזרו למצב רגיל)
+        """
+        market = pd.DataFrame.from_dict(quotes, orient="index")
+        market = market.reindex(columns=["current_price", "percent_change"]).astype(float)
+        tickers = subscriptions["ticker"]
+        price = market["current_price"].reindex(tickers).to_numpy(dtype=float)
+        change = market["percent_change"].reindex(tickers).to_numpy(dtype=float)
+        kind = subscriptions["kind"].to_numpy()
+        threshold = subscriptions["threshold"].to_numpy(dtype=float)
+        triggered = subscriptions["triggered"].to_numpy(dtype=bool)
+
+        hit = np.select(
+            [kind == "above", kind == "below", kind == "move"],
+            [price >= threshold, price <= threshold, np.abs(change) >= threshold],
+            default=False
+        )
+        known = np.where(kind == "move", ~np.isnan(change), ~np.isnan(price))
+        fire = known & hit & ~triggered
+        fired = subscriptions[fire].assign(price=price[fire], change=change[fire])
+        rearmed = subscriptions["id"][known & ~hit & triggered]
+        return fired, rearmed
+
+    async def _send_chat(self, chat_id: int, lines: List[str]) -> None:
+        try:
+            await self.outbox.send(chat_id, "\n".join(lines), priority=PRIORITY_BACKGROUND)
+            self.alerts_sent += len(lines)
+        except Exception as e:
+            print(f"שגיאה בשליחת התראה ל-{chat_id}: {e}")
+
+    async def _send(self, messages: Dict[int, List[str]]) -> None:
+        """
+        כל הצ'אטים במקביל - תור השליחה אחראי על הקצב
+        """
+        await asyncio.gather(*(self._send_chat(chat_id, lines) for chat_id, lines in messages.items()))
+
+    async def _check_prices(self, subscriptions: "pd.DataFrame", messages: Dict[int, List[str]]) -> None:
+        if subscriptions.empty:
+            return
+        tickers = subscriptions["ticker"].unique().tolist()
+        quotes = {}
+        for start in range(0, len(tickers), QUOTE_BATCH):
+            quotes.update(await self.analyzer.get_stock_quotes(tickers[start:start + QUOTE_BATCH]))
+        self.tickers_checked += len(tickers)
+        fired, rearmed = self.evaluate(subscriptions, quotes)
+
+        for row in fired.itertuples(index=False):
+            messages[int(row.chat_id)].append(_price_alert_text(row.ticker, row.kind, row.threshold, row.price, row.change))
+        await self.executor.run("watchlist", self.store.set_triggered, fired["id"], True)
+        await self.executor.run("watchlist", self.store.set_triggered, rearmed, False)
+
+    async def _check_news(self, subscriptions: "pd.DataFrame", messages: Dict[int, List[str]]) -> None:
+        if subscriptions.empty or time.monotonic() - self._last_news_check < self.news_interval:
+            return
+        self._last_news_check = time.monotonic()
+        for ticker, chat_ids in subscriptions.groupby("ticker")["chat_id"]:
+            items = await self.analyzer.fetch_news(ticker, priority=PRIORITY_BACKGROUND)
+            published = [item["time"] for item in items if item.get("time")]
+            if not published:
+                continue
+            cursor = await self.executor.run("watchlist", self.store.news_cursor, ticker)
+            await self.executor.run("watchlist", self.store.set_news_cursor, ticker, max(published))
+            if cursor is None:
+                continue  # סבב ראשון למניה - רק מסמנים מאיפה מתחילים
+            fresh = sorted((item for item in items if item.get("time", "") > cursor),
+                           key=lambda item: item["time"], reverse=True)[:MAX_NEWS_PER_ALERT]
+            for item in fresh:
+                for chat_id in chat_ids.unique():
+                    messages[int(chat_id)].append(f"📰 {ticker}: {item['title']}\n{item['url']}")
+
+    async def tick(self, context: ContextTypes.DEFAULT_TYPE) -> None:
+        """
+        סבב בדיקה אחד (משימת רקע)
+        """
+        started = time.perf_counter()
+        subscriptions = await self.executor.run("watchlist", self.store.subscriptions)
+        if subscriptions.empty:
+            return
+        messages: Dict[int, List[str]] = defaultdict(list)
+        is_news = subscriptions["kind"] == "news"
+        try:
+            await self._check_prices(subscriptions[~is_news], messages)
+            await self._check_news(subscriptions[is_news], messages)
+        except Exception as e:
+            print(f"שגיאה בבדיקת ההתראות: {e}")
+        await self._send(messages)
+        self.ticks += 1
+        self.last_tick_seconds = time.perf_counter() - started
+
+    def register(self, job_queue: JobQueue) -> None:
+        job_queue.run_repeating(self.tick, interval=self.interval, first=self.interval, name="alerts")
+
+    def stats(self) -> Dict:
+        return {
+            "ticks": self.ticks,
+            "tickers_checked": self.tickers_checked,
+            "alerts_sent": self.alerts_sent,
+            "last_tick_seconds": self.last_tick_seconds
+        }
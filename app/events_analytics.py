@@ -0,0 +1,243 @@
+from datetime import date
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+MONTHS_HE = np.array([
+    "", "ינואר", "פברואר", "מרץ", "אפריל", "מאי", "יוני",
+    "יולי", "אוגוסט", "ספטמבר", "אוקטובר", "נובמבר", "דצמבר"
+], dtype=object)
+
+# שעה (שעון הבורסה) שממנה דוח נחשב כמפורסם אחרי סגירת המסחר
+AFTER_CLOSE_HOUR = 16
+
+
+def _naive_index(index) -> pd.DatetimeIndex:
+    """
+    DatetimeIndex ללא אזור זמן (שומר על השעה המקומית של הבורסה)
+    """
+    if not isinstance(index, pd.DatetimeIndex):
+        index = pd.DatetimeIndex(pd.to_datetime(index))
+    return index.tz_localize(None) if index.tz is not None else index
+
+
+def format_dates(dates) -> List[str]:
+    """
+    פורמט תאריכים בעברית ("5 במרץ 2024") לכל הסדרה בבת אחת
+    """
+    values = pd.Series(dates)
+    if pd.api.types.is_numeric_dtype(values):
+        values = pd.to_datetime(values, unit="s", errors="coerce")  # timestamps של yfinance (info)
+    else:
+        values = pd.to_datetime(values, errors="coerce")
+    result = pd.Series("לא ידוע", index=values.index, dtype=object)
+    valid = values.notna()
+    if valid.any():
+        days = values[valid]
+        result[valid] = (days.dt.day.astype(str) + " ב" + MONTHS_HE[days.dt.month.to_numpy()]
+                         + " " + days.dt.year.astype(str))
+    return result.tolist()
+
+
+def format_date(value) -> str:
+    if value is None or pd.isnull(value):
+        return "לא ידוע"
+    return format_dates([value])[0]
+
+
+def next_earnings_date(earnings_dates, today: Optional[date] = None) -> Optional[date]:
+    """
+    תאריך ה-earnings הקרוב - תאריכים שכבר עברו (למשל מנתונים ישנים במטמון) לא נחשבים
+    """
+    dates = pd.to_datetime(pd.Series(earnings_dates, dtype=object), errors="coerce").dropna()
+    if dates.empty:
+        return None
+    if dates.dt.tz is not None:
+        dates = dates.dt.tz_localize(None)
+    days = dates.dt.date
+    days = days[days >= (today or date.today())]
+    return days.min() if not days.empty else None
+
+
+def format_values(values: pd.Series, template: str = "{}", missing: str = "N/A") -> pd.Series:
+    """
+    פורמט ערכים מספריים לטקסט, עם missing לערכים חסרים
+    """
+    return values.map(lambda value: template.format(value) if pd.notna(value) else missing).astype(object)
+
+
+def _stack(series_by_ticker: Dict[str, pd.Series]):
+    """
+    איחוד סדרות של כמה מניות למערכים שטוחים: (קוד מניה, תאריך, ערך)
+    """
+    tickers = [ticker for ticker, series in series_by_ticker.items() if series is not None and len(series)]
+    if not tickers:
+        return tickers, np.empty(0, dtype=np.int64), pd.DatetimeIndex([]), np.empty(0)
+    series = [series_by_ticker[ticker] for ticker in tickers]
+    codes = np.repeat(np.arange(len(tickers)), [len(s) for s in series])
+    dates = pd.DatetimeIndex(np.concatenate([_naive_index(s.index).to_numpy() for s in series]))
+    values = np.concatenate([s.to_numpy(dtype=float) for s in series])
+    return tickers, codes, dates, values
+
+
+def _trailing_run(flags: np.ndarray) -> np.ndarray:
+    """
+    אורך הרצף האחרון של True בכל שורה (מהעמודה האחרונה אחורה)
+    """
+    if flags.shape[1] == 0:
+        return np.zeros(flags.shape[0], dtype=int)
+    return np.cumprod(flags[:, ::-1], axis=1).sum(axis=1)
+
+
+def _cagr(first: np.ndarray, last: np.ndarray, years: np.ndarray) -> np.ndarray:
+    with np.errstate(divide="ignore", invalid="ignore"):
+        valid = (first > 0) & (last > 0) & (years > 0)
+        return np.where(valid, (last / np.where(first > 0, first, 1)) ** (1 / np.where(years > 0, years, 1)) - 1,
+                        np.nan)
+
+
+def dividend_table(dividends: Dict[str, pd.Series], through_year: Optional[int] = None) -> pd.DataFrame:
+    """
+    מדדי דיבידנד לכל המניות יחד, לפי סכום שנתי עד through_year (ברירת מחדל: השנה המלאה האחרונה):
+    שנות חלוקה, רצף שנות חלוקה, רצף שנות העלאה, CAGR על כל ההיסטוריה ועל 5 שנים
+    """
+    columns = ["years_paid", "payout_streak", "increase_streak", "cagr", "cagr_5y", "last_annual"]
+    tickers, codes, dates, values = _stack(dividends)
+    if not tickers:
+        return pd.DataFrame(columns=columns, dtype=float)
+
+    through_year = through_year or date.today().year - 1
+    years = dates.year.to_numpy()
+    keep = years <= through_year
+    annual = (pd.Series(values[keep]).groupby([codes[keep], years[keep]]).sum()
+              .unstack(fill_value=0.0)
+              .reindex(index=range(len(tickers)), fill_value=0.0))
+    if annual.shape[1]:
+        annual = annual.reindex(columns=range(annual.columns.min(), through_year + 1), fill_value=0.0)
+    matrix = annual.to_numpy()
+    n_years = matrix.shape[1]
+
+    paid = matrix > 0
+    has_paid = paid.any(axis=1)
+    first_year = np.argmax(paid, axis=1)
+    last = matrix[:, -1] if n_years else np.zeros(len(tickers))
+    first = matrix[np.arange(len(tickers)), first_year] if n_years else np.zeros(len(tickers))
+    five_back = matrix[:, -6] if n_years >= 6 else np.full(len(tickers), np.nan)
+
+    increases = (matrix[:, 1:] > matrix[:, :-1]) & paid[:, :-1]
+    table = pd.DataFrame({
+        "years_paid": paid.sum(axis=1),
+        "payout_streak": _trailing_run(paid),
+        "increase_streak": _trailing_run(increases),
+        "cagr": np.where(has_paid, _cagr(first, last, n_years - 1 - first_year), np.nan),
+        "cagr_5y": _cagr(five_back, last, np.full(len(tickers), 5)),
+        "last_annual": last
+    }, index=pd.Index(tickers, name="ticker"))
+    return table
+
+
+def dividend_aristocrats(table: pd.DataFrame, min_streak: int = 25) -> pd.DataFrame:
+    """
+    מניות עם לפחות min_streak שנים רצופות של העלאת דיבידנד
+    """
+    selected = table[table["increase_streak"] >= min_streak]
+    return selected.sort_values(["increase_streak", "cagr"], ascending=False)
+
+
+def _reported(earnings_dates: pd.DataFrame) -> pd.DataFrame:
+    if earnings_dates is None or earnings_dates.empty or "Reported EPS" not in earnings_dates:
+        return pd.DataFrame(columns=["EPS Estimate", "Reported EPS", "Surprise(%)"])
+    return earnings_dates[earnings_dates["Reported EPS"].notna()]
+
+
+def _reactions(report_dates: pd.DatetimeIndex, report_codes: np.ndarray,
+               closes: Dict[str, pd.Series], tickers: List[str]) -> np.ndarray:
+    """
+    תגובת המחיר לכל דוח: סגירה אחרונה לפני הדוח מול הסגירה שאחריה.
+    כל המניות מחושבות ב-searchsorted אחד על מפתח (קוד מניה, יום).
+    """
+    reactions = np.full(len(report_dates), np.nan)
+    price_tickers, price_codes, price_dates, prices = _stack({t: closes.get(t) for t in tickers})
+    if not price_tickers or not len(report_dates):
+        return reactions
+
+    # קודי המחירים לפי סדר tickers
+    positions = {ticker: code for code, ticker in enumerate(tickers)}
+    remap = np.array([positions[t] for t in price_tickers])
+    price_codes = remap[price_codes]
+    span = np.int64(10 ** 6)
+    price_keys = price_codes * span + price_dates.normalize().to_numpy().astype("datetime64[D]").astype(np.int64)
+    order = np.argsort(price_keys, kind="stable")
+    price_keys, price_codes, prices = price_keys[order], price_codes[order], prices[order]
+
+    report_days = report_dates.normalize().to_numpy().astype("datetime64[D]").astype(np.int64)
+    after_close = report_dates.hour >= AFTER_CLOSE_HOUR
+    report_keys = report_codes * span + report_days
+    # דוח אחרי הסגירה: הסגירה של אותו יום היא ה"לפני"
+    before = np.searchsorted(price_keys, report_keys, side="left") - 1
+    before = np.where(after_close, np.searchsorted(price_keys, report_keys, side="right") - 1, before)
+    after = before + 1
+
+    valid = (before >= 0) & (after < len(price_keys))
+    valid[valid] = ((price_codes[before[valid]] == report_codes[valid])
+                    & (price_codes[after[valid]] == report_codes[valid]))
+    reactions[valid] = prices[after[valid]] / prices[before[valid]] - 1
+    return reactions
+
+
+def earnings_history(earnings_dates: pd.DataFrame, closes: Optional[pd.Series] = None) -> pd.DataFrame:
+    """
+    כל הדוחות שפורסמו (מהחדש לישן) עם הפתעה ותגובת מחיר
+    """
+    reported = _reported(earnings_dates).sort_index(ascending=False)
+    history = pd.DataFrame({
+        "estimate": reported["EPS Estimate"].to_numpy(dtype=float),
+        "actual": reported["Reported EPS"].to_numpy(dtype=float),
+        "surprise": reported["Surprise(%)"].to_numpy(dtype=float)
+    }, index=reported.index)
+    dates = _naive_index(reported.index)
+    history["reaction"] = _reactions(dates, np.zeros(len(dates), dtype=np.int64),
+                                     {"_": closes} if closes is not None else {}, ["_"])
+    return history
+
+
+def earnings_table(earnings: Dict[str, pd.DataFrame], closes: Optional[Dict[str, pd.Series]] = None) -> pd.DataFrame:
+    """
+    מדדי earnings לכל המניות יחד: מספר דוחות, שיעור עקיפה/החטאה, הפתעה ממוצעת ותגובת מחיר ממוצעת
+    """
+    columns = ["reports", "beat_rate", "miss_rate", "avg_surprise", "avg_reaction", "avg_abs_reaction"]
+    frames = {ticker: _reported(frame) for ticker, frame in earnings.items()}
+    frames = {ticker: frame for ticker, frame in frames.items() if not frame.empty}
+    if not frames:
+        return pd.DataFrame(columns=columns, dtype=float)
+
+    tickers = list(frames)
+    combined = pd.concat(frames.values(), ignore_index=True)
+    codes = np.repeat(np.arange(len(tickers)), [len(frame) for frame in frames.values()])
+    dates = pd.DatetimeIndex(np.concatenate([_naive_index(frame.index).to_numpy() for frame in frames.values()]))
+
+    estimate = combined["EPS Estimate"].to_numpy(dtype=float)
+    actual = combined["Reported EPS"].to_numpy(dtype=float)
+    has_estimate = ~np.isnan(estimate)
+    reaction = _reactions(dates, codes, closes or {}, tickers)
+
+    metrics = pd.DataFrame({
+        "code": codes,
+        "beat": np.where(has_estimate, actual > estimate, np.nan),
+        "miss": np.where(has_estimate, actual < estimate, np.nan),
+        "surprise": combined["Surprise(%)"].to_numpy(dtype=float),
+        "reaction": reaction,
+        "abs_reaction": np.abs(reaction)
+    })
+    grouped = metrics.groupby("code")
+    table = pd.DataFrame({
+        "reports": grouped.size(),
+        "beat_rate": grouped["beat"].mean(),
+        "miss_rate": grouped["miss"].mean(),
+        "avg_surprise": grouped["surprise"].mean(),
+        "avg_reaction": grouped["reaction"].mean(),
+        "avg_abs_reaction": grouped["abs_reaction"].mean()
+    })
+    table.index = pd.Index(tickers, name="ticker")
+    return table
@@ -1,33 +1,57 @@
-import yfinance as yf
-import pandas as pd
+from typing import Dict, Optional
+
+from utils.executor import BlockingExecutor
+from utils.lazy_import import lazy_import
+from utils.market_cache import MarketDataCache
+
+pd = lazy_import("pandas")
+yf = lazy_import("yfinance")
+
 
 class InstitutionalHoldingsAnalyzer:
-    def __init__(self):
+    def __init__(self, executor: Optional[BlockingExecutor] = None, cache: Optional[MarketDataCache] = None):
         """
         אנלייזר למחזיקים מוסדיים
         """
-        self.last_update_cache = {}
+        self.executor = executor or BlockingExecutor()
+        self.cache = cache or MarketDataCache()
+
+    @staticmethod
+    def _load_holdings(ticker: str, quote_type: Optional[str]) -> Dict:
+        """
+        שליפת נתוני מחזיקים מ-yfinance (קריאה חוסמת)
+        """
+        stock = yf.Ticker(ticker)
+        if quote_type != 'EQUITY':
+            return {'top_holdings': stock.funds_data.top_holdings}
+        return {
+            'institutional_holders': stock.institutional_holders,
+            'major_holders': stock.major_holders
+        }
 
     async def get_institutional_holdings(self, ticker: str) -> str:
         """
         קבלת מידע על מחזיקים מוסדיים
         """
         try:
-            stock = yf.Ticker(ticker)
-            
             # קבלת מידע בסיסי על המניה
-            info = stock.info
+            info = await self.cache.get_or_fetch(
+                "info", ticker, lambda: self.executor.run("yahoo", lambda: yf.Ticker(ticker).info)
+            )
+            data = await self.cache.get_or_fetch(
+                "holdings", ticker, lambda: self.executor.run("yahoo", self._load_holdings, ticker, info.get('quoteType'))
+            )
             company_name = info.get('longName', ticker)
             if info.get('quoteType') != 'EQUITY':
                 response = [f"📊 Top 10 holdings for {company_name}:"]
-                for i, row in stock.funds_data.top_holdings.head(10).iterrows():
+                for i, row in data['top_holdings'].head(10).iterrows():
                     response.append(
                         f"• {row['Name']}\n"
                         f"  ├ אחוז מהתיק: {round(row['Holding Percent'] * 100, 2)}%\n"
                         f"  ├ סימבול: {i}")
             else:
-                institutional_holders = stock.institutional_holders
-                major_holders = stock.major_holders
+                institutional_holders = data['institutional_holders']
+                major_holders = data['major_holders']
 
                 if institutional_holders is None or institutional_holders.empty:
                     return f"לא נמצא מידע על מחזיקים מוסדיים עבור {company_name}"
@@ -36,13 +60,13 @@ class InstitutionalHoldingsAnalyzer:
                 if major_holders is not None and not major_holders.empty:
                     for index, row in major_holders.iterrows():
                         if 'institution' in index.lower():
-                            total_institutional = row[0]
+                            total_institutional = row.iloc[0]
                             break
 
                 response = [f"🏢 מחזיקים מוסדיים ב{company_name}:"]
 
                 if total_institutional:
-                    response.append(f"\nסך החזקות מוסדיות: {major_holders.Value[1]}")
+                    response.append(f"\nסך החזקות מוסדיות: {major_holders['Value'].iloc[1]}")
 
                 institutional_holders = institutional_holders.sort_values(
                     by='Value',
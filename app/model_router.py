@@ -0,0 +1,65 @@
+import os
+import re
+import time
+from collections import Counter
+from typing import Dict, List, Optional
+
+# שאלות שדורשות ניתוח מעמיק (השוואה, הערכת שווי, תחזית, סיכונים) הולכות למודל החזק
+COMPLEX_PATTERN = re.compile(
+    r"השוו|לעומת|הערכת שווי|שווי הוגן|תחזית|תרחיש|סיכונ|אסטרטגי|מעמיק|לטווח ארוך|מכפיל|דוחות כספיים|"
+    r"\b(?:compare|versus|vs|valuation|dcf|forecast|outlook|scenario|risks?|strategy|in[- ]depth|long[- ]term)\b",
+    re.IGNORECASE
+)
+COMPLEX_QUESTION_CHARS = 160
+COMPLEX_PROMPT_TOKENS = 3000
+
+# כמה זמן (בשניות) לא שולחים למודל שהחזיר 429, אם השירות לא ציין Retry-After
+RATE_LIMIT_COOLDOWN = 30.0
+
+
+class ModelRouter:
+    def __init__(self, fast_model: Optional[str] = None, strong_model: Optional[str] = None):
+        """
+        בחירת ה-deployment לכל שאלה: שאלות פשוטות למודל המהיר והזול, שאלות מורכבות ל-GPT-4.
+        deployment שהחזיר 429 מדולג עד שיתפנה, והשני משמש כגיבוי.
+        """
+        self.fast_model = fast_model or os.getenv("AZURE_OPENAI_FAST_DEPLOYMENT", "gpt-4o-mini")
+        self.strong_model = strong_model or os.getenv("AZURE_OPENAI_DEPLOYMENT", "gpt-4")
+        self._cooldown_until: Dict[str, float] = {}
+        self.routed: Counter = Counter()
+        self.fallbacks: Counter = Counter()
+
+    def is_complex(self, question: str, tickers: List[str], input_tokens: int = 0) -> bool:
+        return (
+            len(tickers) > 1
+            or len(question) > COMPLEX_QUESTION_CHARS
+            or input_tokens > COMPLEX_PROMPT_TOKENS
+            or COMPLEX_PATTERN.search(question) is not None
+        )
+
+    def choose(self, question: str, tickers: List[str], input_tokens: int = 0) -> str:
+        model = self.strong_model if self.is_complex(question, tickers, input_tokens) else self.fast_model
+        self.routed[model] += 1
+        return model
+
+    def candidates(self, model: str) -> List[str]:
+        """
+        סדר הניסיונות לבקשה: המודל שנבחר ואז הגיבוי; מודל שבהשהיה אחרי 429 עובר לסוף
+        """
+        models = list(dict.fromkeys([model, self.strong_model if model == self.fast_model else self.fast_model]))
+        now = time.monotonic()
+        return sorted(models, key=lambda name: self._cooldown_until.get(name, 0.0) > now)
+
+    def cool_down(self, model: str, seconds: Optional[float] = None) -> None:
+        self._cooldown_until[model] = time.monotonic() + (seconds if seconds is not None else RATE_LIMIT_COOLDOWN)
+
+    def fell_back(self, from_model: str, to_model: str) -> None:
+        self.fallbacks[f"{from_model}->{to_model}"] += 1
+
+    def stats(self) -> Dict:
+        now = time.monotonic()
+        return {
+            "routed": dict(self.routed),
+            "fallbacks": dict(self.fallbacks),
+            "cooling_down": [model for model, until in self._cooldown_until.items() if until > now]
+        }
@@ -0,0 +1,146 @@
+import time
+from collections import Counter, deque
+from datetime import datetime, time as dt_time, timedelta
+from typing import Dict, Iterable, List, Optional
+from zoneinfo import ZoneInfo
+
+from telegram.ext import ContextTypes, JobQueue
+
+from app.stock_analyzer import StockNewsAnalyzer
+from app.stock_events_analyzer import StockEventsAnalyzer
+from utils.market_cache import MarketDataCache
+from utils.rate_limiter import PRIORITY_BACKGROUND
+
+MARKET_TIMEZONE = ZoneInfo("America/New_York")
+# חימום לפני פתיחת המסחר, ורענון אחרי הסגירה (דוחות שמתפרסמים אחרי המסחר)
+WARMUP_TIMES = (dt_time(8, 30, tzinfo=MARKET_TIMEZONE), dt_time(16, 30, tzinfo=MARKET_TIMEZONE))
+# תקרת הקריאות בדקה של משימות הרקע - לבוט כולו (במצב webhook מתחלקת בין ה-workers)
+DEFAULT_CALLS_PER_MINUTE = 20
+
+
+class PrefetchScheduler:
+    def __init__(self, analyzer: StockNewsAnalyzer, events_analyzer: StockEventsAnalyzer, cache: MarketDataCache,
+                 top_n: int = 10, news_top_n: int = 3, interval: float = 15.0,
+                 calls_per_minute: int = DEFAULT_CALLS_PER_MINUTE,
+                 decay_interval: float = 10 * 60, decay: float = 0.5):
+        """
+        רענון ברקע של המניות המבוקשות לפני שהנתונים שלהן פגים מהמטמון,
+        עם תקרה על מספר הקריאות לשירותים החיצוניים בדקה.
+        הפופולריות והמטמון בזיכרון הם של התהליך, ולכן במצב webhook כל worker מרענן את המניות של המשתמשים שלו
+        """
+        self.analyzer = analyzer
+        self.events_analyzer = events_analyzer
+        self.cache = cache
+        self.top_n = top_n
+        self.news_top_n = news_top_n
+        self.interval = interval
+        self.calls_per_minute = calls_per_minute
+        self.decay_interval = decay_interval
+        self.decay = decay
+        self.popularity: Counter = Counter()
+        self._calls: deque = deque()
+        self.refreshed = Counter()
+        self.skipped = 0
+
+    def record(self, tickers: Iterable[str]) -> None:
+        """
+        רישום בקשה של משתמש למניות
+        """
+        for ticker in tickers:
+            self.popularity[ticker.upper()] += 1
+
+    def hot_tickers(self, limit: Optional[int] = None) -> List[str]:
+        return [ticker for ticker, _ in self.popularity.most_common(limit or self.top_n)]
+
+    def _take_budget(self) -> bool:
+        """
+        חלון נע של דקה - משימות הרקע לא יכולות לנצל יותר מ-calls_per_minute קריאות
+        """
+        now = time.monotonic()
+        while self._calls and now - self._calls[0] >= 60:
+            self._calls.popleft()
+        if len(self._calls) >= self.calls_per_minute:
+            self.skipped += 1
+            return False
+        self._calls.append(now)
+        return True
+
+    def _expiring(self, kind: str, tickers: List[str]) -> List[str]:
+        """
+        מניות שהרשומה שלהן תפוג לפני הריצה הבאה (או שכבר אינה בזיכרון)
+        """
+        expiring = []
+        for ticker in tickers:
+            remaining = self.cache.expires_in(kind, ticker)
+            if remaining is None or remaining <= self.interval * 2:
+                expiring.append(ticker)
+        return expiring
+
+    async def refresh_hot(self, context: ContextTypes.DEFAULT_TYPE) -> None:
+        """
+        רענון מחירים וחדשות של המניות הפופולריות לפני תפוגה
+        """
+        quotes = self._expiring("quote", self.hot_tickers())
+        if quotes and self._take_budget():
+            # כל המחירים בבקשה מרוכזת אחת
+            await self.analyzer.get_stock_quotes(quotes, refresh=True)
+            self.refreshed["quote"] += len(quotes)
+
+        for ticker in self._expiring("news", self.hot_tickers(self.news_top_n)):
+            if not self._take_budget():
+                break
+            await self.analyzer.fetch_news(ticker, refresh=True, priority=PRIORITY_BACKGROUND)
+            self.refreshed["news"] += 1
+
+    async def warm_earnings(self, context: ContextTypes.DEFAULT_TYPE) -> None:
+        """
+        חימום נתוני earnings למניות הפופולריות ולמניות שהדוח שלהן קרוב
+        """
+        today = datetime.now(MARKET_TIMEZONE).date()
+        if today.weekday() >= 5:
+            return
+        upcoming = [
+            ticker for ticker, earnings_date in self.events_analyzer.next_earnings.items()
+            if today - timedelta(days=1) <= earnings_date <= today + timedelta(days=1)
+        ]
+        tickers = list(dict.fromkeys(upcoming + self.hot_tickers()))
+
+        for ticker in tickers:
+            if ticker not in upcoming and self.cache.expires_in("earnings", ticker):
+                continue
+            if not self._take_budget():
+                break
+            try:
+                await self.events_analyzer.prefetch_earnings(ticker)
+                self.refreshed["earnings"] += 1
+            except Exception as e:
+                print(f"שגיאה בחימום earnings עבור {ticker}: {e}")
+
+    async def decay_popularity(self, context: ContextTypes.DEFAULT_TYPE) -> None:
+        """
+        דעיכה של מוני הפופולריות כך שמניות שכבר לא מבוקשות יוצאות מהרשימה
+        """
+        self.popularity = Counter({
+            ticker: score * self.decay
+            for ticker, score in self.popularity.items()
+            if score * self.decay >= 0.5
+        })
+
+    def register(self, job_queue: JobQueue) -> None:
+        """
+        רישום המשימות ב-JobQueue של האפליקציה
+        """
+        job_queue.run_repeating(self.refresh_hot, interval=self.interval, first=self.interval, name="prefetch_hot")
+        job_queue.run_repeating(self.decay_popularity, interval=self.decay_interval, first=self.decay_interval,
+                                name="prefetch_decay")
+        for warmup_time in WARMUP_TIMES:
+            job_queue.run_daily(self.warm_earnings, time=warmup_time, name="prefetch_earnings")
+
+    def stats(self) -> Dict:
+        return {
+            "hot": self.hot_tickers(),
+            "refreshed": dict(self.refreshed),
+            "skipped": self.skipped,
+            "calls_per_minute": self.calls_per_minute
+        }
+
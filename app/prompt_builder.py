@@ -0,0 +1,156 @@
+import math
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from utils.cost_calculator import CostCalculator
+from utils.tracing import tracer
+
+# תקציב הטוקנים של הפרומפט (בלי system prompt); בשאלת השוואה התקציב מתחלק בין המניות
+PROMPT_TOKEN_BUDGET = 1200
+COMPARISON_TOKEN_BUDGET = 2400
+# אורך מקסימלי לתקציר של ידיעה אחת
+SUMMARY_TOKENS = 60
+MAX_NEWS_ITEMS = 8
+
+# משקלות הדירוג של ידיעות: רלוונטיות למניה, עוצמת הסנטימנט וטריות
+RELEVANCE_WEIGHT = 0.5
+SENTIMENT_WEIGHT = 0.2
+RECENCY_WEIGHT = 0.3
+NEWS_HALF_LIFE_HOURS = 24.0
+ALPHA_VANTAGE_TIME_FORMAT = "%Y%m%dT%H%M%S"
+
+QUESTION_TEMPLATE = 'בהתבסס על המידע הבא, אנא ענה על השאלה: "{question}"\n\n'
+COMPARISON_TEMPLATE = 'בהתבסס על המידע הבא על המניות {tickers}, אנא ענה על השאלה: "{question}"\n\n'
+ANSWER_INSTRUCTIONS = "\n\nאנא תן תשובה מקיפה בעברית שמסבירה את המצב בצורה ברורה."
+COMPARISON_INSTRUCTIONS = "\n\nאנא תן תשובה מקיפה בעברית שמשווה בין המניות ומסבירה את המצב של כל אחת בצורה ברורה."
+NEWS_HEADER = "\nחדשות אחרונות:\n"
+NEWS_UNAVAILABLE = "- החדשות אינן זמינות כרגע\n"
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+class BuiltPrompt(NamedTuple):
+    text: str
+    tokens: int
+
+
+def news_score(item: Dict, now: Optional[datetime] = None) -> float:
+    """
+    ציון ערך לידיעה לפי השדות של Alpha Vantage: relevance_score, עוצמת הסנטימנט וזמן הפרסום
+    """
+    relevance = float(item.get("relevance") or 0.5)
+    sentiment = min(abs(float(item.get("sentiment") or 0)), 1.0)
+    try:
+        published = datetime.strptime(item.get("time", ""), ALPHA_VANTAGE_TIME_FORMAT)
+        age_hours = max(0.0, ((now or _utcnow()) - published).total_seconds() / 3600)
+    except ValueError:
+        age_hours = 2 * NEWS_HALF_LIFE_HOURS
+    recency = math.pow(0.5, age_hours / NEWS_HALF_LIFE_HOURS)
+    return RELEVANCE_WEIGHT * relevance + SENTIMENT_WEIGHT * sentiment + RECENCY_WEIGHT * recency
+
+
+class PromptBuilder:
+    def __init__(self, cost_calculator: CostCalculator, token_budget: int = PROMPT_TOKEN_BUDGET,
+                 comparison_budget: int = COMPARISON_TOKEN_BUDGET, max_fragments: int = 4096):
+        """
+        הרכבת פרומפט מקטעים עם ספירת טוקנים שמורה לכל קטע, ובחירת החדשות הכי חשובות שנכנסות בתקציב.
+        ספירת הטוקנים של הפרומפט היא סכום הקטעים - רק תוכן חדש עובר tokenization.
+        """
+        self.cost_calculator = cost_calculator
+        self.token_budget = token_budget
+        self.comparison_budget = comparison_budget
+        self.max_fragments = max_fragments
+        self._news: "OrderedDict[Tuple[str, str, str], Tuple[str, int]]" = OrderedDict()
+
+    def _count(self, text: str) -> int:
+        return self.cost_calculator.estimate_tokens(text)
+
+    def _news_fragment(self, item: Dict) -> Tuple[str, int]:
+        """
+        הטקסט של ידיעה (עם תקציר מקוצר לפי טוקנים) ומספר הטוקנים שלו - מחושב פעם אחת לכל ידיעה
+        """
+        key = (item.get("title", ""), item.get("source", ""), item.get("summary", ""))
+        cached = self._news.get(key)
+        if cached is not None:
+            self._news.move_to_end(key)
+            return cached
+
+        summary = self.cost_calculator.truncate(key[2], SUMMARY_TOKENS)
+        text = f"\n- {key[0]}\n  מקור: {key[1]}\n  תקציר: {summary}\n"
+        fragment = (text, self._count(text))
+        self._news[key] = fragment
+        while len(self._news) > self.max_fragments:
+            self._news.popitem(last=False)
+        return fragment
+
+    @staticmethod
+    def _stock_fragment(ticker: str, stock_info: Optional[Dict]) -> str:
+        if stock_info is not None:
+            return (f"\nמידע על המניה {stock_info['name']} ({ticker}):\n"
+                    f"- מחיר נוכחי: ${stock_info['current_price']}\n"
+                    f"- שינוי באחוזים: {stock_info['percent_change']}%\n")
+        return f"\nמידע על המניה {ticker}:\n- נתוני המחיר אינם זמינים כרגע\n"
+
+    def _pack_news(self, news: List[Dict], budget: int) -> Tuple[List[str], int]:
+        """
+        בחירת הידיעות בעלות הציון הגבוה ביותר שנכנסות בתקציב (greedy לפי ציון)
+        """
+        now = _utcnow()
+        parts, used = [], 0
+        for item in sorted(news, key=lambda item: news_score(item, now), reverse=True):
+            text, tokens = self._news_fragment(item)
+            if used + tokens > budget:
+                continue
+            parts.append(text)
+            used += tokens
+            if len(parts) >= MAX_NEWS_ITEMS:
+                break
+        return parts, used
+
+    def _ticker_context(self, ticker: str, stock_info: Optional[Dict], news: Optional[List[Dict]],
+                        budget: int) -> Tuple[List[str], int]:
+        stock = self._stock_fragment(ticker, stock_info)
+        parts = [stock, NEWS_HEADER]
+        tokens = self._count(stock) + self._count(NEWS_HEADER)
+        if news is None:
+            parts.append(NEWS_UNAVAILABLE)
+            tokens += self._count(NEWS_UNAVAILABLE)
+        else:
+            news_parts, news_tokens = self._pack_news(news, budget - tokens)
+            parts += news_parts
+            tokens += news_tokens
+        return parts, tokens
+
+    def build(self, ticker: str, question: str, stock_info: Optional[Dict], news: Optional[List[Dict]]) -> BuiltPrompt:
+        """
+        פרומפט לשאלה על מניה אחת; מקור חסר מסומן כדי שהמודל לא ינחש נתונים
+        """
+        with tracer.span("build_prompt", ticker=ticker) as span:
+            header = QUESTION_TEMPLATE.format(question=question)
+            fixed = self._count(header) + self._count(ANSWER_INSTRUCTIONS)
+            parts, tokens = self._ticker_context(ticker, stock_info, news, self.token_budget - fixed)
+            span.set(tokens=fixed + tokens)
+            return BuiltPrompt("".join([header, *parts, ANSWER_INSTRUCTIONS]), fixed + tokens)
+
+    def build_comparison(self, tickers: List[str], question: str, quotes: Dict[str, Dict],
+                         news: Dict[str, Optional[List[Dict]]]) -> BuiltPrompt:
+        """
+        פרומפט אחד לשאלה על כמה מניות - תקציב החדשות מתחלק שווה בין המניות
+        """
+        with tracer.span("build_prompt", ticker=",".join(tickers)) as span:
+            header = COMPARISON_TEMPLATE.format(tickers=", ".join(tickers), question=question)
+            fixed = self._count(header) + self._count(COMPARISON_INSTRUCTIONS)
+            per_ticker = (self.comparison_budget - fixed) // max(len(tickers), 1)
+
+            parts, tokens = [header], fixed
+            for ticker in tickers:
+                ticker_parts, ticker_tokens = self._ticker_context(ticker, quotes.get(ticker), news.get(ticker),
+                                                                   per_ticker)
+                parts += ticker_parts
+                tokens += ticker_tokens
+            parts.append(COMPARISON_INSTRUCTIONS)
+            span.set(tokens=tokens)
+            return BuiltPrompt("".join(parts), tokens)
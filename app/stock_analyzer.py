@@ -1,33 +1,132 @@
-from openai import AzureOpenAI
-from telegram import Update
+import asyncio
+import os
+import time
+
+import httpx
+from app.model_router import ModelRouter
+from app.prompt_builder import BuiltPrompt, PromptBuilder
 from utils.cost_calculator import CostCalculator
-from typing import List, Dict, Union
-import requests
-import yfinance as yf
-from telegram.ext import ContextTypes
+from typing import Any, AsyncIterator, Awaitable, List, Dict, Optional, Tuple
+from utils.executor import BlockingExecutor
+from utils.http_client import HttpClientPool
+from utils.lazy_import import lazy_import
+from utils.market_cache import MarketDataCache
+from utils.rate_limiter import PRIORITY_INTERACTIVE, RateLimitedError, TokenBucket
+from utils.semantic_cache import SemanticCache
 from utils.stocks_list_manager import StockListManager
+from utils.tracing import tracer
+
+openai = lazy_import("openai")
+yf = lazy_import("yfinance")
+
+ALPHA_VANTAGE_URL = "https://www.alphavantage.co/query"
+YAHOO_CHART_URL = "https://query1.finance.yahoo.com/v8/finance/chart/{ticker}"
+YAHOO_SPARK_URL = "https://query1.finance.yahoo.com/v7/finance/spark"
+
+# מספר המניות המקסימלי בשאלת השוואה אחת
+MAX_COMPARE_TICKERS = 5
+# כמה ידיעות שומרים מכל תשובה של Alpha Vantage - הבחירה מתוכן נעשית לפי תקציב הטוקנים
+NEWS_CANDIDATES = 20
+
+# זמן מקסימלי (בשניות) לכל מקור מידע לפני שבונים פרומפט חלקי
+QUOTE_DEADLINE = 4.0
+NEWS_DEADLINE = 6.0
+# כמה זמן בקשה ממתינה בתור של Alpha Vantage לפני שמחזירים חדשות ישנות מהמטמון
+ALPHA_VANTAGE_QUEUE_DEADLINE = 3.0
+
+# גבולות לקריאה ל-Azure OpenAI: התחברות, המתנה בין חלקים ב-stream, וזמן עד החלק הראשון
+# (אחריו עוברים למודל הגיבוי). אורך התשובה חסום ב-max_tokens.
+OPENAI_CONNECT_TIMEOUT = 5.0
+OPENAI_READ_TIMEOUT = 30.0
+FIRST_TOKEN_TIMEOUT = 15.0
+MAX_OUTPUT_TOKENS = 800
+
+SYSTEM_PROMPT = "אתה אנליסט פיננסי מומחה שמנתח מניות ומסביר מגמות בשוק ההון בעברית ברורה."
 
 
 class StockNewsAnalyzer:
-    def __init__(self, azure_api_key: str, alpha_vantage_key: str, azure_endpoint: str = "https://stockybot.openai.azure.com/"):
-        self.client = AzureOpenAI(
-            api_key=azure_api_key,
-            api_version="2024-02-15-preview",
-            azure_endpoint=azure_endpoint
-        )
+    def __init__(self, azure_api_key: str, alpha_vantage_key: str, azure_endpoint: str = "https://stockybot.openai.azure.com/",
+                 executor: Optional[BlockingExecutor] = None, http: Optional[HttpClientPool] = None,
+                 cache: Optional[MarketDataCache] = None, alpha_vantage_limiter: Optional[TokenBucket] = None):
+        self.azure_api_key = azure_api_key
+        self.azure_endpoint = azure_endpoint
+        self._client = None
+        self.router = ModelRouter()
+        self.max_output_tokens = int(os.getenv("OPENAI_MAX_TOKENS", str(MAX_OUTPUT_TOKENS)))
         self.alpha_vantage_key = alpha_vantage_key
+        self.alpha_vantage_limiter = alpha_vantage_limiter or TokenBucket(
+            float(os.getenv("ALPHA_VANTAGE_CALLS_PER_MINUTE", "5"))
+        )
         self.cost_calculator = CostCalculator()
+        self.prompt_builder = PromptBuilder(self.cost_calculator)
         self.stock_manager = StockListManager()
+        self.executor = executor or BlockingExecutor()
+        self.http = http or HttpClientPool()
+        self.cache = cache or MarketDataCache()
+        self.semantic_cache = SemanticCache(self.stock_manager.matcher, disk=self.cache.disk)
+
+    @property
+    def client(self):
+        """
+        הלקוח האסינכרוני של Azure OpenAI - נבנה בקריאה הראשונה (ייבוא openai כבד מדי לזמן העלייה),
+        על ה-httpx client המשותף של HttpClientPool, כך שהחיבורים נשמרים בין בקשות
+        """
+        if self._client is None:
+            self._client = openai.AsyncAzureOpenAI(
+                api_key=self.azure_api_key,
+                api_version="2024-10-21",
+                azure_endpoint=self.azure_endpoint,
+                http_client=self.http.client_for(self.azure_endpoint),
+                timeout=httpx.Timeout(OPENAI_READ_TIMEOUT, connect=OPENAI_CONNECT_TIMEOUT),
+                max_retries=0  # במקום ניסיון חוזר - מעבר למודל הגיבוי
+            )
+        return self._client
 
     def get_ticker_from_text(self, text: str) -> str:
         return self.stock_manager.get_ticker(text)
 
-    def get_stock_info(self, ticker: str) -> Dict:
+    def get_tickers_from_text(self, text: str) -> List[str]:
+        return self.stock_manager.get_tickers(text)[:MAX_COMPARE_TICKERS]
+
+    @staticmethod
+    def _quote_from_meta(ticker: str, meta: Dict) -> Dict:
+        """
+        המרת ה-meta של Yahoo (chart/spark) לשדות שהבוט משתמש בהם
+        """
+        current_price = meta.get("regularMarketPrice")
+        previous_close = meta.get("previousClose") or meta.get("chartPreviousClose")
+        percent_change = None
+        if current_price is not None and previous_close:
+            percent_change = round((current_price / previous_close - 1) * 100, 2)
+        return {
+            "name": meta.get("longName") or meta.get("shortName") or ticker,
+            "current_price": current_price,
+            "previous_close": previous_close,
+            "percent_change": percent_change
+        }
+
+    async def get_stock_info(self, ticker: str, refresh: bool = False) -> Dict:
+        """
+        קבלת מידע בסיסי על המניה (מהמטמון אם קיים)
+        """
+        with tracer.span("stock_info", ticker=ticker, cache_hit=True) as span:
+            def fetch():
+                span.set(cache_hit=False)
+                return self._fetch_stock_info(ticker)
+
+            return await self.cache.get_or_fetch("quote", ticker, fetch, refresh=refresh)
+
+    async def _fetch_stock_info(self, ticker: str) -> Dict:
         """
-        קבלת מידע בסיסי על המניה באמצעות yfinance
+        הבאת מחיר מה-endpoint של Yahoo, ו-yfinance כגיבוי
         """
-        stock = yf.Ticker(ticker)
-        info = stock.info
+        try:
+            data = await self.http.get_json(YAHOO_CHART_URL.format(ticker=ticker), params={"range": "1d", "interval": "1d"})
+            return self._quote_from_meta(ticker, data["chart"]["result"][0]["meta"])
+        except Exception as e:
+            print(f"שגיאה בקבלת מחיר מ-Yahoo, עובר ל-yfinance: {e}")
+
+        info = await self.executor.run("yahoo", lambda: yf.Ticker(ticker).info)
         return {
             "name": info.get("longName", ticker),
             "current_price": info.get("currentPrice"),
@@ -35,131 +134,245 @@ class StockNewsAnalyzer:
             "percent_change": info.get("regularMarketChangePercent")
         }
 
-    def fetch_news(self, ticker: str) -> List[Dict]:
+    async def get_stock_quotes(self, tickers: List[str], refresh: bool = False) -> Dict[str, Dict]:
         """
-        הבאת חדשות באמצעות Alpha Vantage API
+        מחירים לכמה מניות בבקשה אחת (endpoint ה-spark של Yahoo); מה שחסר מובא אחד-אחד
         """
-        try:
-            # קבלת חדשות מ-Alpha Vantage
-            url = f"https://www.alphavantage.co/query?function=NEWS_SENTIMENT&tickers={ticker}&apikey={self.alpha_vantage_key}"
-            response = requests.get(url)
-            data = response.json()
-
-            news_items = []
-            if "feed" in data:
-                for item in data["feed"][:5]:  # לוקח את 5 החדשות האחרונות
-                    news_items.append({
-                        "title": item.get("title", ""),
-                        "summary": item.get("summary", ""),
-                        "source": item.get("source", ""),
-                        "url": item.get("url", ""),
-                        "sentiment": item.get("overall_sentiment_score", 0),
-                        "time": item.get("time_published", "")
+        with tracer.span("stock_quotes", tickers=len(tickers)) as span:
+            quotes = {}
+            missing = []
+            for ticker in tickers:
+                cached = None if refresh else self.cache.get("quote", ticker)
+                if cached is not None:
+                    quotes[ticker] = cached
+                else:
+                    missing.append(ticker)
+
+            span.set(cache_hits=len(quotes))
+            if missing:
+                try:
+                    data = await self.http.get_json(YAHOO_SPARK_URL, params={
+                        "symbols": ",".join(missing),
+                        "range": "1d",
+                        "interval": "1d"
                     })
+                    requested = {ticker.upper(): ticker for ticker in missing}
+                    for result in data["spark"]["result"]:
+                        ticker = requested.get(result["symbol"].upper())
+                        if ticker is None or not result.get("response"):
+                            continue
+                        quotes[ticker] = self._quote_from_meta(ticker, result["response"][0]["meta"])
+                        self.cache.set("quote", ticker, quotes[ticker])
+                except Exception as e:
+                    span.error = True
+                    print(f"שגיאה בקבלת מחירים מרוכזת: {e}")
 
-            return news_items
-        except Exception as e:
-            print(f"שגיאה בהבאת חדשות: {e}")
-            return []
+                remaining = [ticker for ticker in missing if ticker not in quotes]
+                results = await asyncio.gather(*(self.get_stock_info(ticker, refresh) for ticker in remaining),
+                                               return_exceptions=True)
+                for ticker, result in zip(remaining, results):
+                    if not isinstance(result, Exception):
+                        quotes[ticker] = result
+
+            return quotes
 
-    async def analyze_stock_movement(self, ticker: str, question: str, update: Update) -> Dict[
-        str, Dict[str, Union[str, dict]]]:
+    async def fetch_news(self, ticker: str, refresh: bool = False, priority: int = PRIORITY_INTERACTIVE) -> List[Dict]:
         """
-        ניתוח תנועת המניה והחדשות הרלוונטיות עם חישוב עלויות
+        הבאת חדשות באמצעות Alpha Vantage API (מהמטמון אם קיים).
+        כשהמכסה של Alpha Vantage נגמרה מוחזרות החדשות האחרונות שנשמרו, גם אם פג תוקפן.
         """
-        try:
-            # קבלת מידע על המניה
-            stock_info = self.get_stock_info(ticker)
-            news = self.fetch_news(ticker)
-
-            # הכנת הטקסט לשליחה
-            context = f"""
-מידע על המניה {stock_info['name']} ({ticker}):
-- מחיר נוכחי: ${stock_info['current_price']}
-- שינוי באחוזים: {stock_info['percent_change']}%
-
-חדשות אחרונות:
-"""
-            for item in news:
-                context += f"""
-- {item['title']}
-  מקור: {item['source']}
-  תקציר: {item['summary'][:200]}...
-"""
-
-            prompt = f"""בהתבסס על המידע הבא, אנא ענה על השאלה: "{question}"
-
-{context}
-
-אנא תן תשובה מקיפה בעברית שמסבירה את המצב בצורה ברורה."""
-
-            # חישוב עלות משוערת
-            input_tokens = self.cost_calculator.estimate_tokens(prompt)
-            cost_estimate = self.cost_calculator.calculate_cost(input_tokens)
-
-            # בקשת אישור מהמשתמש
-            confirmation_message = (
-                f"📊 הערכת עלויות:\n"
-                f"• טוקנים בשאילתה: {cost_estimate['input_tokens']:,}\n"
-                f"• טוקנים משוערים בתשובה: {cost_estimate['output_tokens']:,}\n"
-                f"• עלות משוערת: ${cost_estimate['total_cost']:.4f}\n\n"
-                f"האם להמשיך עם הניתוח? (כן/לא)"
+        with tracer.span("fetch_news", ticker=ticker, cache_hit=True) as span:
+            def fetch():
+                span.set(cache_hit=False)
+                return self._fetch_news(ticker, priority)
+
+            try:
+                news = await self.cache.get_or_fetch("news", ticker, fetch, refresh=refresh)
+                span.set(items=len(news))
+                return news
+            except RateLimitedError as e:
+                span.set(rate_limited=True)
+                stale = self.cache.get_stale("news", ticker)
+                if stale is not None:
+                    self.alpha_vantage_limiter.served_stale += 1
+                    span.set(stale=True)
+                    return stale[0]
+                print(f"חריגה ממגבלת הקצב של Alpha Vantage: {e}")
+                return []
+            except Exception as e:
+                span.error = True
+                print(f"שגיאה בהבאת חדשות: {e}")
+                return []
+
+    async def _fetch_news(self, ticker: str, priority: int = PRIORITY_INTERACTIVE) -> List[Dict]:
+        """
+        קריאה ל-NEWS_SENTIMENT; תשובה ללא feed נחשבת לשגיאה כדי שלא תישמר במטמון
+        """
+        timeout = ALPHA_VANTAGE_QUEUE_DEADLINE if priority == PRIORITY_INTERACTIVE else 0
+        if not await self.alpha_vantage_limiter.acquire(priority, timeout):
+            raise RateLimitedError(f"אין מכסה פנויה לבקשת חדשות עבור {ticker}")
+
+        async with self.executor.limit("alphavantage"):
+            data = await self.http.get_json(ALPHA_VANTAGE_URL, params={
+                "function": "NEWS_SENTIMENT",
+                "tickers": ticker,
+                "apikey": self.alpha_vantage_key
+            })
+
+        if "feed" not in data:
+            note = data.get("Note") or data.get("Information")
+            if note:
+                # Alpha Vantage מחזיר Note/Information כשעוברים את המכסה
+                self.alpha_vantage_limiter.drain()
+                self.alpha_vantage_limiter.throttled += 1
+                raise RateLimitedError(note)
+            raise ValueError("Alpha Vantage החזיר תשובה ללא חדשות")
+
+        news_items = []
+        for item in data["feed"][:NEWS_CANDIDATES]:
+            relevance = next(
+                (entry.get("relevance_score") for entry in item.get("ticker_sentiment", [])
+                 if entry.get("ticker", "").upper() == ticker.upper()),
+                None
             )
+            news_items.append({
+                "title": item.get("title", ""),
+                "summary": item.get("summary", ""),
+                "source": item.get("source", ""),
+                "url": item.get("url", ""),
+                "sentiment": item.get("overall_sentiment_score", 0),
+                "relevance": float(relevance) if relevance is not None else None,
+                "time": item.get("time_published", "")
+            })
+
+        return news_items
+
+    @staticmethod
+    async def _with_deadline(source: str, coro: Awaitable[Any], deadline: float) -> Optional[Any]:
+        """
+        המתנה למקור מידע עד ה-deadline שלו; None אם איחר או נכשל
+        """
+        try:
+            return await asyncio.wait_for(coro, timeout=deadline)
+        except asyncio.TimeoutError:
+            print(f"{source} לא הגיב תוך {deadline} שניות")
+        except Exception as e:
+            print(f"שגיאה בקבלת {source}: {e}")
+        return None
+
+    async def gather_market_data(self, ticker: str) -> Tuple[Optional[Dict], Optional[List[Dict]]]:
+        """
+        הבאת מחיר וחדשות במקביל; מקור שלא הגיע בזמן מוחזר כ-None
+        """
+        return await asyncio.gather(
+            self._with_deadline("מחיר המניה", self.get_stock_info(ticker), QUOTE_DEADLINE),
+            self._with_deadline("חדשות", self.fetch_news(ticker), NEWS_DEADLINE)
+        )
+
+    async def gather_comparison_data(self, tickers: List[str]) -> Tuple[Dict[str, Dict], Dict[str, Optional[List[Dict]]]]:
+        """
+        מחירים לכל המניות בבקשה אחת וחדשות לכל מניה - הכל במקביל
+        """
+        quotes, *news = await asyncio.gather(
+            self._with_deadline("מחירי המניות", self.get_stock_quotes(tickers), QUOTE_DEADLINE),
+            *(self._with_deadline(f"חדשות {ticker}", self.fetch_news(ticker), NEWS_DEADLINE) for ticker in tickers)
+        )
+        return quotes or {}, dict(zip(tickers, news))
 
-            # שליחת הודעת אישור למשתמש
-            await update.message.reply_text(confirmation_message)
-        finally:
-            return {'pending_analysis': {'prompt': prompt,'cost_estimate': cost_estimate}}
-    async def process_confirmation(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    def build_prompt(self, ticker: str, question: str, stock_info: Optional[Dict],
+                     news: Optional[List[Dict]]) -> BuiltPrompt:
         """
-        עיבוד תשובת המשתמש וביצוע הניתוח אם אושר
+        בניית הפרומפט לניתוח (טקסט ומספר טוקנים) בתוך תקציב הטוקנים
         """
-        if not hasattr(context.user_data, 'pending_analysis'):
-            await update.message.reply_text("אין ניתוח ממתין. אנא שאל שאלה חדשה.")
-            return
+        return self.prompt_builder.build(ticker, question, stock_info, news)
 
-        response_text = update.message.text.lower()
-        if response_text in ['כן', 'yes', 'y', 'כ']:
+    def build_comparison_prompt(self, tickers: List[str], question: str, quotes: Dict[str, Dict],
+                                news: Dict[str, Optional[List[Dict]]]) -> BuiltPrompt:
+        """
+        פרומפט אחד לשאלה על כמה מניות
+        """
+        return self.prompt_builder.build_comparison(tickers, question, quotes, news)
+
+    def estimate_cost(self, input_tokens: int, model: str) -> Dict:
+        """
+        הערכת עלות לפי המחיר של המודל ואורך התשובה המקסימלי
+        """
+        return self.cost_calculator.calculate_cost(input_tokens, model=model, max_output_tokens=self.max_output_tokens)
+
+    @staticmethod
+    def _messages(prompt: str) -> List[Dict[str, str]]:
+        return [
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": prompt}
+        ]
+
+    def _should_fall_back(self, model: str, error: Exception) -> bool:
+        """
+        timeout או 429 עוברים למודל הגיבוי; אחרי 429 המודל מדולג עד שיתפנה
+        """
+        if isinstance(error, openai.RateLimitError):
+            retry_after = error.response.headers.get("retry-after", "")
+            self.router.cool_down(model, float(retry_after) if retry_after.isdigit() else None)
+            return True
+        return isinstance(error, (asyncio.TimeoutError, openai.APITimeoutError))
+
+    async def _open_stream(self, prompt: str, model: str):
+        """
+        פתיחת stream והמתנה לחלק הראשון - עד FIRST_TOKEN_TIMEOUT
+        """
+        client = self.client  # בניית הלקוח (וייבוא openai) לא נספרת בזמן ההמתנה
+
+        async def start():
+            stream = await client.chat.completions.create(
+                model=model,
+                messages=self._messages(prompt),
+                max_tokens=self.max_output_tokens,
+                stream=True,
+                stream_options={"include_usage": True}
+            )
             try:
-                # שליחת הודעת "מעבד..."
-                processing_message = await update.message.reply_text("מעבד את הבקשה... ⏳")
-
-                # שליחה ל-Azure OpenAI
-                response = self.client.chat.completions.create(
-                    model="gpt-4",
-                    messages=[
-                        {"role": "system", "content": "אתה אנליסט פיננסי מומחה שמנתח מניות ומסביר מגמות בשוק ההון בעברית ברורה."},
-                        {"role": "user", "content": context.user_data['pending_analysis']['prompt']}
-                    ]
-                )
-
-                # חישוב העלות בפועל
-                actual_tokens = {
-                    'input': response.usage.prompt_tokens,
-                    'output': response.usage.completion_tokens
-                }
-                actual_cost = self.cost_calculator.calculate_cost(
-                    actual_tokens['input'],
-                    actual_tokens['output']
-                )
-
-                # הכנת התשובה עם פירוט העלויות
-                answer = response.choices[0].message.content
-                cost_summary = (
-                    f"\n\n💰 סיכום עלויות בפועל:\n"
-                    f"• טוקנים בשאילתה: {actual_tokens['input']:,}\n"
-                    f"• טוקנים בתשובה: {actual_tokens['output']:,}\n"
-                    f"• עלות כוללת: ${actual_cost['total_cost']:.4f}"
-                )
-
-                # עדכון ההודעה עם התשובה והעלויות
-                await processing_message.edit_text(f"{answer}{cost_summary}")
+                return stream, await stream.__anext__()
+            except StopAsyncIteration:
+                return stream, None
+            except BaseException:
+                await stream.close()
+                raise
 
-            except Exception as e:
-                await processing_message.edit_text(f"התרחשה שגיאה בניתוח: {str(e)}")
+        return await asyncio.wait_for(start(), timeout=FIRST_TOKEN_TIMEOUT)
+
+    @staticmethod
+    def _read_chunk(chunk, span) -> Tuple[str, Optional[Any]]:
+        if chunk.usage is not None:
+            span.set(prompt_tokens=chunk.usage.prompt_tokens, completion_tokens=chunk.usage.completion_tokens)
+        delta = chunk.choices[0].delta.content if chunk.choices else None
+        return delta or "", chunk.usage
 
-        else:
-            await update.message.reply_text("הניתוח בוטל.")
+    async def stream_completion(self, prompt: str, model: Optional[str] = None
+                                ) -> AsyncIterator[Tuple[str, Optional[Any], str]]:
+        """
+        הזרמת התשובה מ-Azure OpenAI: מחזיר (טקסט חדש, usage, המודל שעונה) - ה-usage מגיע רק בחלק האחרון.
+        מודל שלא התחיל לענות בזמן או החזיר 429 מוחלף במודל הגיבוי, לפני שנשלח טקסט כלשהו למשתמש.
+        מספר ה-streams הפתוחים במקביל מוגבל ב-executor.limit("openai").
+        """
+        candidates = self.router.candidates(model or self.router.strong_model)
+        async with self.executor.limit("openai"):
+            with tracer.span("openai", model=candidates[0]) as span:
+                started = time.perf_counter()
+                for index, candidate in enumerate(candidates):
+                    try:
+                        stream, first = await self._open_stream(prompt, candidate)
+                        break
+                    except Exception as e:
+                        if index == len(candidates) - 1 or not self._should_fall_back(candidate, e):
+                            raise
+                        self.router.fell_back(candidate, candidates[index + 1])
+                        span.set(fallback_from=candidate)
+                span.set(model=candidate, first_token_seconds=time.perf_counter() - started)
 
-        # ניקוי המידע השמור
-        del context.user_data['pending_analysis']
+                try:
+                    if first is not None:
+                        yield (*self._read_chunk(first, span), candidate)
+                    async for chunk in stream:
+                        yield (*self._read_chunk(chunk, span), candidate)
+                finally:
+                    await stream.close()
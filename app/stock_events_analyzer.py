@@ -1,74 +1,133 @@
-from datetime import timedelta
-from typing import Optional
+import asyncio
+from datetime import date
+from typing import Dict, List, Optional
+
+from utils.executor import BlockingExecutor
+from utils.lazy_import import lazy_import
+from utils.market_cache import MarketDataCache
+
+pd = lazy_import("pandas")
+yf = lazy_import("yfinance")
+analytics = lazy_import("app.events_analytics")
 
-import pandas as pd
-import yfinance as yf
 
 class StockEventsAnalyzer:
-    def __init__(self):
+    def __init__(self, executor: Optional[BlockingExecutor] = None, cache: Optional[MarketDataCache] = None):
         """
         מנהל אירועי מניות - earnings ודיבידנדים
         """
-        self.cache = {}  # Cache for storing recent queries
-        self.cache_duration = timedelta(hours=1)  # Cache duration
+        self.executor = executor or BlockingExecutor()
+        self.cache = cache or MarketDataCache()
+        # תאריכי ה-earnings הבאים שכבר נראו - משמשים לחימום המטמון לפני הדוח
+        self.next_earnings: Dict[str, date] = {}
 
-    def _format_date(self, date) -> str:
+    async def _get_info(self, ticker: str) -> Dict:
         """
-        פורמט תאריך לתצוגה נוחה בעברית
+        stock.info מהמטמון המשותף
         """
-        if pd.isnull(date):
-            return "לא ידוע"
+        return await self.cache.get_or_fetch(
+            "info", ticker, lambda: self.executor.run("yahoo", lambda: yf.Ticker(ticker).info)
+        )
 
+    @staticmethod
+    def _load_earnings(ticker: str) -> Dict:
+        """
+        שליפת נתוני earnings מ-yfinance (קריאה חוסמת)
+        """
+        stock = yf.Ticker(ticker)
+        return {
+            'calendar': stock.calendar,
+            'earnings_dates': stock.earnings_dates
+        }
+
+    async def _get_earnings(self, ticker: str, refresh: bool = False) -> Dict:
+        data = await self.cache.get_or_fetch(
+            "earnings", ticker, lambda: self.executor.run("yahoo", self._load_earnings, ticker), refresh=refresh
+        )
+        self._remember_next_earnings(ticker, data['calendar'])
+        return data
+
+    def _remember_next_earnings(self, ticker: str, calendar) -> None:
         try:
-            if isinstance(date, str):
-                date = pd.to_datetime(date)
+            calendar = pd.DataFrame.from_dict(calendar)
+            if calendar is not None and not calendar.empty:
+                upcoming = analytics.next_earnings_date(calendar['Earnings Date'])
+                if upcoming is not None:
+                    self.next_earnings[ticker] = upcoming
+        except Exception:
+            pass
+
+    async def prefetch_earnings(self, ticker: str) -> None:
+        """
+        רענון נתוני ה-earnings במטמון (משימת רקע)
+        """
+        await self._get_earnings(ticker, refresh=True)
 
-            months_he = {
-                1: 'ינואר', 2: 'פברואר', 3: 'מרץ', 4: 'אפריל',
-                5: 'מאי', 6: 'יוני', 7: 'יולי', 8: 'אוגוסט',
-                9: 'ספטמבר', 10: 'אוקטובר', 11: 'נובמבר', 12: 'דצמבר'
-            }
+    async def _get_dividends(self, ticker: str) -> "pd.Series":
+        return await self.cache.get_or_fetch(
+            "dividends", ticker, lambda: self.executor.run("yahoo", lambda: yf.Ticker(ticker).dividends)
+        )
 
-            return f"{date.day} ב{months_he[date.month]} {date.year}"
-        except:
-            return "תאריך לא תקין"
+    async def _get_history(self, ticker: str) -> "pd.Series":
+        """
+        מחירי סגירה יומיים (לחישוב תגובת המחיר לדוחות)
+        """
+        return await self.cache.get_or_fetch(
+            "history", ticker, lambda: self.executor.run("yahoo", lambda: yf.Ticker(ticker).history(period="5y")["Close"])
+        )
 
     async def get_earnings_info(self, ticker: str) -> str:
         """
         קבלת מידע על earnings
         """
         try:
-            stock = yf.Ticker(ticker)
+            info = await self._get_info(ticker)
+            data = await self._get_earnings(ticker)
 
-            # קבלת מידע על earnings
-            calendar = stock.calendar
-            earnings_history = stock.earnings_dates.sort_index(ascending=False)[:4]  # 4 תקופות אחרונות
+            try:
+                closes = await self._get_history(ticker)
+            except Exception as e:
+                print(f"שגיאה בקבלת היסטוריית מחירים: {e}")
+                closes = None
+
+            history = analytics.earnings_history(data['earnings_dates'], closes)
+            summary = analytics.earnings_table({ticker: data['earnings_dates']}, {ticker: closes} if closes is not None else None)
 
             # בניית התשובה
-            response = [f"📊 מידע על Earnings עבור {stock.info.get('longName', ticker)}:"]
-            calendar = pd.DataFrame.from_dict(calendar)
+            response = [f"📊 מידע על Earnings עבור {info.get('longName', ticker)}:"]
             # תאריך ה-earnings הבא
-            if calendar is not None and not calendar.empty:
-                next_earnings = calendar.iloc[0]['Earnings Date']
-                response.append(f"\n📅 Earnings הבא: {self._format_date(next_earnings)}")
-
-            # היסטוריית earnings
-            if not earnings_history.empty:
-                response.append("\n📈 היסטוריית Earnings אחרונה:")
-                for date, row in earnings_history.iterrows():
-                    actual = row.get('Reported EPS', 'N/A')
-                    estimate = row.get('EPS Estimate', 'N/A')
-                    surprise = row.get('Surprise(%)', 'N/A')
-
-                    surprise = round(surprise,3)
-
+            upcoming = self.next_earnings.get(ticker)
+            if upcoming is not None and upcoming >= date.today():
+                response.append(f"\n📅 Earnings הבא: {analytics.format_date(upcoming)}")
+
+            if not summary.empty:
+                stats = summary.iloc[0]
+                response.append(f"\n🎯 לאורך {int(stats['reports'])} דוחות:")
+                if pd.notna(stats['beat_rate']):
+                    response.append(
+                        f"• עקיפת הצפי: {stats['beat_rate'] * 100:.0f}% | החטאה: {stats['miss_rate'] * 100:.0f}%"
+                    )
+                if pd.notna(stats['avg_surprise']):
+                    response.append(f"• הפתעה ממוצעת: {stats['avg_surprise']:.2f}%")
+                if pd.notna(stats['avg_reaction']):
                     response.append(
-                        f"• {self._format_date(date)}:\n"
-                        f"  ▫️ EPS בפועל: ${actual}\n"
-                        f"  ▫️ EPS צפי: ${estimate}\n"
-                        f"  ▫️ הפתעה: {surprise}\n"
+                        f"• תגובת מחיר ממוצעת ביום שאחרי: {stats['avg_reaction'] * 100:+.2f}% "
+                        f"(בערך מוחלט {stats['avg_abs_reaction'] * 100:.2f}%)"
                     )
 
+            # היסטוריית earnings - 4 תקופות אחרונות
+            recent = history.head(4)
+            if not recent.empty:
+                response.append("\n📈 היסטוריית Earnings אחרונה:")
+                lines = (
+                    "• " + pd.Series(analytics.format_dates(recent.index), index=recent.index, dtype=object) + ":\n"
+                    + "  ▫️ EPS בפועל: $" + analytics.format_values(recent['actual'], "{:g}") + "\n"
+                    + "  ▫️ EPS צפי: $" + analytics.format_values(recent['estimate'], "{:g}") + "\n"
+                    + "  ▫️ הפתעה: " + analytics.format_values(recent['surprise'].round(3), "{:g}") + "\n"
+                    + "  ▫️ תגובת מחיר: " + analytics.format_values(recent['reaction'] * 100, "{:+.2f}%") + "\n"
+                )
+                response.extend(lines.tolist())
+
             return "\n".join(response)
 
         except Exception as e:
@@ -80,12 +139,10 @@ class StockEventsAnalyzer:
         קבלת מידע על דיבידנדים
         """
         try:
-            stock = yf.Ticker(ticker)
-
-            dividends = stock.dividends.sort_index(ascending=False)
-            dividend_info = stock.info
+            dividend_info = await self._get_info(ticker)
+            dividends = (await self._get_dividends(ticker)).sort_index(ascending=False)
 
-            response = [f"💰 מידע על דיבידנדים עבור {stock.info.get('longName', ticker)}:"]
+            response = [f"💰 מידע על דיבידנדים עבור {dividend_info.get('longName', ticker)}:"]
 
             dividend_rate = dividend_info.get('dividendRate', None)
             dividend_yield = dividend_info.get('dividendYield', None)
@@ -98,16 +155,23 @@ class StockEventsAnalyzer:
                 response.append(f"תשואת דיבידנד: {dividend_yield * 100:.2f}%")
 
             if ex_dividend_date:
-                response.append(f"תאריך האקס האחרון: {self._format_date(ex_dividend_date)}")
+                response.append(f"תאריך האקס האחרון: {analytics.format_date(ex_dividend_date)}")
 
             if not dividends.empty:
                 response.append("\n📅 היסטוריית דיבידנדים אחרונה:")
-                for date, amount in dividends.head(5).items():
-                    response.append(f"• {self._format_date(date)}: ${amount:.3f}")
-
-                yearly_growth = self._calculate_dividend_growth(dividends)
-                if yearly_growth:
-                    response.append(f"\n📈 צמיחה שנתית ממוצעת: {yearly_growth:.1f}%")
+                recent = dividends.head(5)
+                response.extend(
+                    ("• " + pd.Series(analytics.format_dates(recent.index), index=recent.index, dtype=object) + ": $"
+                     + analytics.format_values(recent, "{:.3f}")).tolist()
+                )
+
+                stats = analytics.dividend_table({ticker: dividends}).iloc[0]
+                if pd.notna(stats['cagr']):
+                    response.append(f"\n📈 צמיחה שנתית ממוצעת (CAGR): {stats['cagr'] * 100:.1f}%")
+                if pd.notna(stats['cagr_5y']):
+                    response.append(f"📈 CAGR ל-5 שנים: {stats['cagr_5y'] * 100:.1f}%")
+                response.append(f"🔁 שנים רצופות של חלוקה: {int(stats['payout_streak'])}")
+                response.append(f"⬆️ שנים רצופות של העלאת דיבידנד: {int(stats['increase_streak'])}")
             else:
                 response.append("\nהחברה לא מחלקת דיבידנדים כרגע.")
 
@@ -117,26 +181,23 @@ class StockEventsAnalyzer:
             print(f"שגיאה בקבלת מידע על דיבידנדים: {e}")
             return f"לא הצלחתי למצוא מידע על דיבידנדים עבור {ticker}"
 
-    def _calculate_dividend_growth(self, dividends) -> Optional[float]:
+    async def get_dividend_aristocrats(self, tickers: List[str], min_streak: int = 25) -> str:
         """
-        חישוב צמיחת הדיבידנד השנתית הממוצעת
+        סינון מניות עם רצף ארוך של העלאות דיבידנד - חישוב אחד על כל המניות
         """
-        try:
-            # מקבץ לפי שנים
-            yearly_dividends = dividends.groupby(pd.Grouper(freq='Y')).sum()
-
-            if len(yearly_dividends) < 2:
-                return None
-
-            # לוקח את השנים האחרונות בהן היו דיבידנדים
-            start_value = yearly_dividends[-2]  # שנה קודמת
-            end_value = yearly_dividends[-1]  # שנה נוכחית
-
-            if start_value <= 0:
-                return None
-
-            growth = ((end_value / start_value) - 1) * 100
-            return growth
-
-        except Exception:
-            return None
+        results = await asyncio.gather(*(self._get_dividends(ticker) for ticker in tickers), return_exceptions=True)
+        dividends = {ticker: series for ticker, series in zip(tickers, results) if not isinstance(series, Exception)}
+        aristocrats = analytics.dividend_aristocrats(analytics.dividend_table(dividends), min_streak)
+
+        if aristocrats.empty:
+            return f"לא נמצאו מניות עם {min_streak} שנים רצופות של העלאת דיבידנד (מתוך {len(dividends)} מניות)."
+
+        lines = (
+            "• " + aristocrats.index.to_series().astype(object) + ": "
+            + analytics.format_values(aristocrats['increase_streak'], "{:.0f}") + " שנים, CAGR "
+            + analytics.format_values(aristocrats['cagr'] * 100, "{:.1f}%")
+        )
+        return "\n".join(
+            [f"👑 מניות עם לפחות {min_streak} שנים רצופות של העלאת דיבידנד ({len(aristocrats)}/{len(dividends)}):"]
+            + lines.tolist()
+        )
@@ -1,39 +1,137 @@
 from app.stock_analyzer import StockNewsAnalyzer
 from app.stock_events_analyzer import StockEventsAnalyzer
 from app.institutional_holdings import InstitutionalHoldingsAnalyzer
+from app.prefetch_scheduler import DEFAULT_CALLS_PER_MINUTE, PrefetchScheduler
+from app.alert_engine import AlertEngine, describe_condition, parse_watch_args
+from app.update_processor import PerUserUpdateProcessor
+from utils.disk_cache import DiskCache
+from utils.executor import BlockingExecutor
+from utils.fundamentals_store import PRICE_BATCH, FundamentalsStore, ScreenError, parse_filters
+from utils.http_client import HttpClientPool
+from utils.lazy_import import lazy_import, warmup
+from utils.market_cache import MarketDataCache
+from utils.rate_limiter import TokenBucket
+from utils.response_cache import ResponseCache
 from utils.security_manager import SecurityManager
-from telegram.ext import Application, CommandHandler, MessageHandler, filters, ContextTypes
-from telegram import Update
+from utils.send_queue import GLOBAL_MESSAGES_PER_SECOND, SendQueue
+from utils.telegram_stream import StreamingReply
+from utils.tracing import start_metrics_server, tracer
+from utils.watchlist_store import WatchlistStore
+from telegram.ext import Application, CommandHandler, MessageHandler, TypeHandler, filters, ContextTypes
+from telegram import Message, Update
+from telegram.request import BaseRequest
 import os
 from dotenv import load_dotenv
 from pathlib import Path
+import time
+from typing import Dict, List, Optional
+
+pd = lazy_import("pandas")
+
+# מודולים כבדים שנטענים ברקע אחרי שהבוט כבר מאזין להודעות
+WARMUP_MODULES = ["numpy", "pandas", "yfinance", "openai", "app.events_analytics"]
+
+# כל כמה זמן (בשניות) מרעננים את טבלת נתוני היסוד של כל המניות המוכרות (info - קריאה לכל מניה)
+FUNDAMENTALS_REFRESH_INTERVAL = 24 * 60 * 60
+# והמחיר והשווי בטבלה - מבקשות מחירים מרוכזות
+FUNDAMENTALS_PRICE_INTERVAL = 15 * 60
+MAX_SCREEN_RESULTS = 20
+
 
 class StockNewsTelegramBot:
-    def __init__(self, telegram_token: str, azure_api_key: str, alpha_vantage_key: str):
-        self.application = Application.builder().token(telegram_token).build()
-        self.analyzer = StockNewsAnalyzer(azure_api_key, alpha_vantage_key)
-        self.security = SecurityManager()
-        self.events_analyzer = StockEventsAnalyzer()
-        self.institutional_analyzer = InstitutionalHoldingsAnalyzer()
+    def __init__(self, telegram_token: str, azure_api_key: str, alpha_vantage_key: str,
+                 started_at: Optional[float] = None, worker_index: Optional[int] = None, workers: int = 1,
+                 http: Optional[HttpClientPool] = None, telegram_request: Optional[BaseRequest] = None):
+        """
+        worker_index מוגדר כשהבוט רץ כ-worker של שרת ה-webhook: בלי polling. כל worker מרענן את המניות החמות
+        של המשתמשים שלו; ההתראות ורענון נתוני היסוד רצים רק ב-worker 0.
+        http ו-telegram_request מאפשרים להחליף את הרשת (benchmarks/)
+        """
+        self.started_at = started_at or time.perf_counter()
+        self.startup_seconds: Optional[float] = None
+        self.warmup_seconds: Dict[str, float] = {}
+        self.worker_index = worker_index
+        self.metrics_server = None
+        # עדכונים של משתמשים שונים מעובדים במקביל - שאלה איטית לא עוצרת את שאר הצ'אטים
+        builder = Application.builder().token(telegram_token).concurrent_updates(PerUserUpdateProcessor())
+        if worker_index is not None:
+            builder = builder.updater(None)
+        if telegram_request is not None:
+            builder = builder.request(telegram_request)
+        self.application = builder.post_init(self._on_startup).post_shutdown(self._on_shutdown).build()
+        self.executor = BlockingExecutor()
+        self.http = http or HttpClientPool()
+        self.cache = MarketDataCache(disk=DiskCache())
+        # מכסת Alpha Vantage מתחלקת בין כל תהליכי ה-worker
+        alpha_vantage_limiter = TokenBucket(
+            float(os.getenv("ALPHA_VANTAGE_CALLS_PER_MINUTE", "5")) / workers
+        ) if workers > 1 else None
+        self.analyzer = StockNewsAnalyzer(azure_api_key, alpha_vantage_key, executor=self.executor, http=self.http,
+                                          cache=self.cache, alpha_vantage_limiter=alpha_vantage_limiter)
+        self.security = SecurityManager(executor=self.executor)
+        self.response_cache = ResponseCache(disk=self.cache.disk)
+        self.events_analyzer = StockEventsAnalyzer(executor=self.executor, cache=self.cache)
+        self.institutional_analyzer = InstitutionalHoldingsAnalyzer(executor=self.executor, cache=self.cache)
+        self.prefetch = PrefetchScheduler(self.analyzer, self.events_analyzer, self.cache,
+                                          calls_per_minute=max(1, DEFAULT_CALLS_PER_MINUTE // workers))
+        self.fundamentals = FundamentalsStore(executor=self.executor, cache=self.cache)
+        self.watchlists = WatchlistStore()
+        # גם המגבלה הגלובלית של טלגרם היא לבוט כולו, ולכן מתחלקת בין ה-workers
+        self.outbox = SendQueue(self.application.bot, messages_per_second=GLOBAL_MESSAGES_PER_SECOND / workers)
+        self.alerts = AlertEngine(self.analyzer, self.watchlists, self.outbox, executor=self.executor)
+        if self.application.job_queue is not None:
+            # הפופולריות והמחירים בזיכרון הם לכל worker (המשתמשים מחולקים לפי מזהה), ולכן כל worker
+            # מרענן את המניות החמות שלו; ההתראות ונתוני היסוד משותפים ורצים רק ב-worker 0
+            self.prefetch.register(self.application.job_queue)
+            if worker_index in (None, 0):
+                self.alerts.register(self.application.job_queue)
+                self.application.job_queue.run_repeating(self._refresh_fundamentals,
+                                                         interval=FUNDAMENTALS_REFRESH_INTERVAL,
+                                                         first=30, name="fundamentals_refresh")
+                self.application.job_queue.run_repeating(self._refresh_fundamental_prices,
+                                                         interval=FUNDAMENTALS_PRICE_INTERVAL,
+                                                         first=FUNDAMENTALS_PRICE_INTERVAL,
+                                                         name="fundamentals_prices")
+        else:
+            print("JobQueue לא זמין (חסר python-telegram-bot[job-queue]) - רענון ברקע מושבת")
 
+        # קבוצה -1 רצה לפני כל ה-handlers: מזהה trace חדש לכל עדכון
+        self.application.add_handler(TypeHandler(Update, self._start_trace), group=-1)
         self.application.add_handler(CommandHandler("start", self.start_command))
         self.application.add_handler(CommandHandler("help", self.help_command))
         self.application.add_handler(CommandHandler("usage", self.usage_command))
         self.application.add_handler(CommandHandler("admin", self.admin_command))
+        self.application.add_handler(CommandHandler("stats", self.stats_command))
         self.application.add_handler(CommandHandler("stocks", self.stocks_command))
         self.application.add_handler(CommandHandler("addstock", self.add_stock_command))
         self.application.add_handler(CommandHandler("removestock", self.remove_stock_command))
         self.application.add_handler(CommandHandler("earnings", self.earnings_command))
         self.application.add_handler(CommandHandler("dividends", self.dividends_command))
         self.application.add_handler(CommandHandler("holdings", self.holdings_command))
+        self.application.add_handler(CommandHandler("aristocrats", self.aristocrats_command))
+        self.application.add_handler(CommandHandler("screen", self.screen_command))
+        self.application.add_handler(CommandHandler("compare", self.compare_command))
+        self.application.add_handler(CommandHandler("watch", self.watch_command))
+        self.application.add_handler(CommandHandler("unwatch", self.unwatch_command))
+        self.application.add_handler(CommandHandler("watchlist", self.watchlist_command))
         self.application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, self.handle_message))
 
+    async def _start_trace(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        tracer.start_trace()
+
+    async def reply(self, update: Update, text: str, **kwargs) -> Message:
+        """
+        תשובה למשתמש דרך תור השליחה (קצב, פיצול הודעות ארוכות ו-RetryAfter)
+        """
+        return await self.outbox.send(update.effective_chat.id, text, **kwargs)
+
     async def start_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         if not self.security.is_user_allowed(str(update.effective_user.id)):
-            await update.message.reply_text("מצטערת, אין לך הרשאה להשתמש בבוט זה.")
+            await self.reply(update, "מצטערת, אין לך הרשאה להשתמש בבוט זה.")
             return
 
-        await update.message.reply_text(
+        await self.reply(
+            update,
             "שלום! אני בוט שעוזר לנתח חדשות על מניות. 📈\n\n"
             "אתה יכול לשאול אותי שאלות כמו:\n"
             "• למה המניה של אפל יורדת?\n"
@@ -49,13 +147,14 @@ class StockNewsTelegramBot:
         פקודה להצגת מחזיקים מוסדיים
         """
         if not self.security.is_user_allowed(str(update.effective_user.id)):
-            await update.message.reply_text("מצטער, אין לך הרשאה להשתמש בבוט זה.")
+            await self.reply(update, "מצטער, אין לך הרשאה להשתמש בבוט זה.")
             return
 
         try:
             args = context.args
             if not args:
-                await update.message.reply_text(
+                await self.reply(
+                    update,
                     "אנא ציין את שם המניה. לדוגמה:\n"
                     "/holdings אפל\n"
                     "או\n"
@@ -67,27 +166,29 @@ class StockNewsTelegramBot:
             ticker = self.analyzer.get_ticker_from_text(stock_name)
 
             if not ticker:
-                await update.message.reply_text("לא הצלחתי לזהות את המניה המבוקשת.")
+                await self.reply(update, "לא הצלחתי לזהות את המניה המבוקשת.")
                 return
 
-            processing_message = await update.message.reply_text("מחפש מידע על מחזיקים מוסדיים... ⏳")
+            self.prefetch.record([ticker])
+            processing_message = await self.reply(update, "מחפש מידע על מחזיקים מוסדיים... ⏳")
             holdings_info = await self.institutional_analyzer.get_institutional_holdings(ticker)
-            await processing_message.edit_text(holdings_info)
+            await self.outbox.edit(processing_message, holdings_info)
 
         except Exception as e:
-            await update.message.reply_text(f"שגיאה בקבלת מידע על מחזיקים מוסדיים: {str(e)}")
+            await self.reply(update, f"שגיאה בקבלת מידע על מחזיקים מוסדיים: {str(e)}")
     async def earnings_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """
         הצגת מידע על earnings
         """
         if not self.security.is_user_allowed(str(update.effective_user.id)):
-            await update.message.reply_text("מצטער, אין לך הרשאה להשתמש בבוט זה.")
+            await self.reply(update, "מצטער, אין לך הרשאה להשתמש בבוט זה.")
             return
 
         try:
             args = context.args
             if not args:
-                await update.message.reply_text(
+                await self.reply(
+                    update,
                     "אנא ציין את שם המניה. לדוגמה:\n"
                     "/earnings אפל\n"
                     "או\n"
@@ -99,28 +200,30 @@ class StockNewsTelegramBot:
             ticker = self.analyzer.get_ticker_from_text(stock_name)
 
             if not ticker:
-                await update.message.reply_text("לא הצלחתי לזהות את המניה המבוקשת.")
+                await self.reply(update, "לא הצלחתי לזהות את המניה המבוקשת.")
                 return
 
-            processing_message = await update.message.reply_text("מחפש מידע על Earnings... ⏳")
+            self.prefetch.record([ticker])
+            processing_message = await self.reply(update, "מחפש מידע על Earnings... ⏳")
             earnings_info = await self.events_analyzer.get_earnings_info(ticker)
-            await processing_message.edit_text(earnings_info)
+            await self.outbox.edit(processing_message, earnings_info)
 
         except Exception as e:
-            await update.message.reply_text(f"שגיאה בקבלת מידע על earnings: {str(e)}")
+            await self.reply(update, f"שגיאה בקבלת מידע על earnings: {str(e)}")
 
     async def dividends_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """
         הצגת מידע על דיבידנדים
         """
         if not self.security.is_user_allowed(str(update.effective_user.id)):
-            await update.message.reply_text("מצטער, אין לך הרשאה להשתמש בבוט זה.")
+            await self.reply(update, "מצטער, אין לך הרשאה להשתמש בבוט זה.")
             return
 
         try:
             args = context.args
             if not args:
-                await update.message.reply_text(
+                await self.reply(
+                    update,
                     "אנא ציין את שם המניה. לדוגמה:\n"
                     "/dividends אפל\n"
                     "או\n"
@@ -132,19 +235,197 @@ class StockNewsTelegramBot:
             ticker = self.analyzer.get_ticker_from_text(stock_name)
 
             if not ticker:
-                await update.message.reply_text("לא הצלחתי לזהות את המניה המבוקשת.")
+                await self.reply(update, "לא הצלחתי לזהות את המניה המבוקשת.")
                 return
 
-            processing_message = await update.message.reply_text("מחפש מידע על דיבידנדים... ⏳")
+            self.prefetch.record([ticker])
+            processing_message = await self.reply(update, "מחפש מידע על דיבידנדים... ⏳")
             dividend_info = await self.events_analyzer.get_dividend_info(ticker)
-            await processing_message.edit_text(dividend_info)
+            await self.outbox.edit(processing_message, dividend_info)
+
+        except Exception as e:
+            await self.reply(update, f"שגיאה בקבלת מידע על דיבידנדים: {str(e)}")
+
+    async def aristocrats_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """
+        סינון המניות המוכרות לפי רצף שנות העלאת דיבידנד
+        """
+        if not self.security.is_user_allowed(str(update.effective_user.id)):
+            await self.reply(update, "מצטער, אין לך הרשאה להשתמש בבוט זה.")
+            return
 
+        try:
+            min_streak = int(context.args[0]) if context.args else 25
+            tickers = sorted(set(self.analyzer.stock_manager.stocks.values()))
+            processing_message = await self.reply(update, "מחפש מניות עם רצף העלאות דיבידנד... ⏳")
+            result = await self.events_analyzer.get_dividend_aristocrats(tickers, min_streak)
+            await self.outbox.edit(processing_message, result)
+
+        except ValueError:
+            await self.reply(update, "שימוש: /aristocrats [מספר שנים מינימלי]\nלדוגמה: /aristocrats 10")
         except Exception as e:
-            await update.message.reply_text(f"שגיאה בקבלת מידע על דיבידנדים: {str(e)}")
+            await self.reply(update, f"שגיאה בסינון מניות הדיבידנד: {str(e)}")
+
+    async def screen_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """
+        סינון כל המניות המוכרות לפי נתוני יסוד מהטבלה המקומית
+        """
+        if not self.security.is_user_allowed(str(update.effective_user.id)):
+            await self.reply(update, "מצטער, אין לך הרשאה להשתמש בבוט זה.")
+            return
+
+        try:
+            filters = parse_filters(" ".join(context.args or []))
+        except ScreenError as e:
+            await self.reply(
+                update,
+                f"{e}\n\n"
+                "שימוש: /screen תנאי [תנאי ...]\n"
+                "שדות: yield (%), cap, pe, price, type, sector, earnings (ימים לדוח), exdiv (ימים מהאקס)\n"
+                "לדוגמה:\n"
+                "/screen yield>3\n"
+                "/screen cap>100B pe<25\n"
+                "/screen type=ETF\n"
+                "/screen earnings<=7"
+            )
+            return
+
+        if self.fundamentals.frame.empty:
+            processing_message = await self.reply(update, "בונה טבלת נתוני יסוד לראשונה... ⏳")
+            await self.fundamentals.refresh(self.analyzer.stock_manager.stocks.values())
+        else:
+            processing_message = None
+
+        result = self.fundamentals.screen(filters)
+        if result.empty:
+            text = "לא נמצאו מניות שעונות על התנאים."
+        else:
+            lines = [f"🔎 {len(result)} מניות עונות על התנאים:"]
+            for symbol, row in result.head(MAX_SCREEN_RESULTS).iterrows():
+                details = []
+                if pd.notna(row['dividend_yield']):
+                    details.append(f"תשואה {row['dividend_yield'] * 100:.2f}%")
+                if pd.notna(row['market_cap']):
+                    details.append(f"שווי ${row['market_cap'] / 1e9:,.1f}B")
+                if pd.notna(row['pe']):
+                    details.append(f"מכפיל {row['pe']:.1f}")
+                if pd.notna(row['next_earnings']):
+                    details.append(f"דוח {row['next_earnings']:%d/%m}")
+                lines.append(f"• {symbol} - {row['name'] or symbol}" + (f" ({', '.join(details)})" if details else ""))
+            if len(result) > MAX_SCREEN_RESULTS:
+                lines.append(f"... ועוד {len(result) - MAX_SCREEN_RESULTS}")
+            text = "\n".join(lines)
+
+        if processing_message is not None:
+            await self.outbox.edit(processing_message, text)
+        else:
+            await self.reply(update, text)
+
+    async def watch_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """
+        הוספת מניה לרשימת המעקב עם התראות מחיר / תנועה / חדשות
+        """
+        user_id = str(update.effective_user.id)
+        if not self.security.is_user_allowed(user_id):
+            await self.reply(update, "מצטער, אין לך הרשאה להשתמש בבוט זה.")
+            return
+
+        stock_name, conditions = parse_watch_args(context.args or [])
+        if not stock_name:
+            await self.reply(
+                update,
+                "אנא ציין מניה ותנאים (אופציונלי). לדוגמה:\n"
+                "/watch אפל - חדשות ותנועה יומית של 5%\n"
+                "/watch AAPL >200 - מחיר מעל 200$\n"
+                "/watch AAPL <150 3% news"
+            )
+            return
+
+        ticker = self.analyzer.get_ticker_from_text(stock_name)
+        if not ticker:
+            await self.reply(update, "לא הצלחתי לזהות את המניה המבוקשת.")
+            return
+
+        self.prefetch.record([ticker])
+        added = []
+        for kind, threshold in conditions:
+            if await self.executor.run("watchlist", self.watchlists.add,
+                                       user_id, update.effective_chat.id, ticker, kind, threshold):
+                added.append(describe_condition(kind, threshold))
+        if added:
+            await self.reply(update, f"👀 {ticker} נוספה למעקב:\n" + "\n".join(f"• {line}" for line in added))
+        else:
+            await self.reply(update, f"ההתראות האלה על {ticker} כבר קיימות.")
+
+    async def unwatch_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """
+        הסרת מניה מרשימת המעקב
+        """
+        user_id = str(update.effective_user.id)
+        if not self.security.is_user_allowed(user_id):
+            await self.reply(update, "מצטער, אין לך הרשאה להשתמש בבוט זה.")
+            return
+
+        ticker = self.analyzer.get_ticker_from_text(" ".join(context.args or []))
+        if not ticker:
+            await self.reply(update, "אנא ציין את המניה להסרה. לדוגמה:\n/unwatch אפל")
+            return
+
+        if await self.executor.run("watchlist", self.watchlists.remove, user_id, ticker):
+            await self.reply(update, f"{ticker} הוסרה מרשימת המעקב.")
+        else:
+            await self.reply(update, f"{ticker} לא נמצאת ברשימת המעקב שלך.")
+
+    async def watchlist_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """
+        הצגת רשימת המעקב עם המחירים העדכניים
+        """
+        user_id = str(update.effective_user.id)
+        if not self.security.is_user_allowed(user_id):
+            await self.reply(update, "מצטער, אין לך הרשאה להשתמש בבוט זה.")
+            return
+
+        subscriptions = await self.executor.run("watchlist", self.watchlists.user_subscriptions, user_id)
+        if not subscriptions:
+            await self.reply(update, "רשימת המעקב שלך ריקה. הוספה: /watch שם-המניה")
+            return
+
+        by_ticker: Dict[str, List[str]] = {}
+        for subscription in subscriptions:
+            by_ticker.setdefault(subscription['ticker'], []).append(
+                describe_condition(subscription['kind'], subscription['threshold']))
+        quotes = await self.analyzer.get_stock_quotes(list(by_ticker))
+
+        lines = ["👀 רשימת המעקב שלך:"]
+        for ticker, conditions in by_ticker.items():
+            quote = quotes.get(ticker)
+            price = (f" - ${quote['current_price']:,.2f} ({quote['percent_change']:+.2f}%)"
+                     if quote and quote.get('current_price') is not None and quote.get('percent_change') is not None
+                     else "")
+            lines.append(f"\n{ticker}{price}")
+            lines += [f"• {condition}" for condition in conditions]
+        await self.reply(update, "\n".join(lines))
+
+    async def _refresh_fundamentals(self, context: ContextTypes.DEFAULT_TYPE):
+        """
+        רענון תקופתי של טבלת נתוני היסוד (משימת רקע)
+        """
+        count = await self.fundamentals.refresh(self.analyzer.stock_manager.stocks.values())
+        print(f"טבלת נתוני היסוד רועננה: {count} מניות")
+
+    async def _refresh_fundamental_prices(self, context: ContextTypes.DEFAULT_TYPE):
+        """
+        עדכון המחיר והשווי בטבלת נתוני היסוד ממחירים מרוכזים (משימת רקע)
+        """
+        symbols = self.fundamentals.frame.index.tolist()
+        quotes = {}
+        for start in range(0, len(symbols), PRICE_BATCH):
+            quotes.update(await self.analyzer.get_stock_quotes(symbols[start:start + PRICE_BATCH]))
+        await self.fundamentals.apply_quotes(quotes)
 
     async def help_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         if not self.security.is_user_allowed(str(update.effective_user.id)):
-            await update.message.reply_text("מצטער, אין לך הרשאה להשתמש בבוט זה.")
+            await self.reply(update, "מצטער, אין לך הרשאה להשתמש בבוט זה.")
             return
 
         help_text = (
@@ -154,6 +435,12 @@ class StockNewsTelegramBot:
             "/earnings [מניה] - מידע על earnings\n"
             "/dividends [מניה] - מידע על דיבידנדים\n"
             "/holdings [מניה] - מידע על מחזיקים מוסדיים\n"
+            "/aristocrats [שנים] - מניות עם רצף העלאות דיבידנד\n"
+            "/screen [תנאים] - סינון מניות (למשל yield>3 cap>10B)\n"
+            "/compare [מניה] [מניה] ... - השוואה בין מניות\n"
+            "/watch [מניה] [>מחיר] [<מחיר] [אחוז%] [news] - התראות על מניה\n"
+            "/unwatch [מניה] - הסרה מרשימת המעקב\n"
+            "/watchlist - רשימת המעקב שלך\n"
             "/usage - הצגת נתוני שימוש ועלויות\n"
             "/help - הצגת עזרה זו\n"
         )
@@ -163,22 +450,25 @@ class StockNewsTelegramBot:
                 "\n👑 פקודות מנהל:\n"
                 "/addstock שם-המניה SYMBOL - הוספת מניה חדשה\n"
                 "/removestock שם-המניה - הסרת מניה מהרשימה\n"
-                "/admin - ניהול משתמשים\n"
+                "/admin - ניהול משתמשים (add/remove/cache/startup)\n"
+                "/stats - זמני תגובה ושגיאות לפי שלב\n"
             )
 
-        await update.message.reply_text(help_text)
+        await self.reply(update, help_text)
     async def usage_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """
         הצגת נתוני שימוש למשתמש
         """
         if not self.security.is_user_allowed(str(update.effective_user.id)):
-            await update.message.reply_text("מצטערת, אין לך הרשאה להשתמש בבוט זה.")
+            await self.reply(update, "מצטערת, אין לך הרשאה להשתמש בבוט זה.")
             return
 
         usage = self.security.get_user_usage(str(update.effective_user.id))
-        await update.message.reply_text(
+        await self.reply(
+            update,
             f"📊 נתוני שימוש:\n"
             f"• עלות יומית: ${usage['daily_cost']:.4f}\n"
+            f"• שמור לבקשות בתהליך: ${usage['reserved']:.4f}\n"
             f"• תקציב נותר: ${usage['remaining_budget']:.4f}\n"
             f"• מגבלת עלות לבקשה: ${self.security.max_request_cost:.4f}\n"
             f"• מגבלת עלות יומית: ${self.security.daily_limit:.2f}"
@@ -187,168 +477,362 @@ class StockNewsTelegramBot:
         user_id = str(update.effective_user.id)
 
         if not self.security.is_user_allowed(user_id):
-            await update.message.reply_text("מצטערת, אין לך הרשאה להשתמש בבוט זה.")
+            await self.reply(update, "מצטערת, אין לך הרשאה להשתמש בבוט זה.")
             return
 
         user_text = update.message.text
 
         if context.user_data.get('awaiting_confirmation'):
-            await self.process_confirmation(update, context)
+            with tracer.span("answer", ticker=context.user_data['pending_analysis']['ticker']):
+                await self.process_confirmation(update, context)
             return
 
-        ticker = self.analyzer.get_ticker_from_text(user_text)
-        if not ticker:
-            await update.message.reply_text("לא הצלחתי לזהות את שם החברה. אנא נסה שוב עם שם חברה ברור.")
+        tickers = self.analyzer.get_tickers_from_text(user_text)
+        if not tickers:
+            await self.reply(update, "לא הצלחתי לזהות את שם החברה. אנא נסה שוב עם שם חברה ברור.")
+            return
+        self.prefetch.record(tickers)
+
+        reused = self.analyzer.semantic_cache.lookup(",".join(tickers), user_text)
+        if reused is not None:
+            # שאלה דומה נענתה לאחרונה - בלי הבאת נתונים ובלי קריאה ל-GPT
+            usage = self.security.get_user_usage(user_id)
+            reply = StreamingReply(await self.reply(update, f"♻️ ניתוח עדכני לשאלה דומה: \"{reused['question']}\""),
+                                   self.outbox)
+            await reply.finish(
+                f"{reused['answer']}"
+                f"\n\n💰 סיכום עלויות:\n"
+                f"• תשובה מהמטמון - עלות: $0.0000\n"
+                f"• תקציב יומי נותר: ${usage['remaining_budget']:.4f}"
+            )
             return
 
         try:
-            await self.prepare_analysis(update, context, ticker, user_text)
+            with tracer.span("prepare_analysis", ticker=",".join(tickers)):
+                await self.prepare_analysis(update, context, tickers, user_text)
         except Exception as e:
-            await update.message.reply_text(f"מצטערת, נתקלתי בשגיאה: {str(e)}")
-    async def prepare_analysis(self, update: Update, context: ContextTypes.DEFAULT_TYPE, ticker: str, question: str):
-        try:
-            stock_info = self.analyzer.get_stock_info(ticker)
-            news = self.analyzer.fetch_news(ticker)
+            await self.reply(update, f"מצטערת, נתקלתי בשגיאה: {str(e)}")
 
-            context_text = f"""
-מידע על המניה {stock_info['name']} ({ticker}):
-- מחיר נוכחי: ${stock_info['current_price']}
-- שינוי באחוזים: {stock_info['percent_change']}%
+    async def compare_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """
+        השוואה בין כמה מניות בפרומפט אחד
+        """
+        if not self.security.is_user_allowed(str(update.effective_user.id)):
+            await self.reply(update, "מצטער, אין לך הרשאה להשתמש בבוט זה.")
+            return
 
-חדשות אחרונות:
-"""
-            for item in news:
-                context_text += f"""
-- {item['title']}
-  מקור: {item['source']}
-  תקציר: {item['summary'][:200]}...
-"""
+        tickers = self.analyzer.get_tickers_from_text(" ".join(context.args or []))
+        if len(tickers) < 2:
+            await self.reply(
+                update,
+                "אנא ציין לפחות שתי מניות להשוואה. לדוגמה:\n"
+                "/compare אפל מיקרוסופט\n"
+                "או\n"
+                "/compare AAPL MSFT NVDA"
+            )
+            return
 
-            prompt = f"""בהתבסס על המידע הבא, אנא ענה על השאלה: "{question}"
+        self.prefetch.record(tickers)
+        question = f"השווה בין המניות {', '.join(tickers)}: מה המצב של כל אחת ומה ההבדלים ביניהן?"
+        try:
+            with tracer.span("prepare_analysis", ticker=",".join(tickers)):
+                await self.prepare_analysis(update, context, tickers, question)
+        except Exception as e:
+            await self.reply(update, f"מצטערת, נתקלתי בשגיאה: {str(e)}")
 
-{context_text}
+    async def prepare_analysis(self, update: Update, context: ContextTypes.DEFAULT_TYPE, tickers: List[str], question: str):
+        try:
+            if len(tickers) == 1:
+                ticker = tickers[0]
+                stock_info, ticker_news = await self.analyzer.gather_market_data(ticker)
+                quotes = {ticker: stock_info} if stock_info is not None else {}
+                news = {ticker: ticker_news}
+                prompt, input_tokens = self.analyzer.build_prompt(ticker, question, stock_info, ticker_news)
+            else:
+                quotes, news = await self.analyzer.gather_comparison_data(tickers)
+                prompt, input_tokens = self.analyzer.build_comparison_prompt(tickers, question, quotes, news)
 
-אנא תן תשובה מקיפה בעברית שמסבירה את המצב בצורה ברורה."""
+            if not quotes and all(items is None for items in news.values()):
+                await self.reply(update, "לא הצלחתי לקבל נתונים עדכניים על המניה. אנא נסה שוב בעוד מספר דקות.")
+                return
 
-            input_tokens = self.analyzer.cost_calculator.estimate_tokens(prompt)
-            cost_estimate = self.analyzer.cost_calculator.calculate_cost(input_tokens)
+            cache_key = self.response_cache.make_key(question, tickers, quotes, news)
 
-            can_request, message = self.security.can_make_request(
-                str(update.effective_user.id),
-                cost_estimate['total_cost']
-            )
+            model = self.analyzer.router.choose(question, tickers, input_tokens)
+            cost_estimate = self.analyzer.estimate_cost(input_tokens, model)
+            cached = self.response_cache.peek(cache_key) is not None
+            if cached:
+                # תשובה זהה כבר קיימת במטמון - לא תהיה עלות
+                cost_estimate = self.analyzer.cost_calculator.calculate_cost(0, 0)
+            else:
+                can_request, message = self.security.can_make_request(
+                    str(update.effective_user.id),
+                    cost_estimate['total_cost']
+                )
 
-            if not can_request:
-                await update.message.reply_text(f"❌ {message}")
-                return
+                if not can_request:
+                    await self.reply(update, f"❌ {message}")
+                    return
 
             context.user_data['pending_analysis'] = {
                 'prompt': prompt,
-                'cost_estimate': cost_estimate
+                'input_tokens': input_tokens,
+                'cost_estimate': cost_estimate,
+                'cache_key': cache_key,
+                'ticker': ",".join(tickers),
+                'question': question,
+                'model': model
             }
             context.user_data['awaiting_confirmation'] = True
 
             usage = self.security.get_user_usage(str(update.effective_user.id))
+            cache_note = "♻️ ניתוח זהה זמין מהמטמון - ללא עלות.\n" if cached else ""
+            # הסימול ושם החברה שזוהו, כדי שהמשתמש יוכל לבטל אם הבוט הבין מניה אחרת
+            companies = ", ".join(
+                f"{quotes[ticker]['name']} ({ticker})" if quotes.get(ticker, {}).get('name') not in (None, ticker)
+                else ticker
+                for ticker in tickers
+            )
 
             confirmation_message = (
+                f"🏢 {'מניה' if len(tickers) == 1 else 'מניות'}: {companies}\n\n"
                 f"📊 הערכת עלויות:\n"
                 f"• טוקנים בשאילתה: {cost_estimate['input_tokens']:,}\n"
                 f"• טוקנים משוערים בתשובה: {cost_estimate['output_tokens']:,}\n"
-                f"• עלות משוערת: ${cost_estimate['total_cost']:.4f}\n"
+                f"• עלות משוערת: ${cost_estimate['total_cost']:.4f} ({model})\n"
                 f"• תקציב יומי נותר: ${usage['remaining_budget']:.4f}\n\n"
+                f"{cache_note}"
                 f"האם להמשיך עם הניתוח? (כן/לא)"
             )
-            await update.message.reply_text(confirmation_message)
+            await self.reply(update, confirmation_message)
 
         except Exception as e:
-            await update.message.reply_text(f"שגיאה בהכנת הניתוח: {str(e)}")
+            await self.reply(update, f"שגיאה בהכנת הניתוח: {str(e)}")
     async def process_confirmation(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         response = update.message.text.lower()
         if response not in ['כן', 'yes', 'y', 'כ']:
-            await update.message.reply_text("הניתוח בוטל.")
+            await self.reply(update, "הניתוח בוטל.")
             context.user_data.clear()
             return
 
-        processing_message = await update.message.reply_text("מעבד את הבקשה... ⏳")
+        pending = context.user_data['pending_analysis']
+        user_id = str(update.effective_user.id)
 
-        try:
-            response = self.analyzer.client.chat.completions.create(
-                model="gpt-4",
-                messages=[
-                    {"role": "system",
-                     "content": "אתה אנליסט פיננסי מומחה שמנתח מניות ומסביר מגמות בשוק ההון בעברית ברורה."},
-                    {"role": "user", "content": context.user_data['pending_analysis']['prompt']}
-                ]
+        cached = self.response_cache.get(pending['cache_key'])
+        if cached is not None:
+            usage = self.security.get_user_usage(user_id)
+            reply = StreamingReply(await self.reply(update, "♻️ ניתוח מהמטמון:"), self.outbox)
+            await reply.finish(
+                f"{cached['answer']}"
+                f"\n\n💰 סיכום עלויות:\n"
+                f"• תשובה מהמטמון - עלות: $0.0000\n"
+                f"• תקציב יומי נותר: ${usage['remaining_budget']:.4f}"
             )
+            context.user_data.clear()
+            return
 
-            actual_cost = self.analyzer.cost_calculator.calculate_cost(
-                response.usage.prompt_tokens,
-                response.usage.completion_tokens
-            )
+        # שמירה אטומית של העלות המשוערת - כמה אישורים במקביל לא יכולים לעבור את התקציב היומי
+        estimated_cost = pending['cost_estimate']['total_cost']
+        if estimated_cost == 0:
+            # התשובה פגה מהמטמון מאז ההערכה
+            estimated_cost = self.analyzer.estimate_cost(pending['input_tokens'], pending['model'])['total_cost']
+        reservation_id, message = await self.security.reserve_budget(user_id, estimated_cost)
+        if reservation_id is None:
+            await self.reply(update, f"❌ {message}")
+            context.user_data.clear()
+            return
 
-            self.security.update_usage(str(update.effective_user.id), actual_cost['total_cost'])
-            usage = self.security.get_user_usage(str(update.effective_user.id))
+        processing_message = await self.reply(update, "מעבד את הבקשה... ⏳")
+        reply = StreamingReply(processing_message, self.outbox)
+        # המודל שעונה בפועל (יכול להתחלף במודל הגיבוי)
+        model = pending['model']
+
+        try:
+            prompt = pending['prompt']
+            usage_chunk = None
+            async for delta, chunk_usage, model in self.analyzer.stream_completion(prompt, model):
+                if delta:
+                    await reply.append(delta)
+                if chunk_usage is not None:
+                    usage_chunk = chunk_usage
+
+            if usage_chunk is not None:
+                prompt_tokens, completion_tokens = usage_chunk.prompt_tokens, usage_chunk.completion_tokens
+            else:
+                # גיבוי אם השירות לא החזיר usage בסוף ה-stream
+                prompt_tokens = pending['input_tokens']
+                completion_tokens = self.analyzer.cost_calculator.estimate_tokens(reply.text)
+
+            actual_cost = self.analyzer.cost_calculator.calculate_cost(prompt_tokens, completion_tokens, model)
+            self.response_cache.set(pending['cache_key'], reply.text, actual_cost['total_cost'])
+            self.analyzer.semantic_cache.add(pending['ticker'], pending['question'], reply.text, actual_cost['total_cost'])
+
+            await self.security.commit_usage(reservation_id, actual_cost['total_cost'])
+            usage = self.security.get_user_usage(user_id)
 
-            answer = response.choices[0].message.content
             cost_summary = (
                 f"\n\n💰 סיכום עלויות:\n"
-                f"• טוקנים בשאילתה: {response.usage.prompt_tokens:,}\n"
-                f"• טוקנים בתשובה: {response.usage.completion_tokens:,}\n"
+                f"• טוקנים בשאילתה: {prompt_tokens:,}\n"
+                f"• טוקנים בתשובה: {completion_tokens:,}\n"
                 f"• עלות: ${actual_cost['total_cost']:.4f}\n"
                 f"• תקציב יומי נותר: ${usage['remaining_budget']:.4f}"
             )
 
-            await processing_message.edit_text(f"{answer}{cost_summary}")
+            await reply.finish(cost_summary)
 
         except Exception as e:
-            await processing_message.edit_text(f"שגיאה בביצוע הניתוח: {str(e)}")
+            if reply.text.strip():
+                # חלק מהתשובה כבר נוצר ונוכה מהמכסה - חיוב לפי הערכה של מה שנוצר
+                partial_cost = self.analyzer.cost_calculator.calculate_cost(
+                    pending['input_tokens'], self.analyzer.cost_calculator.estimate_tokens(reply.text), model)
+                await self.security.commit_usage(reservation_id, partial_cost['total_cost'])
+                await reply.finish(f"\n\n⚠️ שגיאה בביצוע הניתוח: {str(e)}")
+            else:
+                await self.security.release_budget(reservation_id)
+                await self.outbox.edit(processing_message, f"שגיאה בביצוע הניתוח: {str(e)}")
         finally:
             context.user_data.clear()
     async def admin_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         if not self.security.is_user_admin(str(update.effective_user.id)):
-            await update.message.reply_text("מצטערתת, אין לך הרשאה לבצע פעולה זו.")
+            await self.reply(update, "מצטערתת, אין לך הרשאה לבצע פעולה זו.")
             return
         if not context.args:
-            await update.message.reply_text("אנא ציין פעולה לביצוע.")
+            await self.reply(update, "אנא ציין פעולה לביצוע.")
             return
         command = context.args[0]
         if command == 'add':
             if len(context.args) < 2:
-                await update.message.reply_text("אנא ציין את המשתמש שברצונך להוסיף.")
+                await self.reply(update, "אנא ציין את המשתמש שברצונך להוסיף.")
                 return
             user_id = context.args[1]
             if self.security.add_user(user_id, str(update.effective_user.id)):
-                await update.message.reply_text(f"המשתמש {user_id} הוסף בהצלחה.")
+                await self.reply(update, f"המשתמש {user_id} הוסף בהצלחה.")
             else:
-                await update.message.reply_text(f"המשתמש {user_id} כבר קיים ברשימת המשתמשים.")
+                await self.reply(update, f"המשתמש {user_id} כבר קיים ברשימת המשתמשים.")
         elif command == 'remove':
             if len(context.args) < 2:
-                await update.message.reply_text("אנא ציין את המשתמש שברצונך להסיר.")
+                await self.reply(update, "אנא ציין את המשתמש שברצונך להסיר.")
                 return
             user_id = context.args[1]
             if self.security.remove_user(user_id, str(update.effective_user.id)):
-                await update.message.reply_text(f"המשתמש {user_id} הוסר בהצלחה.")
+                await self.reply(update, f"המשתמש {user_id} הוסר בהצלחה.")
             else:
-                await update.message.reply_text(f"המשתמש {user_id} לא נמצא ברשימת המשתמשים.")
+                await self.reply(update, f"המשתמש {user_id} לא נמצא ברשימת המשתמשים.")
+        elif command == 'cache':
+            stats = self.cache.stats()
+            lines = [
+                "🗄 סטטיסטיקות מטמון נתוני שוק:",
+                f"• רשומות: {stats['size']}/{stats['max_entries']}",
+                f"• אחוז פגיעה: {stats['hit_rate'] * 100:.1f}%",
+                f"• פינויים: {stats['evictions']}",
+                f"• בקשות שאוחדו: {stats['coalesced']}",
+                f"• פגיעות מהדיסק: {stats['disk_hits']}"
+            ]
+            for kind, counters in stats['by_kind'].items():
+                lines.append(f"• {kind}: {counters['hits']} פגיעות / {counters['misses']} החטאות")
+            responses = self.response_cache.stats()
+            lines += [
+                "\n🤖 מטמון תשובות GPT:",
+                f"• תשובות שמורות: {responses['size']}",
+                f"• אחוז פגיעה: {responses['hit_rate'] * 100:.1f}%",
+                f"• חיסכון מצטבר: ${responses['saved_cost']:.4f}"
+            ]
+            semantic = self.analyzer.semantic_cache.stats()
+            lines += [
+                "\n🧠 שימוש חוזר בשאלות דומות:",
+                f"• תשובות באינדקס: {semantic['entries']} ({semantic['tickers']} מניות)",
+                f"• אחוז פגיעה: {semantic['hit_rate'] * 100:.1f}% מתוך {semantic['lookups']} שאלות",
+                f"• חיסכון מצטבר: ${semantic['saved_cost']:.4f}",
+                f"• סף דמיון: {semantic['threshold']}"
+            ]
+            limiter = self.analyzer.alpha_vantage_limiter.stats()
+            lines += [
+                "\n📰 מגבלת קצב Alpha Vantage:",
+                f"• tokens פנויים: {limiter['tokens']:.1f}/{limiter['capacity']}",
+                f"• בקשות שהמתינו בתור: {limiter['queued']} (ממתינות כעת: {limiter['waiting']})",
+                f"• בקשות שנחסמו: {limiter['throttled']}",
+                f"• חדשות ישנות שהוגשו מהמטמון: {limiter['served_stale']}"
+            ]
+            prefetch = self.prefetch.stats()
+            lines += [
+                "\n🔥 רענון ברקע:",
+                f"• מניות חמות: {', '.join(prefetch['hot']) or 'אין'}",
+                f"• רענונים: {', '.join(f'{kind}={count}' for kind, count in prefetch['refreshed'].items()) or 'אין'}",
+                f"• דילוגים בגלל תקרת קריאות ({prefetch['calls_per_minute']}/דקה): {prefetch['skipped']}"
+            ]
+            outbox = self.outbox.stats()
+            lines += [
+                "\n📤 תור השליחה לטלגרם:",
+                f"• בתור כעת: {outbox['depth']} (שיא: {outbox['max_depth']})",
+                f"• הודעות: {outbox['sent']}, עריכות: {outbox['edited']}, עריכות שאוחדו: {outbox['coalesced']}",
+                f"• זמן עד שליחה: p50 {outbox['latency_p50'] * 1000:.0f}ms, p95 {outbox['latency_p95'] * 1000:.0f}ms",
+                f"• RetryAfter: {outbox['retries']} ניסיונות חוזרים, {outbox['failed']} כשלונות"
+            ]
+            alerts = self.alerts.stats()
+            lines += [
+                "\n🔔 מנוע ההתראות:",
+                f"• סבבים: {alerts['ticks']} (האחרון: {alerts['last_tick_seconds'] * 1000:.0f}ms)",
+                f"• מניות שנבדקו: {alerts['tickers_checked']}",
+                f"• התראות שנשלחו: {alerts['alerts_sent']}"
+            ]
+            await self.reply(update, "\n".join(lines))
+        elif command == 'startup':
+            lines = ["⏱ זמן עלייה:"]
+            if self.startup_seconds is not None:
+                lines.append(f"• עד האזנה להודעות: {self.startup_seconds:.2f} שניות")
+            for name, seconds in self.warmup_seconds.items():
+                lines.append(f"• טעינת {name} ברקע: {seconds:.2f} שניות")
+            await self.reply(update, "\n".join(lines))
         else:
-            await update.message.reply_text(f" הפקודה {command}עדיין לא נתמכת.")
+            await self.reply(update, f" הפקודה {command}עדיין לא נתמכת.")
+    async def stats_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """
+        זמני תגובה לכל שלב (p50/p95/p99) ושיעור השגיאות של השירותים החיצוניים - למנהלים
+        """
+        if not self.security.is_user_admin(str(update.effective_user.id)):
+            await self.reply(update, "מצטערת, אין לך הרשאה לבצע פעולה זו.")
+            return
+
+        stats = tracer.stats()
+        if not stats:
+            await self.reply(update, "אין עדיין מדידות.")
+            return
+        lines = ["⏱ זמנים לפי שלב (p50 / p95 / p99):"]
+        for stage, values in stats.items():
+            lines.append(
+                f"• {stage}: {values['p50'] * 1000:.0f} / {values['p95'] * 1000:.0f} / {values['p99'] * 1000:.0f}ms"
+                f" ({values['count']} פעמים, {values['error_rate'] * 100:.1f}% שגיאות)"
+            )
+        routing = self.analyzer.router.stats()
+        if routing['routed']:
+            lines.append("\n🧭 ניתוב מודלים:")
+            lines += [f"• {model}: {count} שאלות" for model, count in sorted(routing['routed'].items())]
+            lines += [f"• גיבוי {path}: {count}" for path, count in sorted(routing['fallbacks'].items())]
+            if routing['cooling_down']:
+                lines.append(f"• בהמתנה אחרי 429: {', '.join(routing['cooling_down'])}")
+        error_rates = tracer.upstream_error_rates()
+        if error_rates:
+            lines.append("\n🌐 שיעור שגיאות בשירותים חיצוניים:")
+            lines += [f"• {upstream}: {rate * 100:.1f}%" for upstream, rate in sorted(error_rates.items())]
+        await self.reply(update, "\n".join(lines))
+
     async def stocks_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """
         הצגת רשימת המניות המוכרות
         """
         if not self.security.is_user_allowed(str(update.effective_user.id)):
-            await update.message.reply_text("מצטערת, אין לך הרשאה להשתמש בבוט זה.")
+            await self.reply(update, "מצטערת, אין לך הרשאה להשתמש בבוט זה.")
             return
 
         stocks_list = self.analyzer.stock_manager.get_all_stocks()
-        await update.message.reply_text(stocks_list)
+        await self.reply(update, stocks_list)
 
     async def add_stock_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """
         הוספת מניה חדשה
         """
         if not self.security.is_user_admin(str(update.effective_user.id)):
-            await update.message.reply_text("רק מנהלים יכולים להוסיף מניות חדשות.")
+            await self.reply(update, "רק מנהלים יכולים להוסיף מניות חדשות.")
             return
 
         try:
@@ -360,11 +844,17 @@ class StockNewsTelegramBot:
             if not name or not symbol:
                 raise IndexError
 
-            success, message = self.analyzer.stock_manager.add_stock(name, symbol)
-            await update.message.reply_text(message)
+            # רק בדיקת הסימול רצה ב-executor; העדכון של ה-matcher נעשה כאן, ב-event loop שגם מחפש בו
+            error = await self.executor.run("yahoo", self.analyzer.stock_manager.validate_symbol, symbol)
+            if error:
+                await self.reply(update, error)
+                return
+            success, message = self.analyzer.stock_manager.add_stock(name, symbol, validate=False)
+            await self.reply(update, message)
 
         except IndexError:
-            await update.message.reply_text(
+            await self.reply(
+                update,
                 "שימוש שגוי. הפורמט הנכון הוא:\n"
                 "/addstock שם-המניה SYMBOL\n"
                 "לדוגמה: /addstock גוגל GOOGL"
@@ -375,7 +865,7 @@ class StockNewsTelegramBot:
         הסרת מניה מהרשימה
         """
         if not self.security.is_user_admin(str(update.effective_user.id)):
-            await update.message.reply_text("רק מנהלים יכולים להסיר מניות.")
+            await self.reply(update, "רק מנהלים יכולים להסיר מניות.")
             return
 
         try:
@@ -384,20 +874,78 @@ class StockNewsTelegramBot:
                 raise IndexError
 
             success, message = self.analyzer.stock_manager.remove_stock(name)
-            await update.message.reply_text(message)
+            await self.reply(update, message)
 
         except IndexError:
-            await update.message.reply_text(
+            await self.reply(
+                update,
                 "שימוש שגוי. הפורמט הנכון הוא:\n"
                 "/removestock שם-המניה\n"
                 "לדוגמה: /removestock גוגל"
             )
     
+    async def _on_startup(self, application: Application):
+        """
+        מדידת זמן העלייה והפעלת טעינת הרקע של המודולים הכבדים וה-tokenizer
+        """
+        self.startup_seconds = time.perf_counter() - self.started_at
+        print(f"הבוט עלה תוך {self.startup_seconds:.2f} שניות")
+        metrics_port = int(os.getenv("METRICS_PORT", "0"))
+        if metrics_port:
+            # כל worker במצב webhook מגיש את המדדים שלו בפורט משלו
+            self.metrics_server = start_metrics_server(metrics_port + (self.worker_index or 0))
+        application.create_task(self._warmup())
+
+    async def _warmup(self):
+        started = time.perf_counter()
+        self.warmup_seconds = await self.executor.run("warmup", warmup, WARMUP_MODULES)
+        for name, prepare in (("tokenizer", self.analyzer.cost_calculator.warmup),
+                              ("openai client", lambda: self.analyzer.client)):
+            step_started = time.perf_counter()
+            try:
+                await self.executor.run("warmup", prepare)
+            except Exception as e:
+                print(f"שגיאה בטעינת {name} ברקע: {e}")
+            self.warmup_seconds[name] = time.perf_counter() - step_started
+        print(f"טעינת הרקע הסתיימה תוך {time.perf_counter() - started:.2f} שניות")
+
+    async def _on_shutdown(self, application: Application):
+        """
+        שחרור משאבים בסגירת הבוט
+        """
+        await self.http.close()
+        self.executor.shutdown()
+        if self.metrics_server is not None:
+            self.metrics_server.shutdown()
+        if self.cache.disk is not None:
+            self.cache.disk.close()
+
     def run(self):
         """
         הפעלת הבוט
         """
         self.application.run_polling()
+
+    async def serve_queue(self, queue):
+        """
+        לולאת ה-worker במצב webhook: העדכונים מהתור נכנסים ל-update_queue של האפליקציה,
+        ומעובדים כמו במצב polling - במקביל בין משתמשים ולפי הסדר לכל משתמש (PerUserUpdateProcessor)
+        """
+        await self.application.initialize()
+        await self.application.start()
+        await self._on_startup(self.application)
+        try:
+            while True:
+                data = await self.executor.run("webhook", queue.get)
+                if data is None:
+                    break
+                await self.application.update_queue.put(Update.de_json(data, self.application.bot))
+        finally:
+            # stop() מחכה לסיום כל העדכונים שכבר בתור
+            await self.application.stop()
+            await self.application.shutdown()
+            await self._on_shutdown(self.application)
+
 def load_environment():
     """
     טעינת משתני הסביבה מקובץ .env
@@ -428,14 +976,24 @@ def load_environment():
         'max_request_cost': float(os.getenv('MAX_REQUEST_COST', '0.1'))
     }
 
-def main():
+def main(started_at: Optional[float] = None):
     try:
         env = load_environment()
-        
+
+        if os.getenv("BOT_MODE", "polling") == "webhook":
+            from app.webhook_server import serve
+            print("הבוט מופעל במצב webhook! 🚀")
+            secret_token = os.getenv('WEBHOOK_SECRET')
+            if not secret_token:
+                raise ValueError("Missing required environment variable for webhook mode: WEBHOOK_SECRET")
+            serve(env['telegram_token'], os.environ['WEBHOOK_URL'], secret_token, started_at=started_at)
+            return
+
         bot = StockNewsTelegramBot(
             telegram_token=env['telegram_token'],
             azure_api_key=env['azure_api_key'],
-            alpha_vantage_key=env['alpha_vantage_key']
+            alpha_vantage_key=env['alpha_vantage_key'],
+            started_at=started_at
         )
         
         print("הבוט מופעל! 🚀")
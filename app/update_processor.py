@@ -0,0 +1,57 @@
+import asyncio
+import os
+from typing import Any, Awaitable, Dict, Optional
+
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+
+# כמה עדכונים מעובדים במקביל (בין משתמשים שונים)
+DEFAULT_CONCURRENT_UPDATES = 256
+
+
+def update_key(update: object) -> Optional[int]:
+    """
+    המשתמש (או הצ'אט) שהעדכון שייך לו - None לעדכונים שאינם Update
+    """
+    if not isinstance(update, Update):
+        return None
+    if update.effective_user is not None:
+        return update.effective_user.id
+    if update.effective_chat is not None:
+        return update.effective_chat.id
+    return 0
+
+
+class PerUserUpdateProcessor(BaseUpdateProcessor):
+    def __init__(self, max_concurrent_updates: Optional[int] = None):
+        """
+        עיבוד עדכונים במקביל בין משתמשים, ולפי הסדר עבור כל משתמש (נעילה לכל משתמש,
+        שנמחקת כשאין לו עדכונים ממתינים) - כך שאישור/ביטול תמיד מגיע אחרי השאלה
+        """
+        super().__init__(max_concurrent_updates or int(os.getenv("MAX_CONCURRENT_UPDATES",
+                                                                  str(DEFAULT_CONCURRENT_UPDATES))))
+        self._locks: Dict[int, asyncio.Lock] = {}
+        self._pending: Dict[int, int] = {}
+
+    async def do_process_update(self, update: object, coroutine: Awaitable[Any]) -> None:
+        key = update_key(update)
+        if key is None:
+            await coroutine
+            return
+
+        lock = self._locks.setdefault(key, asyncio.Lock())
+        self._pending[key] = self._pending.get(key, 0) + 1
+        try:
+            async with lock:
+                await coroutine
+        finally:
+            self._pending[key] -= 1
+            if not self._pending[key]:
+                del self._pending[key]
+                del self._locks[key]
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        pass
@@ -0,0 +1,168 @@
+import asyncio
+import hmac
+import json
+import multiprocessing
+import os
+from typing import Dict, List, Optional
+from urllib.parse import urlsplit
+
+from telegram import Bot, Update
+
+# סוגי העדכונים שבהם המשתמש נמצא ב-"from" של האובייקט הפנימי
+USER_UPDATE_FIELDS = ("message", "edited_message", "callback_query", "inline_query", "chosen_inline_result",
+                      "shipping_query", "pre_checkout_query", "poll_answer", "my_chat_member", "chat_member",
+                      "chat_join_request")
+
+
+def update_user_id(update: Dict) -> int:
+    """
+    מזהה המשתמש של עדכון (JSON גולמי מטלגרם) - 0 לעדכונים בלי משתמש
+    """
+    for field in USER_UPDATE_FIELDS:
+        payload = update.get(field)
+        if isinstance(payload, dict):
+            user = payload.get("from") or payload.get("user")
+            if isinstance(user, dict) and "id" in user:
+                return int(user["id"])
+    return 0
+
+
+def run_worker(index: int, workers: int, queue: "multiprocessing.Queue", started_at: Optional[float]) -> None:
+    """
+    תהליך worker: בוט מלא בלי polling שמעבד את העדכונים שמגיעים בתור שלו
+    """
+    from app.telegram_bot import StockNewsTelegramBot, load_environment
+
+    env = load_environment()
+    bot = StockNewsTelegramBot(
+        telegram_token=env['telegram_token'],
+        azure_api_key=env['azure_api_key'],
+        alpha_vantage_key=env['alpha_vantage_key'],
+        started_at=started_at,
+        worker_index=index,
+        workers=workers
+    )
+    asyncio.run(bot.serve_queue(queue))
+
+
+class WebhookServer:
+    def __init__(self, telegram_token: str, webhook_url: str, secret_token: str,
+                 workers: Optional[int] = None, path: Optional[str] = None, started_at: Optional[float] = None):
+        """
+        אפליקציית ASGI שמקבלת עדכונים מטלגרם ומחלקת אותם לתהליכי worker לפי מזהה המשתמש,
+        כך שכל העדכונים של משתמש (כולל אישור הבקשה ב-user_data) מטופלים באותו תהליך ולפי הסדר.
+        secret_token חובה - בלעדיו כל אחד יכול לשלוח לשרת עדכונים מזויפים
+        """
+        if not secret_token:
+            raise ValueError("WEBHOOK_SECRET חסר - מצב webhook דורש secret token")
+        self.telegram_token = telegram_token
+        self.webhook_url = webhook_url
+        self.secret_token = secret_token
+        self.workers = workers or int(os.getenv("WEBHOOK_WORKERS", str(os.cpu_count() or 2)))
+        self.path = path or urlsplit(webhook_url).path or "/"
+        self.started_at = started_at
+        self._context = multiprocessing.get_context("spawn")
+        self.queues: List["multiprocessing.Queue"] = []
+        self.processes: List["multiprocessing.Process"] = []
+        self.received = 0
+        self.rejected = 0
+
+    def shard(self, update: Dict) -> int:
+        return update_user_id(update) % self.workers
+
+    def start_workers(self) -> None:
+        for index in range(self.workers):
+            queue = self._context.Queue()
+            process = self._context.Process(target=run_worker, args=(index, self.workers, queue, self.started_at),
+                                            name=f"stockybot-worker-{index}", daemon=True)
+            process.start()
+            self.queues.append(queue)
+            self.processes.append(process)
+
+    def stop_workers(self, timeout: float = 30) -> None:
+        for queue in self.queues:
+            queue.put(None)
+        for process in self.processes:
+            process.join(timeout)
+            if process.is_alive():
+                process.terminate()
+
+    async def _on_startup(self) -> None:
+        self.start_workers()
+        bot = Bot(self.telegram_token)
+        async with bot:
+            await bot.set_webhook(self.webhook_url, secret_token=self.secret_token,
+                                  allowed_updates=Update.ALL_TYPES)
+        print(f"Webhook הוגדר: {self.webhook_url} ({self.workers} workers)")
+
+    async def _on_shutdown(self) -> None:
+        await asyncio.get_running_loop().run_in_executor(None, self.stop_workers)
+
+    async def _lifespan(self, receive, send) -> None:
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                try:
+                    await self._on_startup()
+                    await send({"type": "lifespan.startup.complete"})
+                except Exception as e:
+                    print(f"שגיאה בהפעלת שרת ה-webhook: {e}")
+                    await send({"type": "lifespan.startup.failed", "message": str(e)})
+            elif message["type"] == "lifespan.shutdown":
+                await self._on_shutdown()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    @staticmethod
+    async def _respond(send, status: int, body: bytes = b"") -> None:
+        await send({"type": "http.response.start", "status": status,
+                    "headers": [(b"content-type", b"text/plain"), (b"content-length", str(len(body)).encode())]})
+        await send({"type": "http.response.body", "body": body})
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+            return
+        if scope["type"] != "http":
+            return
+        if scope["path"].rstrip("/") != self.path.rstrip("/"):
+            await self._respond(send, 404)
+            return
+        if scope["method"] != "POST":
+            await self._respond(send, 405)
+            return
+
+        headers = dict(scope.get("headers") or [])
+        received_token = headers.get(b"x-telegram-bot-api-secret-token", b"")
+        if not hmac.compare_digest(received_token, self.secret_token.encode()):
+            self.rejected += 1
+            await self._respond(send, 403)
+            return
+
+        body = b""
+        while True:
+            message = await receive()
+            body += message.get("body", b"")
+            if not message.get("more_body"):
+                break
+        try:
+            update = json.loads(body)
+        except ValueError:
+            await self._respond(send, 400)
+            return
+
+        # תשובה מיידית לטלגרם - העיבוד עצמו ב-worker של המשתמש
+        self.queues[self.shard(update)].put(update)
+        self.received += 1
+        await self._respond(send, 200, b"ok")
+
+
+def serve(telegram_token: str, webhook_url: str, secret_token: str, started_at: Optional[float] = None) -> None:
+    """
+    הפעלת שרת ה-webhook המקומי (uvicorn) - Telegram -> reverse proxy -> השרת הזה
+    """
+    import uvicorn
+
+    server = WebhookServer(telegram_token, webhook_url, secret_token, started_at=started_at)
+    uvicorn.run(server, host=os.getenv("WEBHOOK_HOST", "0.0.0.0"), port=int(os.getenv("PORT", "8000")),
+                lifespan="on", log_level="warning")
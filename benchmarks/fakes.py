@@ -0,0 +1,311 @@
+"""
+שירותים מדומים לבדיקות הביצועים: Yahoo, Alpha Vantage ו-Azure OpenAI (httpx transport, כולל stream של SSE),
+Telegram (BaseRequest של python-telegram-bot) ו-yfinance. כולם מחזירים את התשובות מ-fixtures.py
+אחרי השהיה אקראית לפי ההתפלגות של השירות, וסופרים את הקריאות.
+בנוסף tokenizer מקומי במקום קובץ ה-BPE של tiktoken, שיורד מהרשת בשימוש הראשון.
+"""
+import asyncio
+import itertools
+import json
+import os
+import random
+import re
+import threading
+import time
+from collections import Counter, defaultdict
+from types import SimpleNamespace
+from typing import Dict, List, Optional, Tuple
+from unittest import mock
+
+import httpx
+from telegram.request import BaseRequest, RequestData
+
+from benchmarks.fixtures import YFinanceTicker, sample_latency
+
+BOT_USER = {"id": 1, "is_bot": True, "first_name": "StockyBot", "username": "stocky_bench_bot"}
+
+
+class Upstreams:
+    def __init__(self, fixtures: Dict, latency_scale: float = 1.0, seed: int = 0):
+        """
+        המצב המשותף לכל השירותים המדומים: התשובות, קנה המידה של ההשהיות ומוני הקריאות
+        """
+        self.fixtures = fixtures
+        self.latency_scale = latency_scale
+        self.calls: Counter = Counter()
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def latency(self, upstream: str) -> float:
+        if not self.latency_scale:
+            return 0.0
+        with self._lock:
+            return sample_latency(self._rng, upstream, self.latency_scale)
+
+    def count(self, name: str) -> None:
+        with self._lock:
+            self.calls[name] += 1
+
+    def random(self) -> float:
+        with self._lock:
+            return self._rng.random()
+
+    def choice(self, values):
+        with self._lock:
+            return self._rng.choice(values)
+
+
+class FakeMarketData:
+    def __init__(self, upstreams: Upstreams):
+        """
+        Yahoo (chart/spark) ו-Alpha Vantage (NEWS_SENTIMENT)
+        """
+        self.upstreams = upstreams
+
+    async def handle(self, request: httpx.Request) -> httpx.Response:
+        host = request.url.host
+        if host.endswith("finance.yahoo.com"):
+            await asyncio.sleep(self.upstreams.latency("yahoo"))
+            return self._yahoo(request)
+        if host == "www.alphavantage.co":
+            await asyncio.sleep(self.upstreams.latency("alpha_vantage"))
+            return self._alpha_vantage(request)
+        return httpx.Response(404, json={"error": f"unexpected host {host}"})
+
+    def _yahoo(self, request: httpx.Request) -> httpx.Response:
+        chart = self.upstreams.fixtures["chart"]
+        path = request.url.path
+        if path.startswith("/v8/finance/chart/"):
+            self.upstreams.count("yahoo.chart")
+            ticker = path.rsplit("/", 1)[-1].upper()
+            if ticker not in chart:
+                return httpx.Response(404, json={"chart": {"result": None, "error": {"code": "Not Found"}}})
+            return httpx.Response(200, json={"chart": {"result": [{"meta": chart[ticker]}], "error": None}})
+        if path == "/v7/finance/spark":
+            self.upstreams.count("yahoo.spark")
+            symbols = request.url.params.get("symbols", "").upper().split(",")
+            return httpx.Response(200, json={"spark": {"result": [
+                {"symbol": symbol, "response": [{"meta": chart[symbol]}]} for symbol in symbols if symbol in chart
+            ], "error": None}})
+        return httpx.Response(404, json={"error": f"unexpected path {path}"})
+
+    def _alpha_vantage(self, request: httpx.Request) -> httpx.Response:
+        self.upstreams.count("alpha_vantage.news")
+        ticker = request.url.params.get("tickers", "").upper()
+        feed = self.upstreams.fixtures["news"].get(ticker, [])
+        return httpx.Response(200, json={"items": str(len(feed)), "feed": feed})
+
+
+class FakeOpenAI:
+    def __init__(self, upstreams: Upstreams, words_per_chunk: int = 2, rate_limit_rate: float = 0.0):
+        """
+        chat.completions של Azure OpenAI: תשובה מ-fixtures ב-stream (SSE) או בתשובה אחת.
+        rate_limit_rate - חלק מהבקשות שנענות ב-429 (לבדיקת המעבר למודל הגיבוי)
+        """
+        self.upstreams = upstreams
+        self.words_per_chunk = words_per_chunk
+        self.rate_limit_rate = rate_limit_rate
+
+    @staticmethod
+    def _chunk(model: str, **fields) -> bytes:
+        payload = {"id": "chatcmpl-bench", "object": "chat.completion.chunk", "created": int(time.time()),
+                   "model": model, **fields}
+        return f"data: {json.dumps(payload, ensure_ascii=False)}\n\n".encode()
+
+    async def handle(self, request: httpx.Request) -> httpx.Response:
+        body = json.loads(request.content)
+        # ב-Azure שם ה-deployment הוא חלק מה-URL
+        model = request.url.path.split("/deployments/", 1)[-1].split("/", 1)[0]
+        self.upstreams.count(f"openai.{model}")
+        if self.rate_limit_rate and self.upstreams.random() < self.rate_limit_rate:
+            self.upstreams.count(f"openai.{model}.429")
+            return httpx.Response(429, headers={"retry-after": "5"},
+                                  json={"error": {"code": "429", "message": "Rate limit is exceeded."}})
+
+        prompt_tokens = sum(len(message["content"]) for message in body["messages"]) // 3
+        answer = self.upstreams.choice(self.upstreams.fixtures["answers"])
+        words = answer.split(" ")
+        pieces = [" ".join(words[i:i + self.words_per_chunk]) + " " for i in range(0, len(words), self.words_per_chunk)]
+        usage = {"prompt_tokens": prompt_tokens, "completion_tokens": len(answer) // 3,
+                 "total_tokens": prompt_tokens + len(answer) // 3}
+
+        if not body.get("stream"):
+            await asyncio.sleep(self.upstreams.latency("openai_first_token")
+                                + sum(self.upstreams.latency("openai_token") for _ in pieces))
+            return httpx.Response(200, json={
+                "id": "chatcmpl-bench", "object": "chat.completion", "created": int(time.time()), "model": model,
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": answer}}],
+                "usage": usage
+            })
+
+        async def stream():
+            await asyncio.sleep(self.upstreams.latency("openai_first_token"))
+            for piece in pieces:
+                yield self._chunk(model, choices=[{"index": 0, "delta": {"content": piece}, "finish_reason": None}])
+                await asyncio.sleep(self.upstreams.latency("openai_token"))
+            yield self._chunk(model, choices=[{"index": 0, "delta": {}, "finish_reason": "stop"}])
+            if body.get("stream_options", {}).get("include_usage"):
+                yield self._chunk(model, choices=[], usage=usage)
+            yield b"data: [DONE]\n\n"
+
+        return httpx.Response(200, headers={"content-type": "text/event-stream"}, content=stream())
+
+
+def upstream_transport(upstreams: Upstreams, openai_rate_limit_rate: float = 0.0) -> httpx.MockTransport:
+    """
+    transport אחד ל-HttpClientPool: Yahoo, Alpha Vantage ו-Azure OpenAI לפי השרת
+    """
+    market = FakeMarketData(upstreams)
+    llm = FakeOpenAI(upstreams, rate_limit_rate=openai_rate_limit_rate)
+
+    async def handle(request: httpx.Request) -> httpx.Response:
+        if request.url.host.endswith("openai.azure.com"):
+            return await llm.handle(request)
+        return await market.handle(request)
+
+    return httpx.MockTransport(handle)
+
+
+class FakeTelegramRequest(BaseRequest):
+    def __init__(self, upstreams: Upstreams):
+        """
+        Bot API מדומה: כל בקשה של הבוט (sendMessage, editMessageText...) נענית מקומית
+        """
+        self.upstreams = upstreams
+        self._message_ids = itertools.count(1)
+        # כל הטקסטים שנשלחו (או נערכו) לכל צ'אט, לפי הסדר - לבדיקת התשובות בבדיקת העומס
+        self.texts: Dict[int, List[str]] = defaultdict(list)
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        pass
+
+    def _message(self, parameters: Dict, message_id: Optional[int] = None) -> Dict:
+        chat_id = int(parameters.get("chat_id", 0))
+        self.texts[chat_id].append(parameters.get("text", ""))
+        return {
+            "message_id": message_id or next(self._message_ids),
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private"},
+            "from": BOT_USER,
+            "text": parameters.get("text", "")
+        }
+
+    async def do_request(self, url: str, method: str, request_data: Optional[RequestData] = None,
+                         read_timeout=None, write_timeout=None, connect_timeout=None,
+                         pool_timeout=None) -> Tuple[int, bytes]:
+        api_method = url.rsplit("/", 1)[-1]
+        parameters = request_data.parameters if request_data is not None else {}
+        self.upstreams.count(f"telegram.{api_method}")
+        await asyncio.sleep(self.upstreams.latency("telegram"))
+
+        if api_method == "getMe":
+            result = BOT_USER
+        elif api_method == "sendMessage":
+            result = self._message(parameters)
+        elif api_method == "editMessageText":
+            result = self._message(parameters, int(parameters.get("message_id", 0)))
+        else:
+            result = True
+        return 200, json.dumps({"ok": True, "result": result}).encode()
+
+
+class FakeYFinance:
+    def __init__(self, upstreams: Upstreams):
+        """
+        תחליף למודול yfinance: כל גישה לשדה של Ticker היא "קריאת רשת" (חוסמת, כמו המקור)
+        """
+        self.upstreams = upstreams
+
+    def Ticker(self, symbol: str) -> "_SlowTicker":
+        return _SlowTicker(YFinanceTicker(symbol, self.upstreams.fixtures), self.upstreams)
+
+
+class _SlowTicker:
+    def __init__(self, ticker: YFinanceTicker, upstreams: Upstreams):
+        self._ticker = ticker
+        self._upstreams = upstreams
+
+    def __getattr__(self, name: str):
+        self._upstreams.count(f"yfinance.{name}")
+        time.sleep(self._upstreams.latency("yfinance"))
+        return getattr(self._ticker, name)
+
+
+class FakeEncoding:
+    """
+    tokenizer מקומי במקום ה-BPE של tiktoken: מילים, מספרים וסימנים מתחלקים לחתיכות של עד 4 תווים,
+    בערך כמו cl100k. הפיך (decode), כדי ש-truncate יעבוד כמו עם ה-tokenizer האמיתי.
+    """
+    PATTERN = re.compile(r" ?[^\W\d_]+| ?\d{1,3}| ?[^\s\w]+|\s+|.", re.S)
+
+    def __init__(self):
+        self._ids: Dict[str, int] = {}
+        self._pieces: List[str] = []
+        self._lock = threading.Lock()
+
+    def _id(self, piece: str) -> int:
+        token = self._ids.get(piece)
+        if token is None:
+            with self._lock:
+                token = self._ids.setdefault(piece, len(self._pieces))
+                if token == len(self._pieces):
+                    self._pieces.append(piece)
+        return token
+
+    def encode(self, text: str, **kwargs) -> List[int]:
+        tokens = []
+        for match in self.PATTERN.finditer(text):
+            word = match.group()
+            tokens.extend(self._id(word[i:i + 4]) for i in range(0, len(word), 4))
+        return tokens
+
+    def decode(self, tokens: List[int]) -> str:
+        return "".join(self._pieces[token] for token in tokens)
+
+
+def bpe_available(model: str = "gpt-4") -> bool:
+    """
+    האם קובץ ה-BPE של המודל כבר בתיקיית המטמון של tiktoken (בלי לנסות להוריד אותו)
+    """
+    import tiktoken
+    import tiktoken.load
+
+    from utils.cost_calculator import TIKTOKEN_CACHE_DIR
+
+    os.environ.setdefault("TIKTOKEN_CACHE_DIR", TIKTOKEN_CACHE_DIR)
+
+    def offline(blobpath: str) -> bytes:
+        raise FileNotFoundError(blobpath)
+
+    try:
+        with mock.patch.object(tiktoken.load, "read_file", offline):
+            tiktoken.encoding_for_model(model)
+        return True
+    except FileNotFoundError:
+        return False
+
+
+def use_tokenizer(choice: str, model: str = "gpt-4") -> str:
+    """
+    בחירת ה-tokenizer לבדיקות: bpe - קובץ ה-BPE האמיתי, ועצירה עם הסבר אם הוא חסר (במקום ניסיון הורדה
+    שנכשל בכל ספירה בלי רשת); fake - FakeEncoding לכל CostCalculator. מחזיר את ה-tokenizer שנבחר.
+    """
+    if choice == "bpe":
+        if not bpe_available(model):
+            raise SystemExit(
+                f"קובץ ה-BPE של tiktoken ל-{model} לא נמצא ב-{os.environ['TIKTOKEN_CACHE_DIR']}.\n"
+                "להורדה (פעם אחת, עם רשת): python -c \"from utils.cost_calculator import CostCalculator; "
+                "CostCalculator().warmup()\"\n"
+                "או הרצה בלי רשת עם --tokenizer fake (ספירת טוקנים מקורבת)"
+            )
+        return "bpe"
+
+    import utils.cost_calculator
+
+    encoding = FakeEncoding()
+    utils.cost_calculator.tiktoken = SimpleNamespace(encoding_for_model=lambda name: encoding)
+    return "fake"
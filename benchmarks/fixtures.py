@@ -0,0 +1,219 @@
+"""
+תשובות מוקלטות של השירותים החיצוניים לבדיקות הביצועים, והתפלגויות ההשהיה שלהם.
+
+ברירת המחדל היא נתונים סינתטיים דטרמיניסטיים (seed קבוע) בפורמט של התשובות האמיתיות
+(Yahoo chart/spark, Alpha Vantage NEWS_SENTIMENT, yfinance). אפשר לשמור אותם לקובץ,
+להחליף בתשובות אמיתיות שהוקלטו, ולהריץ את הבדיקות מול הקובץ עם --fixtures.
+
+שימוש:
+    python benchmarks/fixtures.py --write benchmarks/fixtures.json
+"""
+import argparse
+import json
+import math
+import random
+import sys
+import zlib
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Dict, List, Optional
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from utils.lazy_import import lazy_import  # noqa: E402
+
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+
+SEED = 20240501
+NEWS_PER_TICKER = 30
+
+# השהיה של כל שירות: (חציון, אחוזון 95) בשניות - התפלגות log-normal
+LATENCIES = {
+    "yahoo": (0.12, 0.45),
+    "alpha_vantage": (0.35, 1.4),
+    "openai_first_token": (0.7, 2.5),
+    "openai_token": (0.02, 0.05),
+    "telegram": (0.06, 0.25),
+    "yfinance": (0.4, 1.5),
+}
+
+TICKERS = {
+    "AAPL": "Apple Inc.", "MSFT": "Microsoft Corporation", "TSLA": "Tesla, Inc.", "META": "Meta Platforms, Inc.",
+    "AMZN": "Amazon.com, Inc.", "GOOGL": "Alphabet Inc.", "NVDA": "NVIDIA Corporation", "PFE": "Pfizer Inc.",
+    "KO": "The Coca-Cola Company", "WMT": "Walmart Inc.", "NFLX": "Netflix, Inc.", "INTC": "Intel Corporation",
+    "JNJ": "Johnson & Johnson", "MCD": "McDonald's Corporation", "BA": "The Boeing Company", "ABBV": "AbbVie Inc.",
+}
+
+ANSWER_SENTENCES = [
+    "המניה הושפעה בעיקר מהדוח הרבעוני האחרון, שבו ההכנסות עקפו את תחזיות האנליסטים.",
+    "במקביל, הסנטימנט בשוק הושפע מהחשש לגבי המשך העלאות הריבית בארצות הברית.",
+    "כמה בתי השקעות עדכנו את מחיר היעד למניה, מה שתרם לתנודתיות במסחר.",
+    "חשוב לציין שהמגמה בסקטור כולו דומה, כך שחלק מהתנועה אינו ייחודי לחברה.",
+    "בטווח הקצר, המשקיעים יעקבו אחרי ההנחיות להמשך השנה ואחרי נתוני המאקרו הקרובים.",
+    "הירידה בשולי הרווח הגולמי מסבירה חלק מהתגובה השלילית למרות צמיחה בהכנסות.",
+]
+
+
+def sample_latency(rng: random.Random, upstream: str, scale: float = 1.0) -> float:
+    """
+    השהיה אקראית לשירות לפי (חציון, אחוזון 95) שלו, מוכפלת ב-scale
+    """
+    median, p95 = LATENCIES[upstream]
+    sigma = math.log(p95 / median) / 1.645
+    return rng.lognormvariate(math.log(median), sigma) * scale
+
+
+def _news_feed(rng: random.Random, ticker: str, now: datetime) -> List[Dict]:
+    feed = []
+    for index in range(NEWS_PER_TICKER):
+        published = now - timedelta(minutes=37 * index + rng.randint(0, 30))
+        feed.append({
+            "title": f"{TICKERS[ticker]} shares move as analysts weigh quarterly outlook ({index + 1})",
+            "url": f"https://news.example.com/{ticker.lower()}/{index}",
+            "time_published": published.strftime("%Y%m%dT%H%M%S"),
+            "summary": " ".join(rng.choice([
+                f"{TICKERS[ticker]} reported revenue above expectations while guidance remained cautious.",
+                "Investors are watching margins closely after a volatile quarter for the sector.",
+                "Several analysts raised their price targets citing strong demand and cost discipline.",
+                "Supply chain constraints eased, but currency headwinds weighed on international sales.",
+                "The company announced an expanded buyback program and a higher quarterly dividend.",
+            ]) for _ in range(rng.randint(2, 5))),
+            "source": rng.choice(["Reuters", "Bloomberg", "CNBC", "MarketWatch", "Benzinga"]),
+            "overall_sentiment_score": round(rng.uniform(-0.5, 0.6), 4),
+            "ticker_sentiment": [
+                {"ticker": ticker, "relevance_score": f"{rng.uniform(0.2, 1.0):.6f}"},
+                {"ticker": rng.choice(list(TICKERS)), "relevance_score": f"{rng.uniform(0.0, 0.4):.6f}"},
+            ],
+        })
+    return feed
+
+
+def synthesize(seed: int = SEED) -> Dict:
+    """
+    תשובות בפורמט של השירותים האמיתיים לכל המניות ב-TICKERS
+    """
+    rng = random.Random(seed)
+    now = datetime(2024, 5, 1, 16, 0, tzinfo=timezone.utc)
+    chart, news = {}, {}
+    for ticker, name in TICKERS.items():
+        previous_close = round(rng.uniform(20, 600), 2)
+        chart[ticker] = {
+            "symbol": ticker,
+            "longName": name,
+            "shortName": name,
+            "currency": "USD",
+            "regularMarketPrice": round(previous_close * (1 + rng.gauss(0, 0.02)), 2),
+            "previousClose": previous_close,
+            "chartPreviousClose": previous_close,
+        }
+        news[ticker] = _news_feed(rng, ticker, now)
+    answers = [" ".join(rng.sample(ANSWER_SENTENCES, k=len(ANSWER_SENTENCES))) for _ in range(8)]
+    return {"seed": seed, "chart": chart, "news": news, "answers": answers}
+
+
+def load_fixtures(path: Optional[str] = None) -> Dict:
+    if path:
+        return json.loads(Path(path).read_text(encoding="utf-8"))
+    return synthesize()
+
+
+def _today() -> "pd.Timestamp":
+    return pd.Timestamp.today().normalize()
+
+
+class YFinanceTicker:
+    """
+    תחליף ל-yf.Ticker: אותם שדות שהבוט קורא, עם נתונים סינתטיים לפי ה-seed של המניה
+    """
+
+    def __init__(self, symbol: str, fixtures: Dict):
+        self.symbol = symbol.upper()
+        self._meta = fixtures["chart"].get(self.symbol, {"longName": self.symbol, "regularMarketPrice": 100.0,
+                                                         "previousClose": 99.0})
+        self._rng = np.random.default_rng(zlib.crc32(f"{fixtures.get('seed', SEED)}:{self.symbol}".encode()))
+
+    @property
+    def info(self) -> Dict:
+        return {
+            "symbol": self.symbol,
+            "longName": self._meta["longName"],
+            "quoteType": "EQUITY",
+            "currentPrice": self._meta["regularMarketPrice"],
+            "previousClose": self._meta["previousClose"],
+            "regularMarketChangePercent": 0.5,
+            "dividendRate": 3.2,
+            "dividendYield": 0.021,
+            "exDividendDate": 1714003200,
+            "marketCap": 250_000_000_000,
+            "trailingPE": 24.5,
+        }
+
+    @property
+    def calendar(self) -> Dict:
+        return {"Earnings Date": [(_today() + pd.Timedelta(days=60)).date()]}
+
+    @property
+    def earnings_dates(self) -> "pd.DataFrame":
+        index = pd.date_range(end=_today() + pd.Timedelta(days=60, hours=16, minutes=30), periods=44,
+                              freq="91D", tz="America/New_York")[::-1]
+        estimate = np.round(np.linspace(2.5, 0.8, len(index)) + self._rng.normal(0, 0.05, len(index)), 2)
+        actual = np.round(estimate * (1 + self._rng.normal(0.03, 0.06, len(index))), 2)
+        actual[:2] = np.nan  # דוחות עתידיים
+        return pd.DataFrame({
+            "EPS Estimate": estimate,
+            "Reported EPS": actual,
+            "Surprise(%)": np.round((actual / estimate - 1) * 100, 2),
+        }, index=pd.DatetimeIndex(index, name="Earnings Date"))
+
+    @property
+    def dividends(self) -> "pd.Series":
+        # חלק מהמניות מעלות דיבידנד כל שנה (אריסטוקרטיות), לחלק יש קיצוץ באמצע
+        years = int(self._rng.integers(8, 40))
+        index = pd.date_range(end=_today(), periods=years * 4, freq="QS-FEB", tz="America/New_York")
+        yearly = np.arange(len(index)) // 4
+        if self._rng.random() < 0.4:
+            yearly = np.where(yearly > years // 2, yearly - years // 3, yearly)
+        amounts = np.round(0.1 * 1.06 ** yearly, 4)
+        return pd.Series(amounts, index=index, name="Dividends")
+
+    def history(self, period: str = "5y") -> "pd.DataFrame":
+        index = pd.bdate_range(end=_today(), periods=5 * 252, tz="America/New_York")
+        walk = np.cumsum(self._rng.normal(0, 0.015, len(index)))
+        closes = self._meta["previousClose"] * np.exp(walk - walk[-1])
+        return pd.DataFrame({"Close": closes}, index=index)
+
+    @property
+    def institutional_holders(self) -> "pd.DataFrame":
+        holders = ["Vanguard Group Inc", "Blackrock Inc.", "State Street Corporation", "FMR, LLC",
+                   "Geode Capital Management", "Morgan Stanley", "Northern Trust Corporation",
+                   "Bank of America Corporation", "JPMorgan Chase & Co", "Norges Bank", "T. Rowe Price",
+                   "Capital World Investors"]
+        shares = self._rng.integers(20_000_000, 1_300_000_000, len(holders))
+        return pd.DataFrame({
+            "Date Reported": _today() - pd.Timedelta(days=45),
+            "Holder": holders,
+            "pctHeld": shares / 15_000_000_000,
+            "Shares": shares,
+            "Value": shares * self._meta["regularMarketPrice"],
+            "Change": self._rng.normal(0, 3, len(holders)),
+        })
+
+    @property
+    def major_holders(self) -> "pd.DataFrame":
+        return pd.DataFrame({"Value": [0.0007, 0.6142, 0.6147, 6584.0]},
+                            index=pd.Index(["insidersPercentHeld", "institutionsPercentHeld",
+                                            "institutionsFloatPercentHeld", "institutionsCount"], name="Breakdown"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="שמירת התשובות הסינתטיות לקובץ JSON")
+    parser.add_argument("--write", required=True, help="נתיב קובץ הפלט")
+    parser.add_argument("--seed", type=int, default=SEED)
+    args = parser.parse_args()
+    Path(args.write).write_text(json.dumps(synthesize(args.seed), ensure_ascii=False, indent=1), encoding="utf-8")
+    print(f"נשמר {args.write}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,330 @@
+"""
+בדיקת עומס: StockNewsTelegramBot המלא מקבל עדכוני Update סינתטיים ממשתמשים רבים במקביל,
+מול שירותים מדומים (benchmarks/fakes.py) במקום Yahoo, Alpha Vantage, Azure OpenAI, Telegram ו-yfinance.
+העדכונים נכנסים ל-update_queue של ה-Application כמו ב-webhook, ו-Application.start() מריץ את
+ה-fetcher האמיתי עם ה-update processor של הבוט (מקביליות בין משתמשים, סדר לכל משתמש).
+
+מדווח: תפוקה (עדכונים בשנייה), אחוזוני זמן לכל handler, כישלונות (חריגה, תשובת שגיאה או תשובה חסרה),
+זמנים לכל שלב (tracing), מספר הקריאות לכל שירות ו-RSS מקסימלי.
+
+שימוש:
+    python benchmarks/load_test.py --users 200 --concurrency 50
+    python benchmarks/load_test.py --latency-scale 0 --no-pacing    # זמן CPU של הבוט בלבד
+    python benchmarks/load_test.py --json results.json              # לשמירה והשוואה בין גרסאות
+    python benchmarks/load_test.py --tokenizer fake                 # בלי רשת: בלי קובץ ה-BPE של tiktoken
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import random
+import resource
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+# הבוט קורא את settings/ בנתיב יחסי
+os.chdir(ROOT)
+
+from telegram import Update  # noqa: E402
+from telegram.ext import TypeHandler  # noqa: E402
+
+from benchmarks.fakes import use_tokenizer  # noqa: E402
+
+# קבוצת ה-handler שמסמן סיום עיבוד של עדכון - אחרי כל הקבוצות של הבוט
+COMPLETION_GROUP = 100
+
+# משקל כל סוג פעולה בתרחיש של משתמש
+SCENARIO_WEIGHTS = {
+    "question": 6,
+    "compare": 1,
+    "earnings": 1,
+    "dividends": 1,
+    "holdings": 1,
+    "usage": 1,
+}
+
+# תשובות הבוט שמסמנות פעולה שנכשלה (גם כשה-handler עצמו לא זרק חריגה)
+ERROR_MARKERS = ("שגיאה", "לא הצלחתי", "❌", "אין לך הרשאה", "לא נמצא")
+
+# טקסט שחייב להופיע בתשובה לכל פעולה, כשהיא הצליחה
+EXPECTED_REPLIES = {
+    "question": ("הערכת עלויות", "סיכום עלויות"),
+    "compare": ("הערכת עלויות", "סיכום עלויות"),
+    "answer": ("סיכום עלויות",),
+}
+
+# עדכון שלא הסתיים בזמן הזה נספר ככישלון
+UPDATE_TIMEOUT = 120
+
+QUESTIONS = [
+    "למה המניה של {name} יורדת?",
+    "מה קורה עם המניה של {name}?",
+    "תסביר מה קורה עם {name} השבוע",
+    "האם הדוח האחרון של {name} השפיע על המחיר?",
+]
+
+
+def _percentiles(values: List[float]) -> Dict[str, float]:
+    import numpy as np
+
+    if not values:
+        return {"count": 0, "mean": 0.0, "p50": 0.0, "p95": 0.0, "p99": 0.0, "max": 0.0}
+    samples = np.asarray(values)
+    p50, p95, p99 = np.quantile(samples, (0.5, 0.95, 0.99))
+    return {"count": len(values), "mean": float(samples.mean()), "p50": float(p50), "p95": float(p95),
+            "p99": float(p99), "max": float(samples.max())}
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss ב-KB בלינוקס וב-bytes ב-macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def known_names(tickers) -> List[Tuple[str, str]]:
+    """
+    שמות עבריים מ-settings/stocks_config.json למניות שיש להן fixtures
+    """
+    stocks = json.loads((ROOT / "settings" / "stocks_config.json").read_text(encoding="utf-8"))
+    return sorted((name, symbol) for name, symbol in stocks.items() if symbol in tickers)
+
+
+class LoadTest:
+    def __init__(self, args: argparse.Namespace):
+        self.args = args
+        self.rng = random.Random(args.seed)
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.failures: Dict[str, int] = defaultdict(int)
+        self._update_ids = itertools.count(1)
+        # update_id -> Future שמסתיים כשהעדכון עבר את כל ה-handlers (True אם אחד מהם זרק חריגה)
+        self._pending: Dict[int, asyncio.Future] = {}
+
+    def _prepare_environment(self, data_dir: str) -> None:
+        os.environ.update({
+            "MARKET_CACHE_PATH": os.path.join(data_dir, "market_cache.db"),
+            "USAGE_DB_PATH": os.path.join(data_dir, "usage.db"),
+            "WATCHLIST_DB_PATH": os.path.join(data_dir, "watchlists.db"),
+            "FUNDAMENTALS_PATH": os.path.join(data_dir, "fundamentals.parquet"),
+            "DAILY_COST_LIMIT": "1000000",
+            "MAX_REQUEST_COST": "1000000",
+            "ALPHA_VANTAGE_CALLS_PER_MINUTE": str(self.args.alpha_vantage_rpm),
+            "METRICS_PORT": "0",
+        })
+
+    def _build_bot(self):
+        import app.institutional_holdings
+        import app.stock_analyzer
+        import app.stock_events_analyzer
+        import utils.fundamentals_store
+        import utils.stocks_list_manager
+        from app.telegram_bot import StockNewsTelegramBot
+        from benchmarks.fakes import FakeTelegramRequest, FakeYFinance, Upstreams, upstream_transport
+        from benchmarks.fixtures import load_fixtures
+        from utils.http_client import HttpClientPool
+        from utils.send_queue import SendQueue
+
+        fixtures = load_fixtures(self.args.fixtures)
+        self.upstreams = Upstreams(fixtures, self.args.latency_scale, self.args.seed)
+        fake_yfinance = FakeYFinance(self.upstreams)
+        for module in (app.stock_analyzer, app.stock_events_analyzer, app.institutional_holdings,
+                       utils.fundamentals_store, utils.stocks_list_manager):
+            module.yf = fake_yfinance
+
+        bot = StockNewsTelegramBot(
+            "123456:BENCHMARK", "azure-key", "alpha-vantage-key",
+            http=HttpClientPool(transport=upstream_transport(self.upstreams, self.args.openai_429_rate)),
+            telegram_request=FakeTelegramRequest(self.upstreams)
+        )
+        if self.args.no_pacing:
+            bot.outbox = bot.alerts.outbox = SendQueue(bot.application.bot, messages_per_second=10 ** 6,
+                                                       chat_messages_per_second=10 ** 6, chat_burst=10 ** 6)
+        self.names = known_names(fixtures["chart"])
+        self.symbols = sorted({symbol for _, symbol in self.names})
+        self.users = [100000 + index for index in range(self.args.users)]
+        bot.security.allowed_users = {str(user_id) for user_id in self.users}
+        self.telegram = bot.application.bot.request
+        # הקבוצה האחרונה: העדכון סיים לעבור בכל ה-handlers של הבוט
+        bot.application.add_handler(TypeHandler(Update, self._finished), group=COMPLETION_GROUP)
+        bot.application.add_error_handler(self._error)
+        return bot
+
+    async def _finished(self, update, context) -> None:
+        future = self._pending.get(update.update_id)
+        if future is not None and not future.done():
+            future.set_result(False)
+
+    async def _error(self, update, context) -> None:
+        print(f"חריגה בעדכון {getattr(update, 'update_id', None)}: {context.error!r}")
+        future = self._pending.get(getattr(update, "update_id", None))
+        if future is not None and not future.done():
+            future.set_result(True)
+
+    def _update(self, bot, user_id: int, text: str):
+        update_id = next(self._update_ids)
+        message = {
+            "message_id": update_id,
+            "date": int(time.time()),
+            "chat": {"id": user_id, "type": "private"},
+            "from": {"id": user_id, "is_bot": False, "first_name": f"user{user_id}"},
+            "text": text,
+        }
+        if text.startswith("/"):
+            message["entities"] = [{"type": "bot_command", "offset": 0, "length": len(text.split(" ", 1)[0])}]
+        return Update.de_json({"update_id": update_id, "message": message}, bot.application.bot)
+
+    def _failed(self, handler: str, replies: List[str]) -> Optional[str]:
+        """
+        סיבת הכישלון של פעולה לפי התשובות שהבוט שלח עליה, או None אם היא הצליחה
+        """
+        if not replies:
+            return "אין תשובה"
+        for text in replies:
+            if any(marker in text for marker in ERROR_MARKERS):
+                return text.strip().splitlines()[-1][:120]
+        expected = EXPECTED_REPLIES.get(handler)
+        if expected and not any(marker in text for text in replies for marker in expected):
+            return f"חסר בתשובה: {' / '.join(expected)}"
+        return None
+
+    async def _send(self, bot, handler: str, user_id: int, text: str) -> None:
+        update = self._update(bot, user_id, text)
+        future = self._pending[update.update_id] = asyncio.get_running_loop().create_future()
+        sent = len(self.telegram.texts[user_id])
+        started = time.perf_counter()
+        try:
+            await bot.application.update_queue.put(update)
+            raised = await asyncio.wait_for(future, UPDATE_TIMEOUT)
+            reason = "חריגה ב-handler" if raised else self._failed(handler, self.telegram.texts[user_id][sent:])
+        except asyncio.TimeoutError:
+            reason = f"לא הסתיים תוך {UPDATE_TIMEOUT} שניות"
+        finally:
+            del self._pending[update.update_id]
+        self.latencies[handler].append(time.perf_counter() - started)
+        if reason:
+            self.failures[handler] += 1
+            print(f"{handler} נכשל ({text}): {reason}")
+
+    async def _confirm(self, bot, user_id: int) -> None:
+        # שאלה שנענתה מהמטמון הסמנטי (או נכשלה) לא מחכה לאישור
+        if bot.application.user_data[user_id].get("awaiting_confirmation"):
+            await self._send(bot, "answer", user_id, "כן")
+
+    async def _session(self, bot, user_id: int, slots: asyncio.Semaphore) -> None:
+        """
+        משתמש אחד: --actions פעולות ברצף, כל אחת מחכה לסיום הקודמת (כמו בצ'אט אמיתי)
+        """
+        actions = self.rng.choices(list(SCENARIO_WEIGHTS), weights=list(SCENARIO_WEIGHTS.values()),
+                                   k=self.args.actions)
+        async with slots:
+            for action in actions:
+                name, _ = self.rng.choice(self.names)
+                if action == "question":
+                    await self._send(bot, "question", user_id, self.rng.choice(QUESTIONS).format(name=name))
+                    await self._confirm(bot, user_id)
+                elif action == "compare":
+                    symbols = self.rng.sample(self.symbols, 2)
+                    await self._send(bot, "compare", user_id, f"/compare {' '.join(symbols)}")
+                    await self._confirm(bot, user_id)
+                elif action == "usage":
+                    await self._send(bot, "usage", user_id, "/usage")
+                else:
+                    await self._send(bot, action, user_id, f"/{action} {name}")
+
+    async def run(self) -> Dict:
+        with tempfile.TemporaryDirectory(prefix="stockybot-bench-") as data_dir:
+            self._prepare_environment(data_dir)
+            from utils.tracing import tracer
+
+            tokenizer = use_tokenizer(self.args.tokenizer)
+            bot = self._build_bot()
+            await bot.application.initialize()
+            await bot.application.start()
+            slots = asyncio.Semaphore(self.args.concurrency)
+            started = time.perf_counter()
+            try:
+                await asyncio.gather(*(self._session(bot, user_id, slots) for user_id in self.users))
+                elapsed = time.perf_counter() - started
+            finally:
+                await bot.application.stop()
+                await bot.application.shutdown()
+                await bot.http.close()
+                bot.executor.shutdown()
+
+            updates = sum(len(values) for values in self.latencies.values())
+            return {
+                "users": self.args.users,
+                "concurrency": self.args.concurrency,
+                "latency_scale": self.args.latency_scale,
+                "tokenizer": tokenizer,
+                "elapsed_seconds": elapsed,
+                "updates": updates,
+                "throughput": updates / elapsed if elapsed else 0.0,
+                "handlers": {handler: _percentiles(values) for handler, values in sorted(self.latencies.items())},
+                "failures": dict(self.failures),
+                "stages": tracer.stats(),
+                "upstream_calls": dict(sorted(self.upstreams.calls.items())),
+                "market_cache_hit_rate": bot.cache.stats()["hit_rate"],
+                "model_routing": bot.analyzer.router.stats(),
+                "outbox": bot.outbox.stats(),
+                "peak_rss_mb": peak_rss_mb(),
+            }
+
+
+def print_report(results: Dict) -> None:
+    print(f"\n{results['users']} משתמשים, {results['concurrency']} במקביל, השהיה x{results['latency_scale']}, "
+          f"tokenizer: {results['tokenizer']}")
+    print(f"{results['updates']} עדכונים ב-{results['elapsed_seconds']:.2f} שניות "
+          f"({results['throughput']:.1f} עדכונים/שנייה), RSS מקסימלי {results['peak_rss_mb']:.0f}MB\n")
+
+    print(f"{'handler':<12}{'n':>7}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}{'fail':>6}")
+    for handler, values in results["handlers"].items():
+        print(f"{handler:<12}{values['count']:>7}{values['p50'] * 1000:>10.1f}{values['p95'] * 1000:>10.1f}"
+              f"{values['p99'] * 1000:>10.1f}{values['max'] * 1000:>10.1f}{results['failures'].get(handler, 0):>6}")
+
+    print(f"\n{'stage':<18}{'n':>7}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'err %':>8}")
+    for stage, values in results["stages"].items():
+        print(f"{stage:<18}{values['count']:>7}{values['p50'] * 1000:>10.2f}{values['p95'] * 1000:>10.2f}"
+              f"{values['p99'] * 1000:>10.2f}{values['error_rate'] * 100:>8.1f}")
+
+    print("\nקריאות לשירותים:")
+    for name, count in results["upstream_calls"].items():
+        print(f"  {name:<32}{count:>7}")
+    print(f"\nאחוז פגיעה במטמון נתוני השוק: {results['market_cache_hit_rate'] * 100:.1f}%")
+    routing = results["model_routing"]
+    print(f"ניתוב מודלים: {routing['routed']}, מעברים לגיבוי: {routing['fallbacks']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="בדיקת עומס של הבוט מול שירותים מדומים")
+    parser.add_argument("--users", type=int, default=100, help="מספר המשתמשים המדומים")
+    parser.add_argument("--concurrency", type=int, default=25, help="משתמשים פעילים בו-זמנית")
+    parser.add_argument("--actions", type=int, default=4, help="פעולות לכל משתמש")
+    parser.add_argument("--latency-scale", type=float, default=1.0,
+                        help="מכפיל להשהיות של השירותים (0 = ללא השהיה)")
+    parser.add_argument("--alpha-vantage-rpm", type=float, default=75, help="מכסת Alpha Vantage לדקה")
+    parser.add_argument("--openai-429-rate", type=float, default=0.0,
+                        help="חלק מהבקשות ל-OpenAI שנענות ב-429 (בדיקת מעבר למודל הגיבוי)")
+    parser.add_argument("--no-pacing", action="store_true", help="ביטול מגבלות הקצב של תור השליחה לטלגרם")
+    parser.add_argument("--fixtures", help="קובץ JSON של תשובות מוקלטות (ברירת מחדל: נתונים סינתטיים)")
+    parser.add_argument("--tokenizer", choices=("bpe", "fake"), default="bpe",
+                        help="bpe - קובץ ה-BPE של tiktoken (חייב להיות במטמון); fake - tokenizer מקומי מקורב")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--json", help="שמירת התוצאות לקובץ JSON")
+    args = parser.parse_args()
+
+    results = asyncio.run(LoadTest(args).run())
+    print_report(results)
+    if args.json:
+        Path(args.json).write_text(json.dumps(results, ensure_ascii=False, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
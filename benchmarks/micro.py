@@ -0,0 +1,146 @@
+"""
+מיקרו-benchmarks לפונקציות שרצות בכל בקשה: זיהוי המניה (get_ticker), ספירת טוקנים (estimate_tokens)
+ובניית התשובות של /earnings, /dividends, /holdings ו-/aristocrats מנתונים שכבר במטמון.
+
+שימוש:
+    python benchmarks/micro.py
+    python benchmarks/micro.py --only get_ticker --repeat 20000
+    python benchmarks/micro.py --tokenizer fake    # בלי רשת: בלי קובץ ה-BPE של tiktoken
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Callable, Dict, List
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+os.chdir(ROOT)
+
+from benchmarks.fakes import use_tokenizer  # noqa: E402
+from benchmarks.fixtures import TICKERS, YFinanceTicker, load_fixtures  # noqa: E402
+
+TICKER_TEXTS = [
+    "למה המניה של אפל יורדת?",
+    "מה קורה עם המניה של טסלה היום",
+    "תסביר מה קורה עם abbvie",
+    "השווה בין מיקרוסופט לאנבידיה",
+    "מה דעתך על NVDA אחרי הדוח?",
+    "האם כדאי לשים לב למניה של קוקה קולה",
+    "מה קורה עם חברת Palantir Technologies",
+    "שאלה כללית בלי שום חברה",
+]
+
+
+def measure(fn: Callable[[], object], repeat: int, batch: int = 1) -> Dict[str, float]:
+    """
+    זמן לקריאה (מיקרו-שניות): repeat מדידות, כל אחת של batch קריאות
+    """
+    fn()  # חימום (טעינת מודולים, tokenizer, אינדקס)
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter_ns()
+        for _ in range(batch):
+            fn()
+        samples.append((time.perf_counter_ns() - started) / batch / 1000)
+    samples.sort()
+    return {"mean": statistics.fmean(samples), "p50": samples[len(samples) // 2],
+            "p95": samples[min(len(samples) - 1, int(len(samples) * 0.95))], "n": repeat * batch}
+
+
+def bench_get_ticker(repeat: int) -> Dict[str, Dict[str, float]]:
+    from utils.stocks_list_manager import StockListManager
+
+    manager = StockListManager()
+    texts = iter(TICKER_TEXTS * (repeat + 1))
+    return {
+        "get_ticker": measure(lambda: manager.get_ticker(next(texts)), repeat),
+        "get_tickers": measure(lambda: manager.get_tickers(TICKER_TEXTS[3]), repeat),
+    }
+
+
+def bench_estimate_tokens(repeat: int) -> Dict[str, Dict[str, float]]:
+    from utils.cost_calculator import CostCalculator
+
+    calculator = CostCalculator()
+    news = [f"{item['title']}\n{item['summary']}" for item in load_fixtures()["news"]["AAPL"]]
+    prompt = "\n\n".join(news)
+    counter = iter(range(10 ** 9))
+    return {
+        # טקסט חדש בכל קריאה - עובר ב-tokenizer
+        "estimate_tokens_cold": measure(lambda: calculator.estimate_tokens(f"{next(counter)} {news[0]}"), repeat),
+        # אותם טקסטים שוב - מטמון הספירות
+        "estimate_tokens_warm": measure(lambda: calculator.estimate_tokens(news[1]), repeat),
+        "estimate_tokens_prompt": measure(lambda: calculator.estimate_tokens(f"{next(counter)} {prompt}"),
+                                          max(1, repeat // 10)),
+    }
+
+
+def _seeded_cache(tickers: List[str]):
+    """
+    מטמון בזיכרון עם כל הנתונים של yfinance, כדי שנמדד רק עיבוד הנתונים ובניית הטקסט
+    """
+    from utils.market_cache import MarketDataCache
+
+    fixtures = load_fixtures()
+    cache = MarketDataCache()
+    for symbol in tickers:
+        ticker = YFinanceTicker(symbol, fixtures)
+        cache.set("info", symbol, ticker.info)
+        cache.set("earnings", symbol, {"calendar": ticker.calendar, "earnings_dates": ticker.earnings_dates})
+        cache.set("history", symbol, ticker.history(period="5y")["Close"])
+        cache.set("dividends", symbol, ticker.dividends)
+        cache.set("holdings", symbol, {"institutional_holders": ticker.institutional_holders,
+                                       "major_holders": ticker.major_holders})
+    return cache
+
+
+def bench_formatters(repeat: int) -> Dict[str, Dict[str, float]]:
+    from app.institutional_holdings import InstitutionalHoldingsAnalyzer
+    from app.stock_events_analyzer import StockEventsAnalyzer
+
+    tickers = list(TICKERS)
+    cache = _seeded_cache(tickers)
+    events = StockEventsAnalyzer(cache=cache)
+    holdings = InstitutionalHoldingsAnalyzer(cache=cache)
+    loop = asyncio.new_event_loop()
+    try:
+        run = loop.run_until_complete
+        return {
+            "earnings_info": measure(lambda: run(events.get_earnings_info("AAPL")), repeat),
+            "dividend_info": measure(lambda: run(events.get_dividend_info("KO")), repeat),
+            "institutional_holdings": measure(lambda: run(holdings.get_institutional_holdings("MSFT")), repeat),
+            f"dividend_aristocrats[{len(tickers)}]": measure(
+                lambda: run(events.get_dividend_aristocrats(tickers)), max(1, repeat // 5)),
+        }
+    finally:
+        loop.close()
+
+
+BENCHMARKS = {
+    "get_ticker": bench_get_ticker,
+    "estimate_tokens": bench_estimate_tokens,
+    "formatters": bench_formatters,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="מיקרו-benchmarks לפונקציות החמות של הבוט")
+    parser.add_argument("--only", choices=sorted(BENCHMARKS), action="append", help="הרצת קבוצה מסוימת בלבד")
+    parser.add_argument("--repeat", type=int, default=200, help="מספר המדידות לכל פונקציה")
+    parser.add_argument("--tokenizer", choices=("bpe", "fake"), default="bpe",
+                        help="bpe - קובץ ה-BPE של tiktoken (חייב להיות במטמון); fake - tokenizer מקומי מקורב")
+    args = parser.parse_args()
+
+    print(f"tokenizer: {use_tokenizer(args.tokenizer)}")
+    print(f"{'benchmark':<32}{'n':>8}{'mean µs':>12}{'p50 µs':>12}{'p95 µs':>12}")
+    for group in args.only or BENCHMARKS:
+        for name, result in BENCHMARKS[group](args.repeat).items():
+            print(f"{name:<32}{result['n']:>8}{result['mean']:>12.1f}{result['p50']:>12.1f}{result['p95']:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
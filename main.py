@@ -1,4 +1,8 @@
+import time
+
+STARTED_AT = time.perf_counter()
+
 from app.telegram_bot import main
 
 if __name__ == "__main__":
-    main()
+    main(STARTED_AT)
@@ -0,0 +1,147 @@
+"""
+בניית אינדקס הסימולים (settings/symbol_index.bin) מרשימות המסחר של Nasdaq Trader.
+
+שימוש:
+    python scripts/build_symbol_index.py
+    python scripts/build_symbol_index.py --nasdaq nasdaqlisted.txt --other otherlisted.txt
+"""
+import argparse
+import re
+import struct
+import sys
+import urllib.request
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, Iterable, List, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from utils.symbol_index import (  # noqa: E402
+    DEFAULT_INDEX_PATH, FIELD_SEP, GRAM_ENTRY, HEADER, MAGIC,
+    english_skeleton, gram_hash, name_grams, normalize_name, skeleton_grams,
+)
+
+NASDAQ_LISTED_URL = "https://www.nasdaqtrader.com/dynamic/SymDir/nasdaqlisted.txt"
+OTHER_LISTED_URL = "https://www.nasdaqtrader.com/dynamic/SymDir/otherlisted.txt"
+
+# ניירות שאינם מניות רגילות ולא אמורים לענות על שאלה על "החברה"
+SKIPPED_SECURITIES = ("warrant", "right", " unit", "units", "preferred", "notes due", "debenture")
+
+
+def read_source(source: str) -> str:
+    """
+    קריאת קובץ רשימה - מ-URL או מנתיב מקומי
+    """
+    if source.startswith("http"):
+        with urllib.request.urlopen(source, timeout=30) as response:
+            return response.read().decode("utf-8", errors="replace")
+    return Path(source).read_text(encoding="utf-8", errors="replace")
+
+
+def parse_listings(text: str) -> Iterable[Tuple[str, str, bool]]:
+    """
+    פירוק קובץ pipe-delimited של Nasdaq Trader ל-(symbol, name, is_etf)
+    """
+    lines = text.strip().splitlines()
+    header = lines[0].split("|")
+    symbol_column = "Symbol" if "Symbol" in header else "ACT Symbol"
+    for line in lines[1:]:
+        if line.startswith("File Creation Time"):
+            continue
+        row = dict(zip(header, line.split("|")))
+        if row.get("Test Issue") == "Y":
+            continue
+        symbol = row.get(symbol_column, "").strip()
+        name = row.get("Security Name", "").strip()
+        if not symbol or not name or not symbol.replace(".", "").isalnum():
+            continue
+        if any(marker in name.lower() for marker in SKIPPED_SECURITIES):
+            continue
+        # Yahoo כותב סדרות מניות עם מקף (BRK.B -> BRK-B)
+        yield symbol.replace(".", "-"), name, row.get("ETF") == "Y"
+
+
+def _display_name(name: str) -> str:
+    """
+    שם לתצוגה - בלי תיאור סוג נייר הערך ("Class A Common Stock" וכו')
+    """
+    name = name.split(" - ")[0]
+    return re.sub(r"\s+(New\s+)?(Class [A-Z]\s+)?(Common Stock|Ordinary Shares).*$", "", name).strip()
+
+
+def _rank(name: str, is_etf: bool) -> int:
+    lowered = name.lower()
+    if is_etf:
+        return 1
+    if "common stock" in lowered or "ordinary shares" in lowered or "depositary" in lowered:
+        return 0
+    return 2
+
+
+def build_index(listings: Iterable[Tuple[str, str, bool]], output_path: str) -> int:
+    """
+    כתיבת הקובץ הבינארי לפי המבנה המתואר ב-utils/symbol_index.py
+    """
+    unique: Dict[str, Tuple[str, bool]] = {}
+    for symbol, name, is_etf in listings:
+        unique.setdefault(symbol, (name, is_etf))
+
+    records: List[Tuple[str, str, str, str, int]] = []
+    for symbol in sorted(unique):
+        display, is_etf = unique[symbol]
+        name = normalize_name(display) or symbol.lower()
+        skeleton = english_skeleton(name.split(" ")[0])
+        records.append((symbol, name, skeleton, _display_name(display), _rank(display, is_etf)))
+
+    strings = bytearray()
+    offsets = []
+    postings: Dict[int, set] = defaultdict(set)
+    for record_id, (symbol, name, skeleton, display, rank) in enumerate(records):
+        offsets.append(len(strings))
+        strings += FIELD_SEP.join([symbol, name, skeleton, display, str(rank)]).encode("utf-8")
+        for gram in name_grams(name):
+            postings[gram_hash(gram)].add(record_id)
+        if skeleton:
+            for gram in skeleton_grams(skeleton):
+                postings[gram_hash(gram)].add(record_id)
+    offsets.append(len(strings))
+
+    name_order = sorted(range(len(records)), key=lambda record_id: records[record_id][1])
+
+    gram_table = bytearray()
+    postings_blob = bytearray()
+    position = 0
+    for value in sorted(postings):
+        ids = sorted(postings[value])
+        gram_table += GRAM_ENTRY.pack(value, position, len(ids))
+        postings_blob += struct.pack(f"<{len(ids)}I", *ids)
+        position += len(ids)
+
+    Path(output_path).parent.mkdir(parents=True, exist_ok=True)
+    with open(output_path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, len(records), len(postings), position))
+        f.write(struct.pack(f"<{len(offsets)}I", *offsets))
+        f.write(struct.pack(f"<{len(name_order)}I", *name_order))
+        f.write(gram_table)
+        f.write(postings_blob)
+        f.write(strings)
+    return len(records)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="בניית אינדקס סימולים ממופה-זיכרון")
+    parser.add_argument("--nasdaq", default=NASDAQ_LISTED_URL, help="nasdaqlisted.txt (URL או נתיב)")
+    parser.add_argument("--other", default=OTHER_LISTED_URL, help="otherlisted.txt (URL או נתיב)")
+    parser.add_argument("--output", default=DEFAULT_INDEX_PATH)
+    args = parser.parse_args()
+
+    listings = []
+    for source in (args.nasdaq, args.other):
+        listings.extend(parse_listings(read_source(source)))
+
+    count = build_index(listings, args.output)
+    print(f"נכתבו {count:,} סימולים ל-{args.output}")
+
+
+if __name__ == "__main__":
+    main()
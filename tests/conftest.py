@@ -0,0 +1,9 @@
+import os
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+# המודולים קוראים את settings/ בנתיב יחסי
+os.chdir(ROOT)
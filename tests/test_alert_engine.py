@@ -0,0 +1,52 @@
+import asyncio
+import threading
+
+from app.alert_engine import AlertEngine
+from utils.executor import BlockingExecutor
+from utils.watchlist_store import WatchlistStore
+
+
+class RecordingStore(WatchlistStore):
+    def __init__(self, db_path):
+        super().__init__(db_path)
+        self.threads = set()
+
+    def subscriptions(self):
+        self.threads.add(threading.get_ident())
+        return super().subscriptions()
+
+    def set_triggered(self, ids, triggered):
+        self.threads.add(threading.get_ident())
+        super().set_triggered(ids, triggered)
+
+
+class FakeAnalyzer:
+    async def get_stock_quotes(self, tickers):
+        return {ticker: {"current_price": 150.0, "percent_change": 1.0} for ticker in tickers}
+
+
+class FakeOutbox:
+    def __init__(self):
+        self.sent = []
+
+    async def send(self, chat_id, text, priority=None):
+        self.sent.append((chat_id, text))
+
+
+def test_tick_keeps_sqlite_off_the_event_loop(tmp_path):
+    store = RecordingStore(str(tmp_path / "watchlists.db"))
+    store.add("1", 10, "AAPL", "above", 100.0)
+    outbox = FakeOutbox()
+    executor = BlockingExecutor(max_workers=2)
+    engine = AlertEngine(FakeAnalyzer(), store, outbox, executor=executor)
+
+    try:
+        asyncio.run(engine.tick(None))
+        asyncio.run(engine.tick(None))
+    finally:
+        executor.shutdown()
+
+    threads = set(store.threads)
+    assert threads and threading.get_ident() not in threads
+    assert len(outbox.sent) == 1 and "AAPL" in outbox.sent[0][1]
+    assert store.subscriptions()["triggered"].tolist() == [True]
@@ -0,0 +1,38 @@
+import sqlite3
+import time
+
+from utils.disk_cache import DiskCache
+
+
+def test_set_does_not_wait_for_the_write_lock(tmp_path):
+    path = str(tmp_path / "market_cache.db")
+    cache = DiskCache(path)
+    # worker אחר מחזיק את נעילת הכתיבה
+    other = sqlite3.connect(path, isolation_level=None)
+    other.execute("BEGIN IMMEDIATE")
+    try:
+        started = time.perf_counter()
+        cache.set("news", "AAPL", ["item"], 123.0)
+        assert time.perf_counter() - started < 0.1
+        assert cache.get("news", "AAPL") == (["item"], 123.0)
+    finally:
+        other.execute("COMMIT")
+        other.close()
+
+    cache.close()
+    reopened = DiskCache(path)
+    assert reopened.get("news", "AAPL") == (["item"], 123.0)
+    reopened.close()
+
+
+def test_writes_are_batched_and_coalesced(tmp_path):
+    path = str(tmp_path / "market_cache.db")
+    cache = DiskCache(path)
+    for version in range(50):
+        cache.set("info", "MSFT", {"version": version}, float(version))
+    cache.flush()
+
+    reader = DiskCache(path)
+    assert reader.get("info", "MSFT") == ({"version": 49}, 49.0)
+    reader.close()
+    cache.close()
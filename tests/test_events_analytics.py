@@ -0,0 +1,144 @@
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app import events_analytics as analytics
+
+TODAY = date(2026, 10, 17)
+
+
+def test_next_earnings_skips_past_dates():
+    dates = [TODAY - timedelta(days=40), TODAY + timedelta(days=50), TODAY + timedelta(days=10)]
+    assert analytics.next_earnings_date(dates, today=TODAY) == TODAY + timedelta(days=10)
+
+
+def test_next_earnings_today_counts():
+    assert analytics.next_earnings_date([TODAY], today=TODAY) == TODAY
+
+
+def test_next_earnings_only_past_dates():
+    assert analytics.next_earnings_date([TODAY - timedelta(days=1)], today=TODAY) is None
+    assert analytics.next_earnings_date([], today=TODAY) is None
+
+
+def test_next_earnings_timezone_aware():
+    dates = pd.DatetimeIndex([pd.Timestamp(TODAY) - pd.Timedelta(days=91), pd.Timestamp(TODAY) + pd.Timedelta(days=3)],
+                             tz="America/New_York")
+    assert analytics.next_earnings_date(dates, today=TODAY) == TODAY + timedelta(days=3)
+
+
+def _payments(*payments):
+    return pd.Series([amount for _, amount in payments], index=pd.DatetimeIndex([day for day, _ in payments]))
+
+
+# סכומים שנתיים (שני תשלומים בשנה) - 2019..2025, ותשלום בשנה הנוכחית שלא נספר
+DIVIDENDS = {
+    # קיצוץ ב-2021: 1.0, 1.2, 1.0, 1.1, 1.2, 1.3, 1.4
+    "CUT": _payments(*[(f"{year}-{month}-15", amount / 2) for year, amount in
+                       zip(range(2019, 2026), (1.0, 1.2, 1.0, 1.1, 1.2, 1.3, 1.4)) for month in (3, 9)],
+                     ("2026-03-15", 0.8)),
+    # שנה בלי חלוקה (2021): 1.0, -, 1.0, 1.1, 1.2, 1.3
+    "GAP": _payments(("2020-06-01", 1.0), ("2022-06-01", 1.0), ("2023-06-01", 1.1), ("2024-06-01", 1.2),
+                     ("2025-06-01", 1.3)),
+    "ONE": _payments(("2025-06-01", 0.5)),
+    # רק השנה הנוכחית (חלקית)
+    "NEW": _payments(("2026-02-01", 0.3)),
+}
+
+
+def test_dividend_table():
+    table = analytics.dividend_table(DIVIDENDS, through_year=2025)
+
+    cut = table.loc["CUT"]
+    assert (cut.years_paid, cut.payout_streak, cut.increase_streak) == (7, 7, 4)
+    assert cut.last_annual == pytest.approx(1.4)
+    assert cut.cagr == pytest.approx(1.4 ** (1 / 6) - 1)
+    assert cut.cagr_5y == pytest.approx((1.4 / 1.2) ** (1 / 5) - 1)
+
+    gap = table.loc["GAP"]
+    assert (gap.years_paid, gap.payout_streak, gap.increase_streak) == (5, 4, 3)
+    assert gap.cagr == pytest.approx(1.3 ** (1 / 5) - 1)
+    assert gap.cagr_5y == pytest.approx(1.3 ** (1 / 5) - 1)
+
+    one = table.loc["ONE"]
+    assert (one.years_paid, one.payout_streak, one.increase_streak) == (1, 1, 0)
+    assert one.last_annual == pytest.approx(0.5)
+    assert np.isnan(one.cagr) and np.isnan(one.cagr_5y)
+
+    new = table.loc["NEW"]
+    assert (new.years_paid, new.payout_streak, new.increase_streak, new.last_annual) == (0, 0, 0, 0)
+    assert np.isnan(new.cagr)
+
+
+def test_dividend_table_empty():
+    assert analytics.dividend_table({"X": pd.Series(dtype=float)}, through_year=2025).empty
+
+
+def test_dividend_aristocrats():
+    table = analytics.dividend_table(DIVIDENDS, through_year=2025)
+    assert analytics.dividend_aristocrats(table, min_streak=3).index.tolist() == ["CUT", "GAP"]
+    assert analytics.dividend_aristocrats(table, min_streak=4).index.tolist() == ["CUT"]
+    assert analytics.dividend_aristocrats(table, min_streak=5).empty
+
+
+def _closes(*prices):
+    return pd.Series([price for _, price in prices], index=pd.DatetimeIndex([day for day, _ in prices]))
+
+
+CLOSES = {
+    "AAA": _closes(("2025-01-29", 100.0), ("2025-01-30", 102.0), ("2025-01-31", 110.0),
+                   ("2025-04-29", 50.0), ("2025-04-30", 45.0)),
+    # דוח ביום שישי אחרי הסגירה - הסגירה הבאה ביום שני
+    "BBB": _closes(("2025-02-06", 9.0), ("2025-02-07", 10.0), ("2025-02-10", 11.0)),
+}
+
+
+def test_reactions():
+    dates = pd.DatetimeIndex(["2025-01-30 16:30", "2025-04-30 08:00", "2025-07-30 16:30", "2025-01-01 08:00",
+                              "2025-02-07 16:30"])
+    codes = np.array([0, 0, 0, 0, 1])
+    reactions = analytics._reactions(dates, codes, CLOSES, ["AAA", "BBB"])
+
+    # אחרי הסגירה: סגירת אותו יום מול הבאה; לפני הפתיחה: הסגירה הקודמת מול סגירת אותו יום
+    assert reactions[0] == pytest.approx(110 / 102 - 1)
+    assert reactions[1] == pytest.approx(45 / 50 - 1)
+    # אין מחיר אחרי הדוח (המחיר הבא שייך למניה אחרת) או לפניו
+    assert np.isnan(reactions[2]) and np.isnan(reactions[3])
+    assert reactions[4] == pytest.approx(0.1)
+
+
+def _earnings(*rows):
+    index = pd.DatetimeIndex([row[0] for row in rows]).tz_localize("America/New_York")
+    return pd.DataFrame([row[1:] for row in rows], index=index,
+                        columns=["EPS Estimate", "Reported EPS", "Surprise(%)"])
+
+
+def test_earnings_table():
+    earnings = {
+        "AAA": _earnings(("2025-10-30 16:30", 1.1, np.nan, np.nan),  # דוח עתידי - לא נספר
+                         ("2025-07-30 16:30", np.nan, 1.0, np.nan),
+                         ("2025-04-30 08:00", 1.0, 0.9, -10.0),
+                         ("2025-01-30 16:30", 1.0, 1.2, 20.0)),
+        "BBB": _earnings(("2025-02-07 16:30", 2.0, 2.0, 0.0)),
+        "CCC": _earnings(("2025-11-01 08:00", 1.0, np.nan, np.nan)),
+    }
+    table = analytics.earnings_table(earnings, CLOSES)
+    assert table.index.tolist() == ["AAA", "BBB"]
+
+    aaa = table.loc["AAA"]
+    first, second = 110 / 102 - 1, 45 / 50 - 1
+    assert aaa.reports == 3
+    assert (aaa.beat_rate, aaa.miss_rate) == (0.5, 0.5)
+    assert aaa.avg_surprise == pytest.approx(5.0)
+    assert aaa.avg_reaction == pytest.approx((first + second) / 2)
+    assert aaa.avg_abs_reaction == pytest.approx((abs(first) + abs(second)) / 2)
+
+    bbb = table.loc["BBB"]
+    assert (bbb.reports, bbb.beat_rate, bbb.miss_rate, bbb.avg_surprise) == (1, 0, 0, 0)
+    assert bbb.avg_reaction == pytest.approx(0.1)
+
+
+def test_earnings_table_without_reports():
+    assert analytics.earnings_table({"CCC": _earnings(("2025-11-01 08:00", 1.0, np.nan, np.nan))}).empty
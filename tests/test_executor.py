@@ -0,0 +1,26 @@
+import asyncio
+
+from utils.executor import DEFAULT_BACKEND_LIMITS, BlockingExecutor
+
+
+def test_async_calls_share_the_backend_limit(monkeypatch):
+    monkeypatch.delenv("OPENAI_MAX_CONCURRENCY", raising=False)
+    executor = BlockingExecutor(max_workers=16)
+    running = peak = 0
+
+    async def call():
+        nonlocal running, peak
+        async with executor.limit("openai"):
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+
+    async def scenario():
+        await asyncio.gather(*(call() for _ in range(20)))
+
+    try:
+        asyncio.run(scenario())
+    finally:
+        executor.shutdown()
+    assert peak == executor.backend_limits["openai"] == DEFAULT_BACKEND_LIMITS["openai"]
@@ -0,0 +1,47 @@
+import asyncio
+
+import pandas as pd
+import pytest
+
+from utils.fundamentals_store import COLUMNS, NUMERIC_COLUMNS, FundamentalsStore, parse_filters
+
+
+def _store(tmp_path, next_earnings):
+    today = pd.Timestamp.now().normalize()
+    store = FundamentalsStore(path=str(tmp_path / "fundamentals.parquet"))
+    frame = pd.DataFrame(index=pd.Index(list(next_earnings), name="symbol"), columns=COLUMNS)
+    frame["market_cap"] = 1e9
+    frame["next_earnings"] = pd.to_datetime([today + pd.Timedelta(days=days) if days is not None else None
+                                             for days in next_earnings.values()])
+    store.frame = frame
+    return store
+
+
+def test_earnings_filter_ignores_past_reports(tmp_path):
+    store = _store(tmp_path, {"AAPL": -40, "MSFT": 5, "KO": 30, "PFE": None})
+
+    assert list(store.screen(parse_filters("earnings<=7")).index) == ["MSFT"]
+    assert list(store.screen(parse_filters("earnings!=5")).index) == ["KO"]
+
+
+def test_bulk_quotes_update_price_and_market_cap(tmp_path):
+    store = FundamentalsStore(path=str(tmp_path / "fundamentals.parquet"))
+    frame = pd.DataFrame(index=pd.Index(["AAPL", "KO", "PFE"], name="symbol"), columns=COLUMNS)
+    frame[NUMERIC_COLUMNS] = frame[NUMERIC_COLUMNS].astype(float)
+    frame["price"] = [100.0, 50.0, 25.0]
+    frame["market_cap"] = [1e12, 2e11, 1.5e11]
+    frame["shares_outstanding"] = [1e10, None, 6e9]
+    store.frame = frame
+
+    quotes = {"AAPL": {"current_price": 110.0}, "KO": {"current_price": 55.0}, "PFE": {"current_price": None},
+              "MSFT": {"current_price": 400.0}}
+    assert asyncio.run(store.apply_quotes(quotes)) == 2
+    store.executor.shutdown()
+
+    # עם מספר מניות: מחיר × מניות; בלי: השווי הקודם לפי שינוי המחיר; בלי מחיר: ללא שינוי
+    assert store.frame.loc["AAPL", ["price", "market_cap"]].tolist() == [110.0, 1.1e12]
+    assert store.frame.loc["KO", "price"] == 55.0
+    assert store.frame.loc["KO", "market_cap"] == pytest.approx(2.2e11)
+    assert store.frame.loc["PFE", ["price", "market_cap"]].tolist() == [25.0, 1.5e11]
+    assert "MSFT" not in store.frame.index
+    assert store.path.exists()
@@ -0,0 +1,32 @@
+import asyncio
+import threading
+
+from utils.security_manager import SecurityManager
+from utils.usage_store import UsageStore
+
+
+def test_ledger_writes_run_off_the_event_loop(tmp_path, monkeypatch):
+    monkeypatch.setenv("DAILY_COST_LIMIT", "1.0")
+    store = UsageStore(str(tmp_path / "usage.db"))
+    threads = []
+    for name in ("reserve", "commit", "release"):
+        original = getattr(store, name)
+
+        def recorded(*args, _original=original, **kwargs):
+            threads.append(threading.get_ident())
+            return _original(*args, **kwargs)
+
+        monkeypatch.setattr(store, name, recorded)
+    security = SecurityManager(usage_store=store)
+
+    async def scenario():
+        first, _ = await security.reserve_budget("7", 0.05)
+        second, _ = await security.reserve_budget("7", 0.05)
+        await security.commit_usage(first, 0.03)
+        await security.release_budget(second)
+        return threading.get_ident()
+
+    loop_thread = asyncio.run(scenario())
+
+    assert len(threads) == 4 and loop_thread not in threads
+    assert store.get("7") == (0.03, 0.0)
@@ -0,0 +1,25 @@
+from utils.disk_cache import DiskCache
+from utils.semantic_cache import SemanticCache
+
+
+def test_answers_are_shared_between_workers(tmp_path):
+    first = SemanticCache(disk=DiskCache(str(tmp_path / "market_cache.db")))
+    second = SemanticCache(disk=DiskCache(str(tmp_path / "market_cache.db")))
+
+    first.add("AAPL", "למה אפל יורדת היום?", "תשובה", 0.01)
+    first.disk.flush()
+    reused = second.lookup("AAPL", "מה קורה עם אפל?")
+    assert reused is not None and reused["answer"] == "תשובה"
+
+    second.add("AAPL", "מה הדוחות של אפל?", "תשובה על הדוחות", 0.02)
+    second.disk.flush()
+    assert {entry["question"] for entry in first._fresh_entries("AAPL")} == {
+        "למה אפל יורדת היום?", "מה הדוחות של אפל?"
+    }
+
+
+def test_without_disk_the_index_stays_in_memory(tmp_path):
+    cache = SemanticCache()
+    cache.add("AAPL", "למה אפל יורדת היום?", "תשובה", 0.01)
+    assert cache.lookup("AAPL", "מה קורה עם אפל?") is not None
+    assert SemanticCache().lookup("AAPL", "מה קורה עם אפל?") is None
@@ -0,0 +1,33 @@
+import pytest
+
+from app.telegram_bot import StockNewsTelegramBot
+from utils.send_queue import GLOBAL_MESSAGES_PER_SECOND
+
+
+@pytest.fixture
+def data_dir(tmp_path, monkeypatch):
+    for name, filename in (("MARKET_CACHE_PATH", "market_cache.db"), ("USAGE_DB_PATH", "usage.db"),
+                           ("WATCHLIST_DB_PATH", "watchlists.db"), ("FUNDAMENTALS_PATH", "fundamentals.parquet")):
+        monkeypatch.setenv(name, str(tmp_path / filename))
+    return tmp_path
+
+
+@pytest.mark.parametrize("workers", [1, 4, 60])
+def test_global_rate_is_split_between_workers(data_dir, workers):
+    bot = StockNewsTelegramBot("123456:TEST", "azure-key", "alpha-vantage-key",
+                               worker_index=workers - 1, workers=workers)
+    bucket = bot.outbox.global_bucket
+    assert bucket.rate * workers == pytest.approx(GLOBAL_MESSAGES_PER_SECOND)
+    assert 1 <= bucket.capacity <= max(1, GLOBAL_MESSAGES_PER_SECOND // workers)
+
+
+@pytest.mark.parametrize("worker_index", [0, 3])
+def test_every_worker_prefetches_its_own_users(data_dir, worker_index):
+    bot = StockNewsTelegramBot("123456:TEST", "azure-key", "alpha-vantage-key",
+                               worker_index=worker_index, workers=4)
+    jobs = {job.name for job in bot.application.job_queue.jobs()}
+    assert {"prefetch_hot", "prefetch_decay", "prefetch_earnings"} <= jobs
+    assert ("alerts" in jobs) == (worker_index == 0)
+    assert ("fundamentals_refresh" in jobs) == (worker_index == 0)
+    assert ("fundamentals_prices" in jobs) == (worker_index == 0)
+    assert bot.prefetch.calls_per_minute == 5
@@ -0,0 +1,62 @@
+import pytest
+
+from scripts.build_symbol_index import build_index
+from utils.symbol_index import SymbolIndex
+
+LISTINGS = [
+    ("A", "Agilent Technologies, Inc. Common Stock", False),
+    ("AI", "C3.ai, Inc. Class A Common Stock", False),
+    ("AMD", "Advanced Micro Devices, Inc. Common Stock", False),
+    ("DOX", "Amdocs Limited Ordinary Shares", False),
+    ("GTIM", "Good Times Restaurants Inc. Common Stock", False),
+    ("OTLK", "Outlook Therapeutics, Inc. Common Stock", False),
+    ("PLTR", "Palantir Technologies Inc. Class A Common Stock", False),
+    ("AAPL", "Apple Inc. Common Stock", False),
+    ("MKTX", "MarketAxess Holdings Inc. Common Stock", False),
+    ("GFI", "Gold Fields Limited American Depositary Shares", False),
+    ("RATE", "Rate Holdings Inc. Common Stock", False),
+    ("LOW", "Lowe's Companies, Inc. Common Stock", False),
+]
+
+
+@pytest.fixture(scope="module")
+def index(tmp_path_factory):
+    path = tmp_path_factory.mktemp("symbols") / "symbol_index.bin"
+    build_index(LISTINGS, str(path))
+    return SymbolIndex(str(path))
+
+
+@pytest.mark.parametrize("text", [
+    "A good time to buy palantir?",
+    "What is the AI outlook for palantir",
+    "מה קורה עם פלנטיר",
+])
+def test_company_name_beats_common_words(index, text):
+    assert index.resolve(text) == "PLTR"
+
+
+def test_cashtag_is_explicit(index):
+    assert index.resolve("What is the $AI outlook for palantir") == "AI"
+
+
+def test_uppercase_symbol_without_name_match(index):
+    assert index.resolve("Is AMD worth it") == "AMD"
+
+
+def test_stopword_alone_is_not_a_symbol(index):
+    assert index.resolve("What about AI") is None
+
+
+@pytest.mark.parametrize("text", [
+    "why is the market down today",
+    "is gold a good investment",
+    "why are rates rising",
+    "how low can it go",
+])
+def test_common_words_are_not_companies(index, text):
+    assert index.resolve(text) is None
+
+
+def test_english_name_needs_exact_match(index):
+    assert index.resolve("thoughts on palan") is None
+    assert index.resolve("how is apple doing") == "AAPL"
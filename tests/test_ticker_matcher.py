@@ -0,0 +1,27 @@
+from utils.ticker_matcher import TickerMatcher
+
+
+def test_added_and_removed_aliases():
+    matcher = TickerMatcher({"אפל": "AAPL", "טסלה": "TSLA"})
+    assert matcher.find("מה קורה עם באפל") == "AAPL"
+
+    matcher.add("אפליקציה", "APP")
+    assert [match.symbol for match in matcher.find_all("אפליקציה ואפל")] == ["APP", "AAPL"]
+
+    matcher.remove("אפל")
+    assert matcher.find("מה קורה עם אפל") is None
+    assert matcher.find("אפליקציה") == "APP"
+    assert matcher.find("AAPL") is None
+
+
+def test_removed_aliases_are_pruned():
+    matcher = TickerMatcher({"טסלה": "TSLA"})
+    matcher.find("")
+    size = len(matcher._goto)
+
+    for index in range(100):
+        matcher.add(f"חברה {index}", f"X{index}")
+        matcher.find("")
+        matcher.remove(f"חברה {index}")
+    assert matcher.find("מה עם טסלה") == "TSLA"
+    assert len(matcher._goto) == size
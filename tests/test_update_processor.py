@@ -0,0 +1,36 @@
+import asyncio
+
+from telegram import Update
+
+from app.update_processor import PerUserUpdateProcessor
+
+
+def _update(update_id, user_id):
+    return Update.de_json({"update_id": update_id, "message": {
+        "message_id": update_id, "date": 0, "chat": {"id": user_id, "type": "private"},
+        "from": {"id": user_id, "is_bot": False, "first_name": "u"}, "text": "x"}}, None)
+
+
+def test_users_run_concurrently_and_each_user_in_order():
+    processor = PerUserUpdateProcessor(max_concurrent_updates=16)
+    events = []
+
+    async def handler(name, delay):
+        events.append(("start", name))
+        await asyncio.sleep(delay)
+        events.append(("end", name))
+
+    async def scenario():
+        await asyncio.gather(
+            processor.process_update(_update(1, 1), handler("slow-1", 0.05)),
+            processor.process_update(_update(2, 1), handler("confirm-1", 0)),
+            processor.process_update(_update(3, 2), handler("fast-2", 0)),
+        )
+
+    asyncio.run(scenario())
+
+    order = [name for kind, name in events if kind == "end"]
+    # משתמש 2 לא מחכה למשתמש 1, והאישור של משתמש 1 מגיע אחרי השאלה שלו
+    assert order == ["fast-2", "slow-1", "confirm-1"]
+    assert events.index(("start", "confirm-1")) > events.index(("end", "slow-1"))
+    assert not processor._locks and not processor._pending
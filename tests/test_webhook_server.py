@@ -0,0 +1,47 @@
+import asyncio
+import json
+
+import pytest
+
+from app.webhook_server import WebhookServer
+
+URL = "https://bot.example.com/telegram"
+
+
+class _Queue:
+    def __init__(self):
+        self.items = []
+
+    def put(self, item):
+        self.items.append(item)
+
+
+def _post(server, headers):
+    body = json.dumps({"update_id": 1, "message": {"from": {"id": 7}}}).encode()
+    sent = []
+
+    async def receive():
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {"type": "http", "path": "/telegram", "method": "POST", "headers": headers}
+    asyncio.run(server(scope, receive, send))
+    return sent[0]["status"]
+
+
+@pytest.mark.parametrize("secret", [None, ""])
+def test_secret_is_required(secret):
+    with pytest.raises(ValueError):
+        WebhookServer("123456:TEST", URL, secret, workers=1)
+
+
+def test_rejects_updates_without_the_secret():
+    server = WebhookServer("123456:TEST", URL, "s3cret", workers=1)
+    server.queues = [_Queue()]
+
+    assert _post(server, []) == 403
+    assert _post(server, [(b"x-telegram-bot-api-secret-token", b"wrong")]) == 403
+    assert _post(server, [(b"x-telegram-bot-api-secret-token", b"s3cret")]) == 200
+    assert server.rejected == 2 and len(server.queues[0].items) == 1
@@ -1,33 +1,97 @@
-import tiktoken
+import os
+import threading
+from functools import lru_cache
+
+from utils.lazy_import import lazy_import
+from utils.tracing import tracer
+
+tiktoken = lazy_import("tiktoken")
+
+# קבצי ה-BPE של tiktoken נשמרים בתיקייה מקומית (נבנית ב-CI) כדי שלא יורדו מהרשת בכל הפעלה
+TIKTOKEN_CACHE_DIR = os.getenv("TIKTOKEN_CACHE_DIR", "settings/tiktoken")
+
 
 class CostCalculator:
-    def __init__(self):
+    def __init__(self, token_cache_size: int = 4096, model: str = "gpt-4"):
         """
-        מחשבון עלויות לשימוש ב-Azure OpenAI
+        מחשבון עלויות לשימוש ב-Azure OpenAI.
+        ה-tokenizer נטען רק בשימוש הראשון (או ב-warmup ברקע) ולא בזמן עליית הבוט.
         """
-        self.encoding = tiktoken.encoding_for_model("gpt-4")
+        self.model = model
+        self._encoding = None
+        self._encoding_lock = threading.Lock()
+        # ספירת טוקנים שמורה לכל טקסט שכבר נספר (קטעי פרומפט, ידיעות, פרומפט שמוערך שוב באישור)
+        self._count_tokens = lru_cache(maxsize=token_cache_size)(self._encode_length)
+        # מחירים ל-1K טוקנים לפי מודל (שם ה-deployment)
         self.prices = {
             'gpt-4': {
                 'input': 0.03,   # $0.03 per 1K tokens
                 'output': 0.06   # $0.06 per 1K tokens
+            },
+            'gpt-4o': {
+                'input': 0.0025,
+                'output': 0.01
+            },
+            'gpt-4o-mini': {
+                'input': 0.00015,
+                'output': 0.0006
             }
         }
 
+    @property
+    def encoding(self):
+        if self._encoding is None:
+            with self._encoding_lock:
+                if self._encoding is None:
+                    os.environ.setdefault("TIKTOKEN_CACHE_DIR", TIKTOKEN_CACHE_DIR)
+                    self._encoding = tiktoken.encoding_for_model(self.model)
+        return self._encoding
+
+    def warmup(self) -> None:
+        """
+        טעינת ה-tokenizer מראש (ב-thread ברקע, או ב-CI כדי למלא את התיקייה המקומית)
+        """
+        self.encoding.encode("warmup")
+
+    def _encode_length(self, text: str) -> int:
+        # נקרא רק כשהטקסט לא נמצא במטמון הספירות
+        with tracer.span("count_tokens", chars=len(text)) as span:
+            tokens = len(self.encoding.encode(text))
+            span.set(tokens=tokens)
+            return tokens
+
     def estimate_tokens(self, text: str) -> int:
         """
         הערכת מספר הטוקנים בטקסט
         """
-        return len(self.encoding.encode(text))
+        return self._count_tokens(text)
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        """
+        קיצור טקסט לכל היותר max_tokens טוקנים, בסוף מילה שלמה
+        """
+        tokens = self.encoding.encode(text)
+        if len(tokens) <= max_tokens:
+            return text
+        cut = self.encoding.decode(tokens[:max_tokens]).rstrip("\ufffd")
+        if " " in cut:
+            cut = cut.rsplit(" ", 1)[0]
+        return cut + "..."
 
-    def calculate_cost(self, input_tokens: int, output_tokens: int = None, model: str = 'gpt-4') -> dict:
+    def calculate_cost(self, input_tokens: int, output_tokens: int = None, model: str = 'gpt-4',
+                       max_output_tokens: int = None) -> dict:
         """
         חישוב העלות המשוערת
         """
         if output_tokens is None:
             output_tokens = input_tokens // 2  # הערכה גסה לגודל התשובה
+            if max_output_tokens is not None:
+                output_tokens = min(output_tokens, max_output_tokens)
 
-        input_cost = (input_tokens / 1000) * self.prices[model]['input']
-        output_cost = (output_tokens / 1000) * self.prices[model]['output']
+        # deployment בלי מחיר ידוע מחויב לפי gpt-4 - הערכה זהירה
+        prices = self.prices.get(model, self.prices['gpt-4'])
+        input_cost = (input_tokens / 1000) * prices['input']
+        output_cost = (output_tokens / 1000) * prices['output']
         total_cost = input_cost + output_cost
 
         return {
@@ -0,0 +1,131 @@
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+
+class DiskCache:
+    def __init__(self, db_path: Optional[str] = None):
+        """
+        שכבת מטמון מקומית (SQLite) מתחת למטמון שבזיכרון - שורדת הפעלה מחדש של הבוט.
+        הכתיבות (pickle ו-INSERT) נאספות ונכתבות ב-thread נפרד, כך ש-set לא ממתין לנעילת הכתיבה של
+        SQLite (שמוחזקת לפעמים בידי worker אחר) בתוך ה-event loop. קריאה ב-WAL לא ממתינה לכותבים.
+        """
+        self.db_path = db_path or os.getenv("MARKET_CACHE_PATH", "data/market_cache.db")
+        Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS market_data (
+                kind TEXT NOT NULL,
+                ticker TEXT NOT NULL,
+                fetched_at REAL NOT NULL,
+                payload BLOB NOT NULL,
+                PRIMARY KEY (kind, ticker)
+            )
+            """
+        )
+        # חיבור נפרד ל-thread הכתיבה
+        self._writer_conn = sqlite3.connect(self.db_path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._writer_conn.execute("PRAGMA synchronous=NORMAL")
+        # כתיבות שעוד לא נשמרו - כתיבה חדשה לאותו מפתח מחליפה את הקודמת
+        self._pending: Dict[Tuple[str, str], Tuple[Any, float]] = {}
+        self._pending_lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._closed = False
+        self._writer = threading.Thread(target=self._write_loop, name="disk-cache-writer", daemon=True)
+        self._writer.start()
+
+    def get(self, kind: str, ticker: str) -> Optional[Tuple[Any, float]]:
+        """
+        קבלת ערך וזמן ההבאה שלו, או None אם אין רשומה
+        """
+        with self._pending_lock:
+            pending = self._pending.get((kind, ticker))
+        if pending is not None:
+            return pending
+        try:
+            row = self._conn.execute(
+                "SELECT payload, fetched_at FROM market_data WHERE kind = ? AND ticker = ?",
+                (kind, ticker)
+            ).fetchone()
+            if row is None:
+                return None
+            return pickle.loads(row[0]), row[1]
+        except Exception as e:
+            print(f"שגיאה בקריאה ממטמון הדיסק: {e}")
+            return None
+
+    def set(self, kind: str, ticker: str, value: Any, fetched_at: float) -> None:
+        """
+        שמירת ערך יחד עם זמן ההבאה שלו (נכתב לדיסק ברקע)
+        """
+        with self._pending_lock:
+            self._pending[(kind, ticker)] = (value, fetched_at)
+        self._wakeup.set()
+
+    def _write_loop(self) -> None:
+        while True:
+            self._wakeup.wait()
+            self._wakeup.clear()
+            closed = self._closed
+            self.flush()
+            if closed:
+                return
+
+    def flush(self) -> None:
+        """
+        כתיבת כל מה שממתין בטרנזקציה אחת
+        """
+        with self._flush_lock:
+            self._write_pending()
+
+    def _write_pending(self) -> None:
+        with self._pending_lock:
+            batch = list(self._pending.items())
+        if not batch:
+            return
+        try:
+            rows = [(kind, ticker, fetched_at, pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+                    for (kind, ticker), (value, fetched_at) in batch]
+            self._writer_conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._writer_conn.executemany(
+                    "INSERT OR REPLACE INTO market_data (kind, ticker, fetched_at, payload) VALUES (?, ?, ?, ?)",
+                    rows
+                )
+            except BaseException:
+                self._writer_conn.execute("ROLLBACK")
+                raise
+            self._writer_conn.execute("COMMIT")
+        except Exception as e:
+            print(f"שגיאה בכתיבה למטמון הדיסק: {e}")
+        finally:
+            with self._pending_lock:
+                # מה שהוחלף בזמן הכתיבה נשאר לסבב הבא
+                for key, entry in batch:
+                    if self._pending.get(key) is entry:
+                        del self._pending[key]
+
+    def purge(self, max_age: float) -> int:
+        """
+        מחיקת רשומות ישנות מ-max_age שניות
+        """
+        cursor = self._conn.execute("DELETE FROM market_data WHERE fetched_at < ?", (time.time() - max_age,))
+        return cursor.rowcount
+
+    def close(self) -> None:
+        """
+        כתיבת מה שנשאר ועצירת ה-thread
+        """
+        self._closed = True
+        self._wakeup.set()
+        self._writer.join(timeout=30)
+        self._writer_conn.close()
+        self._conn.close()
@@ -0,0 +1,60 @@
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, Dict, Optional
+
+# מגבלת קריאות מקבילות לכל שירות חיצוני
+DEFAULT_BACKEND_LIMITS = {
+    "yahoo": 8,
+    "alphavantage": 2,
+    "openai": 4,
+    # הכתיבות ליומן השימוש עוברות בחיבור SQLite אחד - thread אחד מספיק
+    "usage": 1,
+    # גם רשימות המעקב: חיבור SQLite אחד, כך שכל הגישות אליו עוברות ב-thread אחד בכל פעם
+    "watchlist": 1,
+}
+
+
+class BlockingExecutor:
+    def __init__(self, max_workers: Optional[int] = None, backend_limits: Optional[Dict[str, int]] = None):
+        """
+        מאגר threads משותף להרצת קריאות חוסמות (yfinance) מחוץ ל-event loop,
+        ומגבלת מקביליות לכל שירות - גם לקריאות אסינכרוניות (ראו limit)
+        """
+        self.max_workers = max_workers or int(os.getenv("EXECUTOR_MAX_WORKERS", "16"))
+        self.backend_limits = {**DEFAULT_BACKEND_LIMITS,
+                               "openai": int(os.getenv("OPENAI_MAX_CONCURRENCY", DEFAULT_BACKEND_LIMITS["openai"])),
+                               **(backend_limits or {})}
+        self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="stockybot")
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+
+    def _get_semaphore(self, backend: str) -> asyncio.Semaphore:
+        """
+        סמפור לכל שירות - כך ששירות איטי אחד לא יתפוס את כל ה-threads
+        """
+        if backend not in self._semaphores:
+            limit = min(self.backend_limits.get(backend, self.max_workers), self.max_workers)
+            self._semaphores[backend] = asyncio.Semaphore(limit)
+        return self._semaphores[backend]
+
+    def limit(self, backend: str) -> asyncio.Semaphore:
+        """
+        אותה מגבלת מקביליות לקריאות אסינכרוניות (httpx, OpenAI) שלא צריכות thread:
+        async with executor.limit("openai"): ...
+        """
+        return self._get_semaphore(backend)
+
+    async def run(self, backend: str, func: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        הרצת פונקציה חוסמת ב-thread נפרד תחת מגבלת המקביליות של השירות
+        """
+        async with self._get_semaphore(backend):
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._pool, partial(func, *args, **kwargs))
+
+    def shutdown(self) -> None:
+        """
+        סגירת מאגר ה-threads
+        """
+        self._pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,256 @@
+import asyncio
+import importlib.util
+import operator
+import os
+import re
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from utils.executor import BlockingExecutor
+from utils.lazy_import import lazy_import
+from utils.market_cache import MarketDataCache
+
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+yf = lazy_import("yfinance")
+
+COLUMNS = ["name", "quote_type", "sector", "price", "market_cap", "shares_outstanding", "pe", "dividend_yield",
+           "ex_dividend_date", "next_earnings", "updated_at"]
+NUMERIC_COLUMNS = ["price", "market_cap", "shares_outstanding", "pe", "dividend_yield", "updated_at"]
+
+# שמות השדות בפקודת /screen (כולל כינויים בעברית) -> עמודה בטבלה
+FIELD_ALIASES = {
+    "yield": "dividend_yield", "תשואה": "dividend_yield", "div": "dividend_yield",
+    "cap": "market_cap", "שווי": "market_cap", "mcap": "market_cap",
+    "pe": "pe", "מכפיל": "pe",
+    "price": "price", "מחיר": "price",
+    "type": "quote_type", "סוג": "quote_type",
+    "sector": "sector", "סקטור": "sector",
+    "earnings": "next_earnings", "דוח": "next_earnings",
+    "exdiv": "ex_dividend_date", "אקס": "ex_dividend_date",
+}
+# עמודות תאריך מסוננות לפי מספר ימים מהיום (earnings<14 = דוח בשבועיים הקרובים)
+DATE_COLUMNS = {"ex_dividend_date", "next_earnings"}
+TEXT_COLUMNS = {"quote_type", "sector", "name"}
+
+OPERATORS = {
+    ">=": operator.ge, "<=": operator.le, "!=": operator.ne,
+    ">": operator.gt, "<": operator.lt, "=": operator.eq,
+}
+SUFFIXES = {"k": 1e3, "m": 1e6, "b": 1e9, "t": 1e12}
+_FILTER_RE = re.compile(r"^(?P<field>[^\s<>=!]+)\s*(?P<op>>=|<=|!=|>|<|=)\s*(?P<value>\S+)$")
+
+# כמה מניות מרעננים במקביל בכל סבב (כדי לא לתפוס את כל מכסת ה-yahoo של המשתמשים)
+REFRESH_BATCH = 8
+# מספר הסימולים בבקשת מחירים מרוכזת אחת (רענון המחירים בין רענוני ה-info)
+PRICE_BATCH = 20
+
+
+class ScreenError(ValueError):
+    """
+    ביטוי סינון לא תקין
+    """
+
+
+def _epoch_to_timestamp(value) -> Optional["pd.Timestamp"]:
+    if value in (None, ""):
+        return None
+    try:
+        return pd.Timestamp(int(value), unit="s")
+    except (TypeError, ValueError):
+        return None
+
+
+def _row_from_info(info: Dict) -> Dict:
+    """
+    השדות שנשמרים בטבלה מתוך stock.info
+    """
+    return {
+        "name": info.get("longName") or info.get("shortName"),
+        "quote_type": info.get("quoteType"),
+        "sector": info.get("sector"),
+        "price": info.get("currentPrice") or info.get("regularMarketPrice"),
+        "market_cap": info.get("marketCap"),
+        "shares_outstanding": info.get("sharesOutstanding"),
+        "pe": info.get("trailingPE"),
+        "dividend_yield": info.get("dividendYield"),
+        "ex_dividend_date": _epoch_to_timestamp(info.get("exDividendDate")),
+        "next_earnings": _epoch_to_timestamp(info.get("earningsTimestampStart") or info.get("earningsTimestamp")),
+        "updated_at": time.time(),
+    }
+
+
+def parse_filters(text: str) -> List[Tuple[str, str, object]]:
+    """
+    פירוק ביטויים כמו "yield>3 cap>=10B type=ETF" לרשימת (עמודה, אופרטור, ערך)
+    """
+    filters = []
+    for token in text.split():
+        match = _FILTER_RE.match(token)
+        if not match:
+            raise ScreenError(f"ביטוי לא מובן: {token}")
+        field = FIELD_ALIASES.get(match["field"].lower())
+        if field is None:
+            raise ScreenError(f"שדה לא מוכר: {match['field']}")
+        op, raw = match["op"], match["value"]
+
+        if field in TEXT_COLUMNS:
+            if op not in ("=", "!="):
+                raise ScreenError(f"בשדה {match['field']} אפשר להשתמש רק ב-= או !=")
+            filters.append((field, op, raw.upper()))
+            continue
+
+        raw = raw.lower().rstrip("%")
+        multiplier = SUFFIXES.get(raw[-1:], 1)
+        try:
+            value = float(raw[:-1] if multiplier != 1 else raw) * multiplier
+        except ValueError:
+            raise ScreenError(f"ערך לא מספרי: {match['value']}")
+        if field == "dividend_yield":
+            value /= 100  # המשתמש כותב אחוזים, yfinance מחזיר שבר
+        filters.append((field, op, value))
+    if not filters:
+        raise ScreenError("לא צוינו תנאי סינון")
+    return filters
+
+
+class FundamentalsStore:
+    def __init__(self, executor: Optional[BlockingExecutor] = None, cache: Optional[MarketDataCache] = None,
+                 path: Optional[str] = None):
+        """
+        טבלה עמודתית (DataFrame) של נתוני יסוד לכל המניות המוכרות - לסינון מהיר בלי קריאות ל-Yahoo.
+        נשמרת כ-Parquet כש-pyarrow מותקן, אחרת כ-pickle.
+        השדות האיטיים מגיעים מ-info (קריאה לכל מניה, לעתים רחוקות); המחיר והשווי מתעדכנים בתכיפות
+        גבוהה יותר ממחירים מרוכזים (apply_quotes)
+        """
+        self.executor = executor or BlockingExecutor()
+        self.cache = cache or MarketDataCache()
+        path = path or os.getenv("FUNDAMENTALS_PATH", "data/fundamentals.parquet")
+        self.use_parquet = importlib.util.find_spec("pyarrow") is not None
+        self.path = Path(path if self.use_parquet else str(Path(path).with_suffix(".pkl")))
+        self._frame = None
+        self.last_refresh: Optional[float] = None
+        self.last_price_refresh: Optional[float] = None
+
+    @property
+    def frame(self) -> "pd.DataFrame":
+        """
+        הטבלה נטענת מהדיסק רק בשימוש הראשון
+        """
+        if self._frame is None:
+            self._frame = self._load()
+        return self._frame
+
+    @frame.setter
+    def frame(self, value: "pd.DataFrame") -> None:
+        self._frame = value
+
+    def _load(self) -> "pd.DataFrame":
+        empty = pd.DataFrame(columns=COLUMNS, index=pd.Index([], name="symbol"))
+        if not self.path.exists():
+            return empty
+        try:
+            frame = pd.read_parquet(self.path) if self.use_parquet else pd.read_pickle(self.path)
+            return frame.reindex(columns=COLUMNS)
+        except Exception as e:
+            print(f"שגיאה בטעינת טבלת נתוני היסוד: {e}")
+            return empty
+
+    def _save(self) -> None:
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            if self.use_parquet:
+                self.frame.to_parquet(self.path)
+            else:
+                self.frame.to_pickle(self.path)
+        except Exception as e:
+            print(f"שגיאה בשמירת טבלת נתוני היסוד: {e}")
+
+    async def _fetch_row(self, symbol: str) -> Optional[Dict]:
+        try:
+            info = await self.cache.get_or_fetch(
+                "info", symbol, lambda: self.executor.run("yahoo", lambda: yf.Ticker(symbol).info)
+            )
+            return _row_from_info(info)
+        except Exception as e:
+            print(f"שגיאה ברענון נתוני יסוד עבור {symbol}: {e}")
+            return None
+
+    async def refresh(self, symbols: Iterable[str]) -> int:
+        """
+        רענון כל המניות בקבוצות קטנות, ובניית הטבלה מחדש בפעולה אחת
+        """
+        symbols = sorted({symbol.upper() for symbol in symbols})
+        rows = {}
+        for start in range(0, len(symbols), REFRESH_BATCH):
+            batch = symbols[start:start + REFRESH_BATCH]
+            results = await asyncio.gather(*(self._fetch_row(symbol) for symbol in batch))
+            rows.update({symbol: row for symbol, row in zip(batch, results) if row is not None})
+
+        if rows:
+            fresh = pd.DataFrame.from_dict(rows, orient="index", columns=COLUMNS)
+            fresh.index.name = "symbol"
+            # מניות שנכשלו שומרות את הנתונים הקודמים; מניות שהוסרו מהרשימה יוצאות מהטבלה
+            kept = self.frame[self.frame.index.isin(symbols) & ~self.frame.index.isin(fresh.index)]
+            self.frame = pd.concat([kept, fresh]).sort_index() if not kept.empty else fresh.sort_index()
+            self.frame[NUMERIC_COLUMNS] = self.frame[NUMERIC_COLUMNS].astype(float)
+            for column in DATE_COLUMNS:
+                self.frame[column] = pd.to_datetime(self.frame[column])
+            await self.executor.run("io", self._save)
+        self.last_refresh = time.time()
+        return len(rows)
+
+    async def apply_quotes(self, quotes: Dict[str, Dict]) -> int:
+        """
+        עדכון המחיר והשווי מהמחירים המרוכזים של Yahoo (spark) - בלי קריאת info לכל מניה.
+        השווי מחושב ממספר המניות (מ-info); בלי מספר מניות - השווי הקודם לפי שינוי המחיר
+        """
+        prices = pd.Series({symbol.upper(): quote.get("current_price") for symbol, quote in quotes.items()},
+                           dtype=float).dropna()
+        prices = prices[prices.index.isin(self.frame.index) & (prices > 0)]
+        if prices.empty:
+            return 0
+
+        frame = self.frame
+        shares = frame.loc[prices.index, "shares_outstanding"].astype(float)
+        previous = frame.loc[prices.index, "price"].astype(float)
+        scaled = frame.loc[prices.index, "market_cap"].astype(float) * prices / previous.where(previous > 0)
+        frame.loc[prices.index, "market_cap"] = (prices * shares).where(shares > 0, scaled)
+        frame.loc[prices.index, "price"] = prices
+        await self.executor.run("io", self._save)
+        self.last_price_refresh = time.time()
+        return len(prices)
+
+    def screen(self, filters: List[Tuple[str, str, object]]) -> "pd.DataFrame":
+        """
+        סינון הטבלה - כל התנאים מחושבים כמסכות על עמודות שלמות
+        """
+        mask = np.ones(len(self.frame), dtype=bool)
+        today = pd.Timestamp.now().normalize()
+        for column, op, value in filters:
+            values = self.frame[column]
+            if column in DATE_COLUMNS:
+                values = (values - today).dt.days
+                if column == "ex_dividend_date":
+                    values = -values  # ימים מאז האקס האחרון
+                else:
+                    values = values.where(values >= 0)  # דוח שכבר פורסם אינו "הדוח הבא"
+                mask &= values.notna().to_numpy()
+            elif column in TEXT_COLUMNS:
+                values = values.astype(object).where(values.notna(), "").str.upper()
+            mask &= OPERATORS[op](values, value).fillna(False).to_numpy(dtype=bool)
+
+        result = self.frame[mask]
+        sort_column = filters[0][0]
+        if sort_column in TEXT_COLUMNS:
+            return result.sort_values("market_cap", ascending=False)
+        return result.sort_values(sort_column, ascending=sort_column in DATE_COLUMNS)
+
+    def stats(self) -> Dict:
+        return {
+            "symbols": len(self.frame),
+            "last_refresh": self.last_refresh,
+            "last_price_refresh": self.last_price_refresh,
+            "format": "parquet" if self.use_parquet else "pickle"
+        }
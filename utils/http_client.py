@@ -0,0 +1,98 @@
+import asyncio
+import importlib.util
+import random
+from typing import Any, Dict, Optional
+
+import httpx
+
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+DEFAULT_HEADERS = {
+    # Yahoo חוסם בקשות ללא User-Agent של דפדפן
+    "User-Agent": "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0 Safari/537.36",
+    "Accept": "application/json",
+}
+
+
+class RetryableStatusError(Exception):
+    def __init__(self, response: httpx.Response):
+        super().__init__(f"HTTP {response.status_code} from {response.url.host}")
+        self.response = response
+
+
+class HttpClientPool:
+    def __init__(self, timeout: float = 10.0, max_retries: int = 3,
+                 backoff_base: float = 0.5, backoff_max: float = 8.0,
+                 transport: Optional[httpx.AsyncBaseTransport] = None):
+        """
+        שכבת HTTP אסינכרונית - session אחד עם keep-alive לכל שרת.
+        transport מחליף את הרשת (למשל שירותים מדומים ב-benchmarks)
+        """
+        self.transport = transport
+        self.timeout = httpx.Timeout(timeout, connect=min(timeout, 5.0))
+        self.limits = httpx.Limits(max_connections=20, max_keepalive_connections=10, keepalive_expiry=60.0)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.http2 = importlib.util.find_spec("h2") is not None
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+
+    def _get_client(self, host: str) -> httpx.AsyncClient:
+        """
+        קבלת ה-client של השרת (נוצר בפעם הראשונה ונשמר לשימוש חוזר)
+        """
+        client = self._clients.get(host)
+        if client is None or client.is_closed:
+            client = httpx.AsyncClient(
+                http2=self.http2,
+                timeout=self.timeout,
+                limits=self.limits,
+                headers=DEFAULT_HEADERS,
+                follow_redirects=True,
+                transport=self.transport
+            )
+            self._clients[host] = client
+        return client
+
+    def client_for(self, url: str) -> httpx.AsyncClient:
+        """
+        ה-client המשותף של השרת - לספריות שמקבלות httpx.AsyncClient משלהן (כמו OpenAI)
+        """
+        return self._get_client(httpx.URL(url).host)
+
+    def _backoff_delay(self, attempt: int, response: Optional[httpx.Response] = None) -> float:
+        """
+        המתנה לפני ניסיון חוזר - exponential backoff עם jitter מלא
+        """
+        if response is not None:
+            retry_after = response.headers.get("Retry-After")
+            if retry_after and retry_after.isdigit():
+                return min(float(retry_after), self.backoff_max)
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    async def get_json(self, url: str, params: Optional[Dict[str, Any]] = None) -> Any:
+        """
+        בקשת GET שמחזירה JSON, עם ניסיונות חוזרים על שגיאות זמניות
+        """
+        client = self._get_client(httpx.URL(url).host)
+
+        for attempt in range(self.max_retries + 1):
+            response = None
+            try:
+                response = await client.get(url, params=params)
+                if response.status_code in RETRY_STATUS_CODES:
+                    raise RetryableStatusError(response)
+                response.raise_for_status()
+                return response.json()
+            except (httpx.TransportError, RetryableStatusError):
+                if attempt == self.max_retries:
+                    raise
+                await asyncio.sleep(self._backoff_delay(attempt, response))
+
+    async def close(self) -> None:
+        """
+        סגירת כל החיבורים הפתוחים
+        """
+        clients = list(self._clients.values())
+        self._clients.clear()
+        await asyncio.gather(*(client.aclose() for client in clients), return_exceptions=True)
@@ -0,0 +1,54 @@
+import importlib
+import sys
+import threading
+import time
+import types
+from typing import Dict, Iterable
+
+
+class LazyModule(types.ModuleType):
+    def __init__(self, name: str):
+        """
+        מודול שנטען רק בגישה הראשונה לאחת התכונות שלו (טעינה בטוחה גם מכמה threads)
+        """
+        super().__init__(name)
+        self._lazy_lock = threading.Lock()
+        self._lazy_module = None
+
+    def _load(self) -> types.ModuleType:
+        if self._lazy_module is None:
+            with self._lazy_lock:
+                if self._lazy_module is None:
+                    self._lazy_module = importlib.import_module(self.__name__)
+        return self._lazy_module
+
+    def __getattr__(self, attr: str):
+        return getattr(self._load(), attr)
+
+    def __dir__(self):
+        return dir(self._load())
+
+
+def lazy_import(name: str) -> types.ModuleType:
+    """
+    החזרת המודול אם כבר נטען, אחרת proxy שיטען אותו בשימוש הראשון
+    """
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+    return LazyModule(name)
+
+
+def warmup(names: Iterable[str]) -> Dict[str, float]:
+    """
+    טעינה מוקדמת של מודולים (למשל ב-thread ברקע) - מחזיר זמן טעינה בשניות לכל מודול
+    """
+    durations = {}
+    for name in names:
+        started = time.perf_counter()
+        try:
+            importlib.import_module(name)
+        except Exception as e:
+            print(f"שגיאה בטעינת {name}: {e}")
+        durations[name] = time.perf_counter() - started
+    return durations
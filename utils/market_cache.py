@@ -0,0 +1,139 @@
+import time
+from collections import OrderedDict, defaultdict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from utils.disk_cache import DiskCache
+from utils.single_flight import SingleFlight
+
+# זמן תפוגה (בשניות) לכל סוג מידע
+DEFAULT_TTLS = {
+    "quote": 30,
+    "news": 10 * 60,
+    "info": 60 * 60,
+    "earnings": 6 * 60 * 60,
+    "dividends": 6 * 60 * 60,
+    "holdings": 12 * 60 * 60,
+    "history": 6 * 60 * 60,
+}
+
+# סוגי מידע שנשמרים גם בדיסק (מחיר מתיישן מהר מדי כדי שיהיה בזה טעם)
+PERSISTENT_KINDS = {"news", "info", "earnings", "dividends", "holdings", "history"}
+
+
+class MarketDataCache:
+    def __init__(self, max_entries: int = 2048, ttls: Optional[Dict[str, int]] = None,
+                 disk: Optional[DiskCache] = None):
+        """
+        מטמון משותף לנתוני שוק - TTL לפי סוג מידע ופינוי LRU, עם שכבת דיסק אופציונלית
+        """
+        self.max_entries = max_entries
+        self.ttls = {**DEFAULT_TTLS, **(ttls or {})}
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[Any, float]]" = OrderedDict()
+        self.hits = defaultdict(int)
+        self.misses = defaultdict(int)
+        self.evictions = 0
+        self.disk = disk
+        self.disk_hits = 0
+        if self.disk is not None:
+            self.disk.purge(max(self.ttls.values()))
+        self.single_flight = SingleFlight()
+
+    @staticmethod
+    def _key(kind: str, ticker: str) -> Tuple[str, str]:
+        return kind, ticker.upper()
+
+    def get(self, kind: str, ticker: str) -> Optional[Any]:
+        """
+        קבלת ערך מהמטמון אם לא פג תוקפו
+        """
+        key = self._key(kind, ticker)
+        entry = self._entries.get(key)
+        if entry is not None:
+            value, fetched_at = entry
+            if time.time() - fetched_at < self.ttls.get(kind, 0):
+                self._entries.move_to_end(key)
+                self.hits[kind] += 1
+                return value
+
+        if self.disk is not None and kind in PERSISTENT_KINDS:
+            entry = self.disk.get(*key)
+            if entry is not None and time.time() - entry[1] < self.ttls.get(kind, 0):
+                self._store(key, *entry)
+                self.hits[kind] += 1
+                self.disk_hits += 1
+                return entry[0]
+
+        self.misses[kind] += 1
+        return None
+
+    def get_stale(self, kind: str, ticker: str) -> Optional[Tuple[Any, float]]:
+        """
+        הערך האחרון שנשמר (גם אם פג תוקפו) וזמן ההבאה שלו - לשימוש כשהמקור לא זמין
+        """
+        key = self._key(kind, ticker)
+        entry = self._entries.get(key)
+        if entry is None and self.disk is not None and kind in PERSISTENT_KINDS:
+            entry = self.disk.get(*key)
+        return entry
+
+    def _store(self, key: Tuple[str, str], value: Any, fetched_at: float) -> None:
+        self._entries[key] = (value, fetched_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def set(self, kind: str, ticker: str, value: Any, fetched_at: Optional[float] = None) -> None:
+        """
+        שמירת ערך במטמון ופינוי הרשומה הישנה ביותר במידת הצורך
+        """
+        key = self._key(kind, ticker)
+        fetched_at = fetched_at if fetched_at is not None else time.time()
+        self._store(key, value, fetched_at)
+        if self.disk is not None and kind in PERSISTENT_KINDS:
+            self.disk.set(*key, value, fetched_at)
+
+    def expires_in(self, kind: str, ticker: str) -> Optional[float]:
+        """
+        כמה שניות נותרו עד שהרשומה בזיכרון תפוג (None אם אינה בזיכרון)
+        """
+        entry = self._entries.get(self._key(kind, ticker))
+        if entry is None:
+            return None
+        return max(0.0, entry[1] + self.ttls.get(kind, 0) - time.time())
+
+    async def get_or_fetch(self, kind: str, ticker: str, fetch: Callable[[], Awaitable[Any]],
+                           refresh: bool = False) -> Any:
+        """
+        החזרת ערך מהמטמון, או הבאתו מהמקור ושמירתו.
+        בקשות מקבילות לאותו (kind, ticker) חולקות הבאה אחת.
+        refresh=True מדלג על המטמון ומביא ערך חדש (רענון ברקע לפני תפוגה).
+        """
+        if not refresh:
+            value = self.get(kind, ticker)
+            if value is not None:
+                return value
+
+        async def fetch_and_store():
+            result = await fetch()
+            self.set(kind, ticker, result)
+            return result
+
+        return await self.single_flight.do(self._key(kind, ticker), fetch_and_store)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        מונים של פגיעות/החטאות לפי סוג מידע
+        """
+        kinds = sorted(set(self.hits) | set(self.misses))
+        total_hits = sum(self.hits.values())
+        total_requests = total_hits + sum(self.misses.values())
+        return {
+            "size": len(self._entries),
+            "max_entries": self.max_entries,
+            "evictions": self.evictions,
+            "coalesced": self.single_flight.coalesced,
+            "disk_hits": self.disk_hits,
+            "hit_rate": total_hits / total_requests if total_requests else 0.0,
+            "by_kind": {kind: {"hits": self.hits[kind], "misses": self.misses[kind]} for kind in kinds}
+        }
@@ -0,0 +1,111 @@
+import asyncio
+import heapq
+import itertools
+import time
+from typing import Any, Dict, List, Optional
+
+# עדיפויות - מספר נמוך יותר מקבל token קודם
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BACKGROUND = 1
+
+
+class RateLimitedError(Exception):
+    """
+    אין token זמין עד ה-deadline, או שהשירות עצמו דיווח על חריגה מהמכסה
+    """
+
+
+class TokenBucket:
+    def __init__(self, calls_per_minute: float, burst: Optional[int] = None, reserve: int = 1):
+        """
+        מגביל קצב (token bucket) עם תור עדיפויות: בקשות משתמשים לפני רענון ברקע,
+        וכל המתנה מוגבלת ב-deadline. בקשות רקע משאירות reserve tokens לבקשות משתמשים.
+        """
+        self.rate = calls_per_minute / 60.0
+        self.capacity = burst or max(1, int(calls_per_minute))
+        self.reserve = min(reserve, self.capacity - 1)
+        self.tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._queue: List[List[Any]] = []  # [priority, seq, future]
+        self._seq = itertools.count()
+        self._wakeup: Optional[asyncio.TimerHandle] = None
+        self.granted = 0
+        self.queued = 0
+        self.throttled = 0
+        self.served_stale = 0
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def _needed(self, priority: int) -> float:
+        return 1 if priority == PRIORITY_INTERACTIVE else 1 + self.reserve
+
+    def _dispatch(self) -> None:
+        """
+        חלוקת tokens לממתינים לפי סדר עדיפות, ותזמון ההתעוררות הבאה
+        """
+        if self._wakeup is not None:
+            self._wakeup.cancel()
+            self._wakeup = None
+        self._refill()
+        while self._queue:
+            priority, _, future = self._queue[0]
+            if future.done():  # הממתין ויתר (deadline)
+                heapq.heappop(self._queue)
+                continue
+            if self.tokens < self._needed(priority):
+                break
+            heapq.heappop(self._queue)
+            self.tokens -= 1
+            self.granted += 1
+            future.set_result(True)
+
+        if self._queue:
+            delay = (self._needed(self._queue[0][0]) - self.tokens) / self.rate
+            self._wakeup = asyncio.get_running_loop().call_later(delay, self._dispatch)
+
+    async def acquire(self, priority: int = PRIORITY_INTERACTIVE, timeout: float = 0.0) -> bool:
+        """
+        המתנה ל-token עד timeout שניות; False אם לא התקבל בזמן
+        """
+        self._refill()
+        while self._queue and self._queue[0][2].done():
+            heapq.heappop(self._queue)
+        if not self._queue and self.tokens >= self._needed(priority):
+            self.tokens -= 1
+            self.granted += 1
+            return True
+        if timeout <= 0:
+            self.throttled += 1
+            return False
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._queue, [priority, next(self._seq), future])
+        self.queued += 1
+        self._dispatch()
+        try:
+            return await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            self.throttled += 1
+            return False
+
+    def drain(self) -> None:
+        """
+        איפוס ה-tokens - כשהשירות עצמו דיווח שעברנו את המכסה
+        """
+        self._refill()
+        self.tokens = 0.0
+
+    def stats(self) -> Dict[str, Any]:
+        self._refill()
+        return {
+            "tokens": self.tokens,
+            "capacity": self.capacity,
+            "waiting": sum(1 for entry in self._queue if not entry[2].done()),
+            "granted": self.granted,
+            "queued": self.queued,
+            "throttled": self.throttled,
+            "served_stale": self.served_stale
+        }
@@ -0,0 +1,106 @@
+import hashlib
+import json
+import re
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+from utils.disk_cache import DiskCache
+
+# שם ה"סוג" שתחתיו נשמרות תשובות GPT בטבלת מטמון הדיסק (משותפת לכל תהליכי הבוט)
+DISK_KIND = "gpt_answer"
+
+
+def normalize_question(question: str) -> str:
+    """
+    נרמול שאלה: אותיות קטנות, בלי פיסוק ורווחים כפולים
+    """
+    question = re.sub(r"[^\w\s]", " ", question.lower())
+    return " ".join(question.split())
+
+
+class ResponseCache:
+    def __init__(self, ttl: int = 15 * 60, max_entries: int = 512, disk: Optional[DiskCache] = None):
+        """
+        מטמון תשובות GPT - מפתח לפי השאלה המנורמלת, המניה ונתוני השוק שבפרומפט.
+        עם disk התשובות משותפות לכל תהליכי ה-worker.
+        """
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.disk = disk
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.saved_cost = 0.0
+
+    @staticmethod
+    def make_key(question: str, tickers: List[str], quotes: Dict[str, Optional[Dict]],
+                 news: Dict[str, Optional[List[Dict]]]) -> str:
+        """
+        hash של השאלה המנורמלת, המניות ותמונת המצב (מחירים וחדשות) ששימשה לבניית הפרומפט
+        """
+        snapshot = {"question": normalize_question(question), "tickers": {}}
+        for ticker in tickers:
+            stock_info = quotes.get(ticker)
+            ticker_news = news.get(ticker)
+            snapshot["tickers"][ticker.upper()] = {
+                "quote": [stock_info.get("current_price"), stock_info.get("percent_change")] if stock_info else None,
+                "news": [[item.get("url") or item.get("title"), item.get("time")] for item in ticker_news]
+                if ticker_news is not None else None
+            }
+        return hashlib.sha256(json.dumps(snapshot, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+    def peek(self, key: str) -> Optional[Dict[str, Any]]:
+        """
+        בדיקה אם יש תשובה בתוקף, בלי לעדכן מונים
+        """
+        entry = self._entries.get(key)
+        if entry is None and self.disk is not None:
+            stored = self.disk.get(DISK_KIND, key)
+            if stored is not None:
+                entry = stored[0]
+                self._store(key, entry)
+        if entry is None:
+            return None
+        if time.time() - entry["created_at"] >= self.ttl:
+            del self._entries[key]
+            return None
+        return entry
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """
+        קבלת תשובה שמורה; כל פגיעה נספרת כחיסכון בעלות המקורית
+        """
+        entry = self.peek(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        self.saved_cost += entry["cost"]
+        return entry
+
+    def set(self, key: str, answer: str, cost: float) -> None:
+        """
+        שמירת תשובה ופינוי הישנה ביותר במידת הצורך
+        """
+        entry = {"answer": answer, "cost": cost, "created_at": time.time()}
+        self._store(key, entry)
+        if self.disk is not None:
+            self.disk.set(DISK_KIND, key, entry, entry["created_at"])
+
+    def _store(self, key: str, entry: Dict[str, Any]) -> None:
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "saved_cost": self.saved_cost
+        }
@@ -1,87 +1,119 @@
-from typing import Tuple
-from datetime import datetime
+from typing import Optional, Tuple
+from pathlib import Path
 from utils.config_manager import ConfigManager
+from utils.executor import BlockingExecutor
+from utils.usage_store import UsageStore
 import os
 
 class SecurityManager:
-    def __init__(self):
+    def __init__(self, usage_store: Optional[UsageStore] = None, executor: Optional[BlockingExecutor] = None):
         """
-        מנהל האבטחה של הבוט
+        מנהל האבטחה של הבוט. נתוני השימוש נשמרים ביומן ב-UsageStore - שורדים הפעלה מחדש ומשותפים לכל תהליכי ה-worker.
+        הכתיבות ליומן ממתינות לנעילת הכתיבה של SQLite, ולכן רצות ב-executor ולא ב-event loop.
         """
+        self.executor = executor or BlockingExecutor()
         self.config_manager = ConfigManager()
         self.allowed_users = self.config_manager.get_users()
         self.admin_users = self.config_manager.get_admins()
+        self._config_mtime = self._read_config_mtime()
 
         self.daily_limit = float(os.getenv("DAILY_COST_LIMIT", "1.0"))
         self.max_request_cost = float(os.getenv("MAX_REQUEST_COST", "0.1"))
 
-        self.usage_data = {}  # {user_id: {'daily_cost': 0.0, 'last_reset': datetime}}
+        self.usage_store = usage_store or UsageStore()
+
+    def _read_config_mtime(self) -> float:
+        try:
+            return Path(self.config_manager.config_file).stat().st_mtime
+        except OSError:
+            return 0.0
+
+    def _reload_config_if_changed(self):
+        """
+        טעינה מחדש של רשימות המשתמשים אם קובץ הקונפיגורציה שונה (למשל ע"י /admin בתהליך אחר)
+        """
+        mtime = self._read_config_mtime()
+        if mtime != self._config_mtime:
+            self._config_mtime = mtime
+            self.config_manager.config = self.config_manager._load_config()
+            self.allowed_users = self.config_manager.get_users()
+            self.admin_users = self.config_manager.get_admins()
 
     def is_user_allowed(self, user_id: str) -> bool:
         """
         בדיקה האם המשתמש מורשה להשתמש בבוט
         """
+        self._reload_config_if_changed()
         return str(user_id) in self.allowed_users
 
     def is_user_admin(self, user_id: str) -> bool:
         """
         בדיקה האם המשתמש הוא מנהל
         """
+        self._reload_config_if_changed()
         return str(user_id) in self.admin_users
 
-    def reset_daily_usage_if_needed(self, user_id: str):
-        """
-        איפוס מונה יומי אם עבר יום
-        """
-        if user_id not in self.usage_data:
-            self.usage_data[user_id] = {'daily_cost': 0.0, 'last_reset': datetime.now()}
-            return
-
-        last_reset = self.usage_data[user_id]['last_reset']
-        if (datetime.now() - last_reset).days >= 1:
-            self.usage_data[user_id] = {'daily_cost': 0.0, 'last_reset': datetime.now()}
-
     def can_make_request(self, user_id: str, estimated_cost: float) -> Tuple[bool, str]:
         """
-        בדיקה האם המשתמש יכול לבצע את הבקשה
+        בדיקה האם המשתמש יכול לבצע את הבקשה (בלי לשמור תקציב - ראו reserve_budget)
         """
-        self.reset_daily_usage_if_needed(user_id)
-        user_data = self.usage_data[user_id]
-
         if estimated_cost > self.max_request_cost:
             return False, f"העלות המשוערת (${estimated_cost:.2f}) חורגת מהמגבלה המקסימלית לבקשה (${self.max_request_cost:.2f})"
 
-        if user_data['daily_cost'] + estimated_cost > self.daily_limit:
-            remaining = self.daily_limit - user_data['daily_cost']
+        remaining = self.get_user_usage(user_id)['remaining_budget']
+        if estimated_cost > remaining:
             return False, f"חריגה ממגבלת העלות היומית. נותרו: ${remaining:.2f}"
 
         return True, ""
 
-    def update_usage(self, user_id: str, actual_cost: float):
+    async def reserve_budget(self, user_id: str, estimated_cost: float) -> Tuple[Optional[int], str]:
+        """
+        שמירה אטומית של העלות המשוערת מהתקציב היומי לפני הקריאה ל-GPT.
+        מחזיר מזהה הזמנה (לסגירה ב-commit_usage / release_budget) או None והודעת שגיאה.
+        """
+        if estimated_cost > self.max_request_cost:
+            return None, f"העלות המשוערת (${estimated_cost:.2f}) חורגת מהמגבלה המקסימלית לבקשה (${self.max_request_cost:.2f})"
+
+        reservation_id = await self.executor.run("usage", self.usage_store.reserve, user_id, estimated_cost,
+                                                 self.daily_limit)
+        if reservation_id is None:
+            remaining = self.get_user_usage(user_id)['remaining_budget']
+            return None, f"חריגה ממגבלת העלות היומית. נותרו: ${remaining:.2f}"
+        return reservation_id, ""
+
+    async def commit_usage(self, reservation_id: int, actual_cost: float):
+        """
+        רישום העלות בפועל של בקשה שהתקציב שלה נשמר
+        """
+        await self.executor.run("usage", self.usage_store.commit, reservation_id, actual_cost)
+
+    async def release_budget(self, reservation_id: int):
         """
-        עדכון השימוש של המשתמש
+        שחרור תקציב שנשמר לבקשה שנכשלה
         """
-        self.reset_daily_usage_if_needed(user_id)
-        self.usage_data[user_id]['daily_cost'] += actual_cost
+        await self.executor.run("usage", self.usage_store.release, reservation_id)
 
     def get_user_usage(self, user_id: str) -> dict:
         """
-        קבלת נתוני השימוש של המשתמש
+        קבלת נתוני השימוש של המשתמש (היום)
         """
-        self.reset_daily_usage_if_needed(user_id)
+        daily_cost, reserved = self.usage_store.get(user_id)
         return {
-            'daily_cost': self.usage_data[user_id]['daily_cost'],
-            'remaining_budget': self.daily_limit - self.usage_data[user_id]['daily_cost']
+            'daily_cost': daily_cost,
+            'reserved': reserved,
+            'remaining_budget': max(0.0, self.daily_limit - daily_cost - reserved)
         }
 
     def add_user(self, user_id: str, added_by: str = None) -> bool:
         """
         הוספת משתמש מורשה
         """
+        self._reload_config_if_changed()
         if user_id not in self.allowed_users:
             self.allowed_users.append(user_id)
             self.config_manager.add_user(user_id, added_by)
             self.config_manager.save_config()
+            self._config_mtime = self._read_config_mtime()
             return True
         return False
 
@@ -89,9 +121,11 @@ class SecurityManager:
         """
         הסרת משתמש מורשה
         """
+        self._reload_config_if_changed()
         if user_id in self.allowed_users:
             self.allowed_users.remove(user_id)
             self.config_manager.remove_user(user_id, removed_by)
             self.config_manager.save_config()
+            self._config_mtime = self._read_config_mtime()
             return True
         return False
@@ -0,0 +1,152 @@
+import re
+import time
+import zlib
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Tuple
+
+from utils.disk_cache import DiskCache
+from utils.ticker_matcher import TickerMatcher
+
+NUM_PERMUTATIONS = 64
+_MERSENNE_PRIME = (1 << 61) - 1
+_PERMUTATIONS = [
+    (zlib.crc32(f"a{i}".encode()) | 1, zlib.crc32(f"b{i}".encode()))
+    for i in range(NUM_PERMUTATIONS)
+]
+
+# מילים כלליות שלא משנות את מהות השאלה ("למה X יורדת" ו"מה קורה עם X היום" הן אותה שאלה)
+GENERIC_WORDS = {
+    "מה", "קורה", "עם", "למה", "של", "את", "על", "זה", "האם", "איך", "אני", "לי", "רוצה", "לדעת", "תסביר",
+    "ספר", "תגיד", "מניה", "המניה", "מניית", "מניות", "המניות", "חברה", "החברה", "חברת", "היום", "עכשיו",
+    "יורדת", "יורד", "ירדה", "עולה", "עלתה", "נופלת", "נפלה", "קופצת", "קפצה", "מצב", "המצב", "בבורסה",
+    "what", "whats", "is", "the", "about", "stock", "why", "how", "today", "with", "of", "tell", "me",
+    "up", "down", "going", "on", "happening", "doing",
+}
+EMPTY_SHINGLE = "∅"  # שאלה כללית לגמרי על המניה
+
+# שם ה"סוג" שתחתיו נשמר האינדקס של כל מניה בטבלת מטמון הדיסק (משותפת לכל תהליכי הבוט)
+DISK_KIND = "semantic_answers"
+
+
+def _shingles(text: str) -> set:
+    words = [word for word in re.findall(r"\w+", text.lower()) if word not in GENERIC_WORDS]
+    if not words:
+        return {EMPTY_SHINGLE}
+    shingles = set()
+    for word in words:
+        padded = f" {word} "
+        shingles.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return shingles
+
+
+def minhash(text: str) -> Tuple[int, ...]:
+    """
+    חתימת MinHash על 3-grams של המילים המהותיות בשאלה
+    """
+    hashes = [zlib.crc32(shingle.encode("utf-8")) for shingle in _shingles(text)]
+    return tuple(
+        min((a * h + b) % _MERSENNE_PRIME for h in hashes)
+        for a, b in _PERMUTATIONS
+    )
+
+
+def similarity(first: Tuple[int, ...], second: Tuple[int, ...]) -> float:
+    """
+    הערכת דמיון Jaccard בין שתי חתימות
+    """
+    return sum(a == b for a, b in zip(first, second)) / NUM_PERMUTATIONS
+
+
+class SemanticCache:
+    def __init__(self, matcher: Optional[TickerMatcher] = None, threshold: float = 0.55,
+                 freshness: int = 10 * 60, max_per_ticker: int = 50, disk: Optional[DiskCache] = None):
+        """
+        שימוש חוזר בתשובות לשאלות דומות (ניסוח שונה) על אותה מניה, בתוך חלון זמן קצר.
+        עם disk האינדקס משותף לכל תהליכי ה-worker (המשתמשים מחולקים ביניהם לפי מזהה).
+        """
+        self.matcher = matcher
+        self.disk = disk
+        self.threshold = threshold
+        self.freshness = freshness
+        self.max_per_ticker = max_per_ticker
+        self._index: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+        self.lookups = 0
+        self.hits = 0
+        self.saved_cost = 0.0
+
+    def _strip_tickers(self, question: str) -> str:
+        """
+        הסרת שם המניה מהשאלה - כדי שהחתימה תייצג רק את מה ששואלים עליה
+        """
+        if self.matcher is None:
+            return question
+        for match in reversed(self.matcher.find_all(question)):
+            question = question[:match.start] + " " + question[match.end:]
+        return question
+
+    def _load(self, ticker: str) -> List[Dict[str, Any]]:
+        """
+        התשובות של המניה בזיכרון, יחד עם מה שנשמר בדיסק בתהליכים אחרים
+        """
+        entries = self._index.get(ticker, [])
+        stored = self.disk.get(DISK_KIND, ticker) if self.disk is not None else None
+        if stored is None:
+            return entries
+        known = {(entry["question"], entry["created_at"]) for entry in entries}
+        merged = entries + [entry for entry in stored[0] if (entry["question"], entry["created_at"]) not in known]
+        return sorted(merged, key=lambda entry: entry["created_at"])
+
+    def _fresh_entries(self, ticker: str) -> List[Dict[str, Any]]:
+        now = time.time()
+        entries = [entry for entry in self._load(ticker) if now - entry["created_at"] < self.freshness]
+        if entries:
+            self._index[ticker] = entries
+        else:
+            self._index.pop(ticker, None)
+        return entries
+
+    def lookup(self, ticker: str, question: str) -> Optional[Dict[str, Any]]:
+        """
+        תשובה טרייה לשאלה דומה מספיק על אותה מניה, או None
+        """
+        self.lookups += 1
+        signature = minhash(self._strip_tickers(question))
+        best, best_score = None, self.threshold
+        for entry in self._fresh_entries(ticker.upper()):
+            score = similarity(signature, entry["signature"])
+            if score >= best_score:
+                best, best_score = entry, score
+
+        if best is None:
+            return None
+        self.hits += 1
+        self.saved_cost += best["cost"]
+        return {**best, "score": best_score}
+
+    def add(self, ticker: str, question: str, answer: str, cost: float) -> None:
+        """
+        שמירת תשובה חדשה באינדקס של המניה
+        """
+        ticker = ticker.upper()
+        entries = self._fresh_entries(ticker)
+        entries.append({
+            "signature": minhash(self._strip_tickers(question)),
+            "question": question,
+            "answer": answer,
+            "cost": cost,
+            "created_at": time.time()
+        })
+        self._index[ticker] = entries[-self.max_per_ticker:]
+        if self.disk is not None:
+            self.disk.set(DISK_KIND, ticker, self._index[ticker], entries[-1]["created_at"])
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "tickers": len(self._index),
+            "entries": sum(len(entries) for entries in self._index.values()),
+            "lookups": self.lookups,
+            "hits": self.hits,
+            "hit_rate": self.hits / self.lookups if self.lookups else 0.0,
+            "saved_cost": self.saved_cost,
+            "threshold": self.threshold
+        }
@@ -0,0 +1,198 @@
+import asyncio
+import time
+from collections import deque
+from typing import Dict, List, Tuple
+
+from telegram import Bot, Message
+from telegram.error import BadRequest, RetryAfter
+
+from utils.rate_limiter import PRIORITY_INTERACTIVE, RateLimitedError, TokenBucket
+from utils.tracing import tracer
+
+TELEGRAM_MESSAGE_LIMIT = 4096
+
+# מגבלות השליחה של טלגרם: כ-30 הודעות בשנייה בסך הכל, והודעה בשנייה לכל צ'אט (עם מעט burst)
+GLOBAL_MESSAGES_PER_SECOND = 30
+CHAT_MESSAGES_PER_SECOND = 1
+CHAT_BURST = 3
+# tokens גלובליים ששמורים להודעות למשתמשים על חשבון התראות ברקע
+INTERACTIVE_RESERVE = 5
+QUEUE_TIMEOUT = 120.0
+MAX_RETRIES = 3
+MAX_IDLE_CHATS = 1000
+
+
+def split_message(text: str, limit: int = TELEGRAM_MESSAGE_LIMIT) -> List[str]:
+    """
+    פיצול טקסט להודעות של עד limit תווים, עדיף בסוף שורה
+    """
+    parts = []
+    while len(text) > limit:
+        cut = text.rfind("\n", 0, limit)
+        if cut <= 0:
+            cut = limit
+        parts.append(text[:cut])
+        text = text[cut:].lstrip("\n")
+    parts.append(text)
+    return parts
+
+
+def _percentile(values: List[float], percent: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * percent))]
+
+
+class _PendingEdit:
+    def __init__(self, text: str):
+        self.text = text
+        self.future: "asyncio.Future[Message]" = asyncio.get_running_loop().create_future()
+        # אם אף עריכה לא הצטרפה, החריגה מטופלת ע"י השולח ולא מדווחת כ"לא נקראה"
+        self.future.add_done_callback(lambda future: future.cancelled() or future.exception())
+
+
+class SendQueue:
+    def __init__(self, bot: Bot, messages_per_second: float = GLOBAL_MESSAGES_PER_SECOND,
+                 chat_messages_per_second: float = CHAT_MESSAGES_PER_SECOND, chat_burst: int = CHAT_BURST):
+        """
+        נקודת יציאה אחת לכל ההודעות לטלגרם: קצב גלובלי וקצב לכל צ'אט (token buckets),
+        איחוד עריכות רצופות של אותה הודעה, פיצול הודעות ארוכות וטיפול ב-RetryAfter
+        """
+        self.bot = bot
+        self.chat_rate = chat_messages_per_second * 60
+        self.chat_burst = chat_burst
+        self.global_bucket = TokenBucket(messages_per_second * 60, burst=max(1, int(messages_per_second)),
+                                         reserve=INTERACTIVE_RESERVE)
+        self._chat_buckets: Dict[int, TokenBucket] = {}
+        self._pending_edits: Dict[Tuple[int, int], _PendingEdit] = {}
+        self.depth = 0
+        self.max_depth = 0
+        self.sent = 0
+        self.edited = 0
+        self.coalesced = 0
+        self.retries = 0
+        self.failed = 0
+        self._latencies: deque = deque(maxlen=1000)
+
+    def _chat_bucket(self, chat_id: int) -> TokenBucket:
+        bucket = self._chat_buckets.get(chat_id)
+        if bucket is None:
+            if len(self._chat_buckets) >= MAX_IDLE_CHATS:
+                # צ'אטים שה-bucket שלהם מלא לא צריכים לזכור כלום
+                for idle in [chat for chat, b in self._chat_buckets.items() if b.stats()["tokens"] >= b.capacity]:
+                    del self._chat_buckets[idle]
+            bucket = TokenBucket(self.chat_rate, burst=self.chat_burst, reserve=0)
+            self._chat_buckets[chat_id] = bucket
+        return bucket
+
+    async def _acquire(self, chat_id: int, priority: int) -> None:
+        if not await self._chat_bucket(chat_id).acquire(PRIORITY_INTERACTIVE, QUEUE_TIMEOUT):
+            raise RateLimitedError(f"התור לצ'אט {chat_id} עמוס")
+        if not await self.global_bucket.acquire(priority, QUEUE_TIMEOUT):
+            raise RateLimitedError("תור השליחה לטלגרם עמוס")
+
+    async def _call(self, chat_id: int, priority: int, request, enqueued_at: float, acquired: bool = False):
+        """
+        ביצוע בקשה אחת לטלגרם אחרי קבלת tokens, עם המתנה וניסיון חוזר על RetryAfter
+        """
+        for attempt in range(MAX_RETRIES + 1):
+            if not acquired:
+                await self._acquire(chat_id, priority)
+            acquired = False
+            try:
+                with tracer.span("telegram_send", chat_id=chat_id, attempt=attempt,
+                                 queued_seconds=time.monotonic() - enqueued_at):
+                    result = await request()
+                self._latencies.append(time.monotonic() - enqueued_at)
+                return result
+            except RetryAfter as e:
+                if attempt == MAX_RETRIES:
+                    self.failed += 1
+                    raise
+                self.retries += 1
+                self._chat_bucket(chat_id).drain()
+                await asyncio.sleep(e.retry_after)
+
+    async def send(self, chat_id: int, text: str, priority: int = PRIORITY_INTERACTIVE, **kwargs) -> Message:
+        """
+        שליחת הודעה (מפוצלת אם היא ארוכה מ-4096 תווים) - מחזיר את ההודעה הראשונה
+        """
+        enqueued_at = time.monotonic()
+        self.depth += 1
+        self.max_depth = max(self.max_depth, self.depth)
+        try:
+            messages = []
+            for part in split_message(text):
+                messages.append(await self._call(
+                    chat_id, priority, lambda part=part: self.bot.send_message(chat_id, part, **kwargs), enqueued_at
+                ))
+                self.sent += 1
+            return messages[0]
+        finally:
+            self.depth -= 1
+
+    async def edit(self, message: Message, text: str, priority: int = PRIORITY_INTERACTIVE) -> Message:
+        """
+        עריכת הודעה. עריכות נוספות לאותה הודעה שמגיעות בזמן שהראשונה ממתינה בתור
+        מתאחדות - נשלח רק הטקסט האחרון. טקסט ארוך ממשיך בהודעות חדשות.
+        """
+        key = (message.chat_id, message.message_id)
+        pending = self._pending_edits.get(key)
+        if pending is not None:
+            pending.text = text
+            self.coalesced += 1
+            return await asyncio.shield(pending.future)
+
+        enqueued_at = time.monotonic()
+        pending = _PendingEdit(text)
+        self._pending_edits[key] = pending
+        self.depth += 1
+        self.max_depth = max(self.max_depth, self.depth)
+        try:
+            try:
+                await self._acquire(message.chat_id, priority)
+            finally:
+                # מכאן עריכה חדשה כבר לא יכולה להצטרף לבקשה הזו
+                del self._pending_edits[key]
+            parts = split_message(pending.text)
+            result = await self._call(message.chat_id, priority, lambda: self._edit_text(message, parts[0]),
+                                      enqueued_at, acquired=True)
+            self.edited += 1
+            for part in parts[1:]:
+                await self.send(message.chat_id, part, priority)
+            pending.future.set_result(result)
+            return result
+        except asyncio.CancelledError:
+            pending.future.cancel()
+            raise
+        except Exception as e:
+            if not pending.future.done():
+                pending.future.set_exception(e)
+            raise
+        finally:
+            self.depth -= 1
+
+    @staticmethod
+    async def _edit_text(message: Message, text: str) -> Message:
+        try:
+            return await message.edit_text(text)
+        except BadRequest as e:
+            if "not modified" not in str(e).lower():
+                raise
+            return message
+
+    def stats(self) -> Dict:
+        latencies = list(self._latencies)
+        return {
+            "depth": self.depth,
+            "max_depth": self.max_depth,
+            "sent": self.sent,
+            "edited": self.edited,
+            "coalesced": self.coalesced,
+            "retries": self.retries,
+            "failed": self.failed,
+            "latency_p50": _percentile(latencies, 0.5),
+            "latency_p95": _percentile(latencies, 0.95),
+            "chats": len(self._chat_buckets)
+        }
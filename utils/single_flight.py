@@ -0,0 +1,36 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+
+class SingleFlight:
+    def __init__(self):
+        """
+        איחוד בקשות זהות שרצות במקביל - כל הממתינים מקבלים את אותה תוצאה
+        """
+        self._in_flight: Dict[Hashable, asyncio.Task] = {}
+        self.coalesced = 0
+
+    def _on_done(self, key: Hashable, task: asyncio.Task) -> None:
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+        # שליפת החריגה כדי שלא תודפס אזהרה אם כל הממתינים בוטלו
+        if not task.cancelled():
+            task.exception()
+
+    async def do(self, key: Hashable, fetch: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        הרצת fetch פעם אחת לכל מפתח; קריאות נוספות ממתינות לאותה משימה.
+        ביטול של ממתין בודד (למשל בגלל deadline) לא מבטל את הבקשה המשותפת.
+        """
+        task = self._in_flight.get(key)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            task = asyncio.ensure_future(fetch())
+            self._in_flight[key] = task
+            task.add_done_callback(lambda done: self._on_done(key, done))
+
+        return await asyncio.shield(task)
+
+    def in_flight(self) -> int:
+        return len(self._in_flight)
@@ -1,12 +1,19 @@
-from typing import Dict, Optional, Tuple
+from typing import Dict, List, Optional, Tuple
 import os
 import json
-import yfinance as yf
+from utils.lazy_import import lazy_import
+from utils.symbol_index import SymbolIndex
+from utils.ticker_matcher import TickerMatcher
+from utils.tracing import tracer
+
+yf = lazy_import("yfinance")
 
 class StockListManager:
     def __init__(self, config_file: str = "settings/stocks_config.json"):
         self.config_file = config_file
         self.stocks = self._load_stocks()
+        self.matcher = TickerMatcher(self.stocks)
+        self.symbol_index = SymbolIndex()
 
     def _load_stocks(self) -> Dict[str, str]:
         """
@@ -103,23 +110,34 @@ class StockListManager:
         except Exception as e:
             print(f"שגיאה בשמירת רשימת המניות: {e}")
 
-    def add_stock(self, name: str, symbol: str) ->  Tuple[bool, str]:
+    def validate_symbol(self, symbol: str) -> Optional[str]:
         """
-        הוספת מניה חדשה
+        בדיקת תקינות הסימול באמצעות yfinance (קריאת רשת חוסמת) - מחזיר הודעת שגיאה או None
         """
-        name = name.strip()
-        symbol = symbol.strip().upper()
-
-        # בדיקת תקינות הסימול באמצעות yfinance
         try:
-            stock = yf.Ticker(symbol)
+            stock = yf.Ticker(symbol.strip().upper())
             # בדיקה בסיסית שהמניה קיימת
             if stock.info.get('quoteType') is None:
-                return False, "סימול המניה לא נמצא"
+                return "סימול המניה לא נמצא"
         except Exception:
-            return False, "סימול המניה לא תקין"
+            return "סימול המניה לא תקין"
+        return None
+
+    def add_stock(self, name: str, symbol: str, validate: bool = True) -> Tuple[bool, str]:
+        """
+        הוספת מניה חדשה. עדכון ה-matcher לא בטוח לריצה במקביל לחיפושים, ולכן קוראים לפונקציה
+        מה-event loop עם validate=False אחרי שהסימול נבדק ב-executor
+        """
+        name = name.strip()
+        symbol = symbol.strip().upper()
+
+        if validate:
+            error = self.validate_symbol(symbol)
+            if error:
+                return False, error
 
         self.stocks[name] = symbol
+        self.matcher.add(name, symbol)
         self.save_stocks()
         return True, f"המניה {name} ({symbol}) נוספה בהצלחה"
 
@@ -129,6 +147,7 @@ class StockListManager:
         """
         if name in self.stocks:
             symbol = self.stocks.pop(name)
+            self.matcher.remove(name)
             self.save_stocks()
             return True, f"המניה {name} ({symbol}) הוסרה בהצלחה"
         return False, "המניה לא נמצאה ברשימה"
@@ -147,12 +166,26 @@ class StockListManager:
 
     def get_ticker(self, text: str) -> Optional[str]:
         """
-        חיפוש סימול מניה בטקסט
+        חיפוש סימול מניה בטקסט - קודם ברשימת המניות המוכרות, ואז באינדקס כל הסימולים
         """
-        text = text.lower()
-        for name, symbol in self.stocks.items():
-            if name.lower() in text or symbol.lower() in text:
-                return symbol
-        return None
-
+        with tracer.span("resolve_ticker") as span:
+            ticker = self.matcher.find(text)
+            span.set(source="known" if ticker else "index")
+            if not ticker:
+                ticker = self.symbol_index.resolve(text)
+            span.set(ticker=ticker)
+            return ticker
 
+    def get_tickers(self, text: str) -> List[str]:
+        """
+        כל הסימולים שמוזכרים בטקסט, לפי סדר הופעה וללא כפילויות
+        """
+        with tracer.span("resolve_ticker") as span:
+            symbols = list(dict.fromkeys(match.symbol for match in self.matcher.find_all(text)))
+            span.set(source="known" if symbols else "index")
+            if not symbols:
+                fallback = self.symbol_index.resolve(text)
+                if fallback:
+                    symbols.append(fallback)
+            span.set(ticker=",".join(symbols))
+            return symbols
@@ -0,0 +1,373 @@
+import bisect
+import mmap
+import os
+import re
+import struct
+import zlib
+from collections import Counter
+from pathlib import Path
+from typing import Iterable, List, NamedTuple, Optional
+
+# מבנה הקובץ (little-endian):
+#   header:    MAGIC, record_count (u32), gram_count (u32), postings_count (u32)
+#   offsets:   record_count+1 x u32 - מיקום כל רשומה ב-strings (רשומות ממוינות לפי סימול)
+#   names:     record_count x u32 - מזהי רשומות ממוינים לפי שם החברה המנורמל (לחיפוש prefix)
+#   grams:     gram_count x (u32 hash, u32 postings_start, u32 postings_len) ממוינים לפי hash
+#   postings:  u32 מזהי רשומות
+#   strings:   "SYMBOL\x1fNAME\x1fSKELETON\x1fDISPLAY\x1fRANK" לכל רשומה
+MAGIC = b"SYMIDX01"
+HEADER = struct.Struct("<8sIII")
+GRAM_ENTRY = struct.Struct("<III")
+FIELD_SEP = "\x1f"
+
+DEFAULT_INDEX_PATH = "settings/symbol_index.bin"
+
+MIN_SCORE = 0.8
+MIN_QUERY_LENGTH = 3
+MAX_CANDIDATES = 50
+
+# מילים שאינן שמות חברות - מסוננות לפני החיפוש בטקסט חופשי
+STOPWORDS = {
+    "מה", "קורה", "עם", "למה", "של", "את", "על", "זה", "האם", "איך", "כמה", "מתי", "אני", "לי", "רוצה",
+    "לדעת", "תסביר", "ספר", "תגיד", "מניה", "המניה", "מניית", "מניות", "המניות", "חברה", "החברה", "חברת",
+    "היום", "עכשיו", "השבוע", "יורדת", "יורד", "עולה", "עלתה", "ירדה", "נפלה", "קפצה", "מחיר", "חדשות",
+    "כדאי", "לקנות", "למכור", "דוח", "דוחות", "דיבידנד", "רבעון", "מצב", "שוק", "בבורסה", "ככה", "כל", "גם",
+    "what", "whats", "is", "the", "about", "stock", "stocks", "share", "shares", "why", "how", "price",
+    "news", "today", "with", "of", "and", "for", "tell", "me", "up", "down", "going", "on", "happening",
+    "earnings", "dividend", "buy", "sell", "company", "inc", "corp", "good", "bad", "best", "time", "outlook",
+    "think", "should", "will", "this", "that", "does", "can", "now", "next", "week", "year", "long", "term",
+    # מילים כלליות על השוק - גם שמות (או תחילת שמות) של חברות, אבל בשאלה חופשית הן כמעט תמיד מילה רגילה
+    "market", "markets", "gold", "silver", "oil", "gas", "rate", "rates", "interest", "inflation", "low", "high",
+    "higher", "lower", "rising", "falling", "crash", "rally", "investment", "invest", "investing", "money",
+    "bank", "banks", "fed", "economy", "recession", "crypto", "bitcoin", "dollar", "bond", "bonds", "yield",
+    "yields", "sector", "index", "fund", "funds", "growth", "value", "energy", "tech", "future", "futures",
+    "worth", "doing", "it", "go", "are", "there", "they", "their", "all", "any", "more", "most", "much",
+    "זהב", "ריבית", "ריביות", "דולר", "נפט", "אינפלציה", "כלכלה", "מיתון", "השקעה", "בורסה", "מדד",
+}
+
+# מילים באותיות גדולות שהן גם סימולים, אבל בטקסט חופשי הן כמעט תמיד מילה רגילה או קיצור
+TICKER_STOPWORDS = {
+    "A", "I", "AI", "CEO", "CFO", "CTO", "ETF", "IPO", "EPS", "PE", "EV", "ESG", "API", "USA", "US", "USD",
+    "GDP", "CPI", "FED", "SEC", "AM", "PM", "IT", "ON", "OR", "SO", "GO", "BE", "IS", "VS", "OK", "TV",
+    "ALL", "ARE", "CAN", "FOR", "NOW", "NEW", "ONE", "OUT", "BIG", "BUY", "AND", "THE", "YOY", "QOQ", "ATH",
+    "DD", "IMO", "Q1", "Q2", "Q3", "Q4",
+}
+
+# ציון של מילה באותיות גדולות שהיא סימול קיים: גובר על התאמת prefix לשם, לא על התאמה מדויקת לשם
+SYMBOL_WORD_SCORE = 0.95
+# ציון של התאמה מדויקת לשם החברה (כל השם, או המילה הראשונה בו)
+EXACT_NAME_SCORE = 1.0
+
+WORD_PATTERN = re.compile(r"[\w'׳.\-]+")
+CASHTAG_PATTERN = re.compile(r"\$([A-Za-z]{1,5}(?:[.\-][A-Za-z])?)\b")
+
+# סיומות שמות חברות שמוסרות בנרמול
+NAME_NOISE = {
+    "inc", "incorporated", "corp", "corporation", "co", "company", "ltd", "limited", "plc", "holdings",
+    "holding", "group", "the", "sa", "nv", "ag", "se", "lp", "llc", "class", "common", "stock", "shares",
+    "ordinary", "american", "depositary", "ads", "adr", "new",
+}
+
+HEBREW_PREFIXES = set("בהוכלמש")
+
+# שלד פונטי משותף לעברית ולאנגלית: עיצורים בלבד, עם איחוד צלילים שהכתיב העברי לא מבחין ביניהם
+# (ב/ו = b/v/w, פ = p/f, כ/ק = c/k/q, ש/ס = s/sh/ch)
+_HEBREW_SKELETON = {
+    "ב": "b", "ג": "g", "ד": "d", "ז": "z", "ט": "t", "כ": "k", "ך": "k", "ל": "l", "מ": "m", "ם": "m",
+    "נ": "n", "ן": "n", "ס": "s", "פ": "p", "ף": "p", "צ": "s", "ץ": "s", "ק": "k", "ר": "r", "ש": "s",
+    "ת": "t",
+}
+_HEBREW_GERESH = {"ג": "j", "ז": "z", "צ": "s", "ת": "t"}
+
+_ENGLISH_DIGRAPHS = [("sch", "s"), ("ch", "s"), ("sh", "s"), ("ph", "p"), ("th", "t"), ("ck", "k"),
+                     ("qu", "kb"), ("wh", "b"), ("x", "ks")]
+_ENGLISH_SKELETON = {
+    "b": "b", "v": "b", "w": "b", "p": "p", "f": "p", "c": "k", "k": "k", "q": "k", "g": "g", "j": "j",
+    "d": "d", "t": "t", "s": "s", "z": "z", "l": "l", "m": "m", "n": "n", "r": "r",
+}
+
+
+class SymbolEntry(NamedTuple):
+    symbol: str
+    name: str
+    score: float
+
+
+def is_hebrew(text: str) -> bool:
+    return any("א" <= ch <= "ת" for ch in text)
+
+
+def _collapse(skeleton: str) -> str:
+    return re.sub(r"(.)\1+", r"\1", skeleton)
+
+
+def hebrew_skeleton(word: str) -> str:
+    """
+    תעתיק של מילה עברית לשלד עיצורים לטיני
+    """
+    word = word.replace("׳", "'").replace("’", "'")
+    out = []
+    for i, ch in enumerate(word):
+        if ch == "'":
+            continue
+        if ch == "ו" and i + 1 < len(word) and word[i + 1] == "ו":
+            out.append("b")  # "וו" = w/v
+            continue
+        if ch == "ו" and i > 0 and word[i - 1] == "ו":
+            continue
+        if i + 1 < len(word) and word[i + 1] == "'" and ch in _HEBREW_GERESH:
+            out.append(_HEBREW_GERESH[ch])
+            continue
+        out.append(_HEBREW_SKELETON.get(ch, ""))
+    return _collapse("".join(out))
+
+
+def english_skeleton(word: str) -> str:
+    """
+    שלד עיצורים של מילה באנגלית, באותו אלפבית של hebrew_skeleton
+    """
+    word = re.sub(r"[^a-z]", "", word.lower())
+    for digraph, replacement in _ENGLISH_DIGRAPHS:
+        word = word.replace(digraph, replacement.upper())
+    return _collapse("".join(_ENGLISH_SKELETON.get(ch.lower(), "") if ch.islower() else ch.lower()
+                             for ch in word))
+
+
+def normalize_name(name: str) -> str:
+    """
+    נרמול שם חברה: אותיות קטנות, בלי פיסוק ובלי סיומות כמו Inc/Corp
+    """
+    name = name.split(" - ")[0].lower().replace("&", " and ")
+    words = re.findall(r"[a-z0-9]+", name)
+    return " ".join(word for word in words if word not in NAME_NOISE)
+
+
+def name_grams(name: str) -> Iterable[str]:
+    padded = f" {name} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def skeleton_grams(skeleton: str) -> Iterable[str]:
+    padded = f"^{skeleton}$"
+    return {"#" + padded[i:i + 2] for i in range(len(padded) - 1)}
+
+
+def gram_hash(gram: str) -> int:
+    return zlib.crc32(gram.encode("utf-8"))
+
+
+def levenshtein(a: str, b: str) -> int:
+    if len(a) < len(b):
+        a, b = b, a
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+        previous = current
+    return previous[-1]
+
+
+def _similarity(a: str, b: str) -> float:
+    if not a or not b:
+        return 0.0
+    return 1.0 - levenshtein(a, b) / max(len(a), len(b))
+
+
+class SymbolIndex:
+    def __init__(self, index_path: Optional[str] = None):
+        """
+        אינדקס כל הסימולים הנסחרים בארה"ב - קובץ בינארי שנבנה מראש וממופה לזיכרון (mmap)
+        """
+        self.index_path = index_path or os.getenv("SYMBOL_INDEX_PATH", DEFAULT_INDEX_PATH)
+        self._mmap = None
+        self.record_count = 0
+        self.gram_count = 0
+
+        if not Path(self.index_path).exists():
+            return
+        try:
+            with open(self.index_path, "rb") as f:
+                self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            magic, self.record_count, self.gram_count, postings_count = HEADER.unpack_from(self._mmap, 0)
+            if magic != MAGIC:
+                raise ValueError("קובץ אינדקס לא תקין")
+        except Exception as e:
+            print(f"שגיאה בטעינת אינדקס הסימולים: {e}")
+            self._mmap = None
+            self.record_count = 0
+            return
+
+        self._offsets_start = HEADER.size
+        self._names_start = self._offsets_start + (self.record_count + 1) * 4
+        self._grams_start = self._names_start + self.record_count * 4
+        self._postings_start = self._grams_start + self.gram_count * GRAM_ENTRY.size
+        self._strings_start = self._postings_start + postings_count * 4
+
+    @property
+    def available(self) -> bool:
+        return self._mmap is not None
+
+    def _u32(self, offset: int) -> int:
+        return struct.unpack_from("<I", self._mmap, offset)[0]
+
+    def _record(self, record_id: int) -> List[str]:
+        start = self._u32(self._offsets_start + record_id * 4)
+        end = self._u32(self._offsets_start + (record_id + 1) * 4)
+        raw = self._mmap[self._strings_start + start:self._strings_start + end]
+        return raw.decode("utf-8").split(FIELD_SEP)
+
+    def _postings(self, gram: str) -> List[int]:
+        target = gram_hash(gram)
+        lo, hi = 0, self.gram_count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            value, start, length = GRAM_ENTRY.unpack_from(self._mmap, self._grams_start + mid * GRAM_ENTRY.size)
+            if value < target:
+                lo = mid + 1
+            elif value > target:
+                hi = mid
+            else:
+                return list(struct.unpack_from(f"<{length}I", self._mmap, self._postings_start + start * 4))
+        return []
+
+    def _candidates(self, grams: Iterable[str]) -> List[int]:
+        counts = Counter()
+        for gram in grams:
+            counts.update(self._postings(gram))
+        return [record_id for record_id, _ in counts.most_common(MAX_CANDIDATES)]
+
+    def lookup_symbol(self, symbol: str) -> Optional[SymbolEntry]:
+        """
+        חיפוש מדויק של סימול (חיפוש בינארי - הרשומות ממוינות לפי סימול)
+        """
+        if not self.available:
+            return None
+        symbol = symbol.upper().replace(".", "-")
+        lo, hi = 0, self.record_count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            fields = self._record(mid)
+            if fields[0] < symbol:
+                lo = mid + 1
+            elif fields[0] > symbol:
+                hi = mid
+            else:
+                return SymbolEntry(fields[0], fields[3], 1.0)
+        return None
+
+    def _prefix_matches(self, prefix: str) -> List[int]:
+        """
+        רשומות ששם החברה המנורמל שלהן מתחיל ב-prefix
+        """
+        names = _NameView(self)
+        position = bisect.bisect_left(names, prefix)
+        matches = []
+        while position < self.record_count and len(matches) < MAX_CANDIDATES:
+            record_id = self._u32(self._names_start + position * 4)
+            if not self._record(record_id)[1].startswith(prefix):
+                break
+            matches.append(record_id)
+            position += 1
+        return matches
+
+    def search(self, query: str, limit: int = 5) -> List[SymbolEntry]:
+        """
+        חיפוש עמום לפי שם חברה בעברית או באנגלית (prefix ומרחק עריכה)
+        """
+        if not self.available:
+            return []
+
+        scored = {}
+        if is_hebrew(query):
+            skeleton = hebrew_skeleton(query)
+            if len(skeleton) < MIN_QUERY_LENGTH:
+                return []
+            for record_id in self._candidates(skeleton_grams(skeleton)):
+                scored[record_id] = _similarity(skeleton, self._record(record_id)[2])
+        else:
+            name = normalize_name(query)
+            if len(name) < MIN_QUERY_LENGTH:
+                return []
+            for record_id in self._prefix_matches(name):
+                record_name = self._record(record_id)[1]
+                scored[record_id] = EXACT_NAME_SCORE if record_name == name or record_name.split()[0] == name else 0.9
+            for record_id in self._candidates(name_grams(name)):
+                if record_id not in scored:
+                    first_word = self._record(record_id)[1].split(" ")[0]
+                    scored[record_id] = _similarity(name, first_word)
+
+        results = []
+        for record_id, score in scored.items():
+            if score >= MIN_SCORE:
+                symbol, _, _, display, rank = self._record(record_id)
+                results.append((score, -int(rank), -len(symbol), SymbolEntry(symbol, display, score)))
+        results.sort(reverse=True)
+        return [entry for *_, entry in results[:limit]]
+
+    @staticmethod
+    def _looks_like_symbol(word: str) -> bool:
+        """
+        מילה באותיות גדולות (לפחות שתי אותיות) שאינה קיצור נפוץ
+        """
+        return (word.isupper() and word.isascii() and sum(ch.isalpha() for ch in word) >= 2
+                and word not in TICKER_STOPWORDS)
+
+    def resolve(self, text: str) -> Optional[str]:
+        """
+        זיהוי סימול מטקסט חופשי - משמש כגיבוי כשרשימת המניות המוכרות לא מצאה התאמה.
+        רק "$TICKER" נחשב סימול מפורש; מילה באותיות גדולות מתחרה בהתאמות לפי שם החברה.
+        מילה באנגלית מתאימה רק לשם מדויק (לא prefix ולא מרחק עריכה), כדי ש-"market" לא יהפוך ל-MarketAxess;
+        בעברית השם מגיע בתעתיק, ולכן ההתאמה לשלד העיצורים עמומה
+        """
+        if not self.available:
+            return None
+
+        for cashtag in CASHTAG_PATTERN.findall(text):
+            entry = self.lookup_symbol(cashtag)
+            if entry is not None:
+                return entry.symbol
+
+        best = None
+        for word in WORD_PATTERN.findall(text):
+            if self._looks_like_symbol(word):
+                entry = self.lookup_symbol(word)
+                if entry is not None:
+                    if best is None or SYMBOL_WORD_SCORE > best.score:
+                        best = entry._replace(score=SYMBOL_WORD_SCORE)
+                    continue
+
+            word = word.lower().strip("'.-")
+            variants = [word]
+            if is_hebrew(word):
+                # גם בלי אותיות שימוש: "בפלנטיר" -> "פלנטיר"
+                for cut in range(1, 3):
+                    if word[cut - 1] not in HEBREW_PREFIXES or len(word) - cut < MIN_QUERY_LENGTH:
+                        break
+                    variants.append(word[cut:])
+
+            min_score = MIN_SCORE if is_hebrew(word) else EXACT_NAME_SCORE
+            for candidate in variants:
+                if (candidate in STOPWORDS or candidate.upper() in TICKER_STOPWORDS
+                        or len(candidate) < MIN_QUERY_LENGTH):
+                    continue
+                matches = self.search(candidate, limit=1)
+                if matches and matches[0].score >= min_score and (best is None or matches[0].score > best.score):
+                    best = matches[0]
+        return best.symbol if best else None
+
+
+class _NameView:
+    """
+    תצוגה ממוינת של שמות החברות עבור bisect, בלי לטעון את כל השמות לזיכרון
+    """
+
+    def __init__(self, index: SymbolIndex):
+        self._index = index
+
+    def __len__(self) -> int:
+        return self._index.record_count
+
+    def __getitem__(self, position: int) -> str:
+        record_id = self._index._u32(self._index._names_start + position * 4)
+        return self._index._record(record_id)[1]
@@ -0,0 +1,61 @@
+import time
+from typing import List, Optional
+
+from telegram import Message
+
+from utils.send_queue import TELEGRAM_MESSAGE_LIMIT, SendQueue, split_message
+
+STREAM_CURSOR = " ▌"
+
+
+class StreamingReply:
+    def __init__(self, message: Message, outbox: Optional[SendQueue] = None, min_interval: float = 1.0,
+                 min_new_chars: int = 60):
+        """
+        עדכון הדרגתי של הודעת טלגרם בזמן שהתשובה נכתבת.
+        העריכות מרווחות ועוברות בתור השליחה (מגבלות הקצב של טלגרם), ותשובה ארוכה ממשיכה בהודעות נוספות.
+        """
+        self.outbox = outbox or SendQueue(message.get_bot())
+        self.messages = [message]
+        self.min_interval = min_interval
+        self.min_new_chars = min_new_chars
+        self.text = ""
+        self._sent: List[str] = [message.text or ""]
+        self._last_flush = 0.0
+        self._flushed_length = 0
+
+    async def append(self, delta: str) -> None:
+        """
+        הוספת טקסט; ההודעה מתעדכנת רק אם עבר מספיק זמן ונוסף מספיק טקסט
+        """
+        self.text += delta
+        now = time.monotonic()
+        if (now - self._last_flush >= self.min_interval
+                and len(self.text) - self._flushed_length >= self.min_new_chars):
+            await self._flush(STREAM_CURSOR)
+
+    async def finish(self, suffix: str = "") -> None:
+        """
+        כתיבת הגרסה הסופית (כולל suffix) לכל ההודעות
+        """
+        self.text += suffix
+        await self._flush("")
+
+    async def _flush(self, cursor: str) -> None:
+        if not self.text.strip():
+            return
+        parts = split_message(self.text, TELEGRAM_MESSAGE_LIMIT - len(STREAM_CURSOR))
+        parts[-1] += cursor
+
+        for index, part in enumerate(parts):
+            if index < len(self._sent) and self._sent[index] == part:
+                continue
+            if index < len(self.messages):
+                await self.outbox.edit(self.messages[index], part)
+            else:
+                self.messages.append(await self.outbox.send(self.messages[-1].chat_id, part))
+                self._sent.append("")
+            self._sent[index] = part
+
+        self._last_flush = time.monotonic()
+        self._flushed_length = len(self.text)
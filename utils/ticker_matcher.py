@@ -0,0 +1,209 @@
+from typing import Dict, List, NamedTuple, Optional, Set, Tuple
+
+# אותיות שימוש שיכולות להיצמד לתחילת שם בעברית ("באפל", "שלטסלה", "ובנבידיה")
+HEBREW_PREFIXES = set("בהוכלמש")
+MAX_HEBREW_PREFIX = 3
+
+# סימולים קצרים מזה חייבים להופיע באותיות גדולות כדי שלא יזוהו בתוך מילים רגילות
+MIN_CASE_INSENSITIVE_SYMBOL = 3
+
+# איחוד גרשיים ומקפים לצורה אחת - המרה תו-לתו כדי שהאינדקסים יישארו זהים לטקסט המקורי
+_CHAR_MAP = str.maketrans({"׳": "'", "’": "'", "`": "'", "״": '"', "–": "-", "־": "-"})
+
+PatternKey = Tuple[str, str]  # (kind, normalized text) - kind הוא "alias" או "symbol"
+
+
+class TickerMatch(NamedTuple):
+    start: int
+    end: int
+    symbol: str
+    kind: str
+
+
+def _normalize(text: str) -> str:
+    lowered = text.translate(_CHAR_MAP).lower()
+    if len(lowered) == len(text):
+        return lowered
+    # תווים שה-lower שלהם ארוך יותר (למשל İ) נשארים כמו שהם
+    return "".join(ch.lower() if len(ch.lower()) == 1 else ch for ch in text.translate(_CHAR_MAP))
+
+
+def _is_word_char(ch: str) -> bool:
+    return ch.isalnum()
+
+
+def _is_hebrew(ch: str) -> bool:
+    return "\u05d0" <= ch <= "\u05ea"
+
+
+class TickerMatcher:
+    def __init__(self, aliases: Optional[Dict[str, str]] = None):
+        """
+        זיהוי שמות וסימולים של מניות בטקסט במעבר אחד (Aho-Corasick)
+        """
+        self._goto: List[Dict[str, int]] = [{}]
+        self._terminal: List[Set[PatternKey]] = [set()]
+        self._fail: List[int] = [0]
+        self._dict_link: List[int] = [0]
+        self._patterns: Dict[PatternKey, str] = {}
+        self._aliases: Dict[str, str] = {}
+        self._symbol_refs: Dict[str, int] = {}
+        self._dirty = False
+
+        for name, symbol in (aliases or {}).items():
+            self.add(name, symbol)
+
+    def _insert(self, key: PatternKey, symbol: str) -> None:
+        node = 0
+        for ch in key[1]:
+            next_node = self._goto[node].get(ch)
+            if next_node is None:
+                next_node = len(self._goto)
+                self._goto[node][ch] = next_node
+                self._goto.append({})
+                self._terminal.append(set())
+            node = next_node
+        self._terminal[node].add(key)
+        self._patterns[key] = symbol
+        self._dirty = True
+
+    def _discard(self, key: PatternKey) -> None:
+        path = [0]
+        for ch in key[1]:
+            path.append(self._goto[path[-1]][ch])
+        self._terminal[path[-1]].discard(key)
+        del self._patterns[key]
+
+        # ניתוק הענף שנשאר בלי תבניות; הצמתים עצמם מתפנים בבנייה הבאה
+        for depth in range(len(key[1]), 0, -1):
+            node = path[depth]
+            if self._goto[node] or self._terminal[node]:
+                break
+            del self._goto[path[depth - 1]][key[1][depth - 1]]
+        self._dirty = True
+
+    def add(self, name: str, symbol: str) -> None:
+        """
+        הוספת כינוי למניה. ה-failure links מחושבים מחדש לכל העץ בחיפוש הבא (BFS אחד - זול בגודל הרשימה)
+        """
+        alias = _normalize(name.strip())
+        symbol = symbol.strip().upper()
+        if not alias:
+            return
+        if alias in self._aliases:
+            self.remove(name)
+
+        self._aliases[alias] = symbol
+        self._insert(("alias", alias), symbol)
+
+        self._symbol_refs[symbol] = self._symbol_refs.get(symbol, 0) + 1
+        if self._symbol_refs[symbol] == 1:
+            self._insert(("symbol", _normalize(symbol)), symbol)
+
+    def remove(self, name: str) -> None:
+        """
+        הסרת כינוי; הסימול עצמו מוסר רק כשאין לו יותר כינויים
+        """
+        alias = _normalize(name.strip())
+        symbol = self._aliases.pop(alias, None)
+        if symbol is None:
+            return
+        self._discard(("alias", alias))
+
+        self._symbol_refs[symbol] -= 1
+        if self._symbol_refs[symbol] == 0:
+            del self._symbol_refs[symbol]
+            self._discard(("symbol", _normalize(symbol)))
+
+    def _build(self) -> None:
+        """
+        חישוב failure links ו-dictionary links (BFS) - רץ רק אחרי שינוי בעץ
+        """
+        # מספור מחדש לפי סדר BFS של הצמתים שעדיין מחוברים לשורש - צמתים של כינויים שהוסרו לא נשמרים
+        order = [0]
+        renumber = {0: 0}
+        for node in order:
+            for child in self._goto[node].values():
+                renumber[child] = len(order)
+                order.append(child)
+        self._goto = [{ch: renumber[child] for ch, child in self._goto[node].items()} for node in order]
+        self._terminal = [self._terminal[node] for node in order]
+
+        size = len(self._goto)
+        self._fail = [0] * size
+        self._dict_link = [0] * size
+
+        # המספור החדש הוא בסדר BFS, כך שה-failure link של ההורה כבר מחושב
+        for node in range(1, size):
+            for ch, child in self._goto[node].items():
+                fallback = self._fail[node]
+                while fallback and ch not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[child] = self._goto[fallback].get(ch, 0)
+                fail_node = self._fail[child]
+                self._dict_link[child] = fail_node if self._terminal[fail_node] else self._dict_link[fail_node]
+
+        self._dirty = False
+
+    @staticmethod
+    def _alias_start_ok(text: str, start: int, alias: str) -> bool:
+        if start == 0 or not _is_word_char(text[start - 1]):
+            return True
+        if not _is_hebrew(alias[0]):
+            return False
+        # מאפשר עד שלוש אותיות שימוש בתחילת המילה
+        pos = start
+        while pos > 0 and start - pos < MAX_HEBREW_PREFIX and text[pos - 1] in HEBREW_PREFIXES:
+            pos -= 1
+        return pos < start and (pos == 0 or not _is_word_char(text[pos - 1]))
+
+    def _accept(self, original: str, text: str, start: int, end: int, key: PatternKey) -> bool:
+        kind, pattern = key
+        if end < len(text) and _is_word_char(text[end]):
+            return False
+        if kind == "symbol":
+            if start > 0 and _is_word_char(text[start - 1]):
+                return False
+            if len(pattern) < MIN_CASE_INSENSITIVE_SYMBOL:
+                return original[start:end] == self._patterns[key]
+            return True
+        return self._alias_start_ok(text, start, pattern)
+
+    def find_all(self, text: str) -> List[TickerMatch]:
+        """
+        כל ההתאמות בטקסט לפי סדר הופעה; בהתאמות חופפות - הארוכה ביותר מנצחת
+        """
+        if self._dirty:
+            self._build()
+
+        normalized = _normalize(text)
+        candidates = []
+        node = 0
+        for i, ch in enumerate(normalized):
+            while node and ch not in self._goto[node]:
+                node = self._fail[node]
+            node = self._goto[node].get(ch, 0)
+
+            out = node if self._terminal[node] else self._dict_link[node]
+            while out:
+                for key in self._terminal[out]:
+                    start = i + 1 - len(key[1])
+                    if self._accept(text, normalized, start, i + 1, key):
+                        candidates.append(TickerMatch(start, i + 1, self._patterns[key], key[0]))
+                out = self._dict_link[out]
+
+        candidates.sort(key=lambda match: (match.start, match.start - match.end))
+        matches = []
+        last_end = 0
+        for match in candidates:
+            if match.start >= last_end:
+                matches.append(match)
+                last_end = match.end
+        return matches
+
+    def find(self, text: str) -> Optional[str]:
+        """
+        הסימול של ההתאמה הראשונה בטקסט
+        """
+        matches = self.find_all(text)
+        return matches[0].symbol if matches else None
@@ -0,0 +1,188 @@
+import contextvars
+import itertools
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Iterator, List, Optional
+
+from utils.lazy_import import lazy_import
+
+np = lazy_import("numpy")
+
+# שלבים שמייצגים קריאה לשירות חיצוני - מהם מחושב שיעור השגיאות של כל שירות
+UPSTREAM_STAGES = {
+    "stock_info": "yahoo",
+    "stock_quotes": "yahoo",
+    "fetch_news": "alpha_vantage",
+    "openai": "openai",
+    "telegram_send": "telegram",
+}
+PERCENTILES = (0.5, 0.95, 0.99)
+
+_trace_ids = itertools.count(1)
+_current_trace: contextvars.ContextVar = contextvars.ContextVar("trace_id", default=0)
+
+
+class Span:
+    __slots__ = ("stage", "trace_id", "started_at", "duration", "error", "attributes")
+
+    def __init__(self, stage: str, trace_id: int, attributes: Dict[str, Any]):
+        self.stage = stage
+        self.trace_id = trace_id
+        self.started_at = time.time()
+        self.duration = 0.0
+        self.error = False
+        self.attributes = attributes
+
+    def set(self, **attributes) -> None:
+        self.attributes.update(attributes)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {"stage": self.stage, "trace_id": self.trace_id, "started_at": self.started_at,
+                "duration": self.duration, "error": self.error, **self.attributes}
+
+
+class Tracer:
+    def __init__(self, capacity: int = 4096, samples_per_stage: int = 2048):
+        """
+        מדידת זמנים לכל שלב בטיפול בבקשה: הספאנים האחרונים נשמרים ב-ring buffer,
+        ולכל שלב נשמרים הזמנים האחרונים לחישוב אחוזונים
+        """
+        self.spans: deque = deque(maxlen=capacity)
+        self.samples_per_stage = samples_per_stage
+        self._durations: Dict[str, deque] = defaultdict(lambda: deque(maxlen=self.samples_per_stage))
+        self.counts: Dict[str, int] = defaultdict(int)
+        self.errors: Dict[str, int] = defaultdict(int)
+        self.totals: Dict[str, float] = defaultdict(float)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def start_trace() -> int:
+        """
+        מזהה חדש לבקשה - כל הספאנים שנפתחים ממנה (גם במשימות asyncio שנוצרות ממנה) נושאים אותו
+        """
+        trace_id = next(_trace_ids)
+        _current_trace.set(trace_id)
+        return trace_id
+
+    @contextmanager
+    def span(self, stage: str, **attributes) -> Iterator[Span]:
+        span = Span(stage, _current_trace.get(), attributes)
+        started = time.perf_counter()
+        try:
+            yield span
+        except GeneratorExit:
+            raise  # צרכן שהפסיק לקרוא מ-generator אינו שגיאה
+        except BaseException:
+            span.error = True
+            raise
+        finally:
+            span.duration = time.perf_counter() - started
+            self.record(span)
+
+    def record(self, span: Span) -> None:
+        with self._lock:
+            self.spans.append(span)
+            self._durations[span.stage].append(span.duration)
+            self.counts[span.stage] += 1
+            self.totals[span.stage] += span.duration
+            if span.error:
+                self.errors[span.stage] += 1
+
+    def recent(self, limit: int = 50, stage: Optional[str] = None) -> List[Dict[str, Any]]:
+        with self._lock:
+            spans = [span for span in self.spans if stage is None or span.stage == stage]
+        return [span.as_dict() for span in spans[-limit:]]
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """
+        לכל שלב: מספר ספאנים, שיעור שגיאות ואחוזוני זמן (על הדגימות האחרונות)
+        """
+        with self._lock:
+            samples = {stage: np.fromiter(durations, dtype=float) for stage, durations in self._durations.items()}
+            counts, errors = dict(self.counts), dict(self.errors)
+        result = {}
+        for stage, durations in sorted(samples.items()):
+            quantiles = np.quantile(durations, PERCENTILES) if len(durations) else np.zeros(len(PERCENTILES))
+            result[stage] = {
+                "count": counts.get(stage, 0),
+                "errors": errors.get(stage, 0),
+                "error_rate": errors.get(stage, 0) / max(counts.get(stage, 0), 1),
+                "p50": float(quantiles[0]),
+                "p95": float(quantiles[1]),
+                "p99": float(quantiles[2]),
+            }
+        return result
+
+    def upstream_error_rates(self) -> Dict[str, float]:
+        calls: Dict[str, int] = defaultdict(int)
+        failures: Dict[str, int] = defaultdict(int)
+        with self._lock:
+            for stage, upstream in UPSTREAM_STAGES.items():
+                calls[upstream] += self.counts.get(stage, 0)
+                failures[upstream] += self.errors.get(stage, 0)
+        return {upstream: failures[upstream] / calls[upstream] for upstream in calls if calls[upstream]}
+
+    def openmetrics(self) -> str:
+        """
+        ייצוא בפורמט OpenMetrics (summary לכל שלב + מונה שגיאות)
+        """
+        stats = self.stats()
+        with self._lock:
+            totals = dict(self.totals)
+        lines = [
+            "# TYPE stockybot_stage_duration_seconds summary",
+            "# UNIT stockybot_stage_duration_seconds seconds",
+            "# HELP stockybot_stage_duration_seconds Duration of each request stage.",
+        ]
+        for stage, values in stats.items():
+            for quantile, key in zip(PERCENTILES, ("p50", "p95", "p99")):
+                lines.append(f'stockybot_stage_duration_seconds{{stage="{stage}",quantile="{quantile}"}} {values[key]:.6f}')
+            lines.append(f'stockybot_stage_duration_seconds_sum{{stage="{stage}"}} {totals.get(stage, 0.0):.6f}')
+            lines.append(f'stockybot_stage_duration_seconds_count{{stage="{stage}"}} {values["count"]}')
+        lines += [
+            "# TYPE stockybot_stage_errors counter",
+            "# HELP stockybot_stage_errors Failed spans per stage.",
+        ]
+        for stage, values in stats.items():
+            lines.append(f'stockybot_stage_errors_total{{stage="{stage}"}} {values["errors"]}')
+        lines.append("# EOF")
+        return "\n".join(lines) + "\n"
+
+
+tracer = Tracer()
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?", 1)[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = tracer.openmetrics().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/openmetrics-text; version=1.0.0; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_metrics_server(port: Optional[int] = None) -> Optional[ThreadingHTTPServer]:
+    """
+    שרת HTTP קטן (thread ברקע) שמגיש /metrics; פועל רק אם הוגדר METRICS_PORT
+    """
+    port = port if port is not None else int(os.getenv("METRICS_PORT", "0"))
+    if not port:
+        return None
+    try:
+        server = ThreadingHTTPServer((os.getenv("METRICS_HOST", "127.0.0.1"), port), _MetricsHandler)
+    except OSError as e:
+        print(f"שגיאה בהפעלת שרת המדדים על פורט {port}: {e}")
+        return None
+    threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+    return server
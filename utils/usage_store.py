@@ -0,0 +1,170 @@
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import date
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+# הזמנה שלא נסגרה (למשל תהליך שקרס באמצע קריאה ל-GPT) משתחררת אחרי הזמן הזה
+RESERVATION_TTL = 10 * 60
+
+
+def _today() -> str:
+    return date.today().isoformat()
+
+
+class UsageStore:
+    def __init__(self, db_path: Optional[str] = None, reservation_ttl: float = RESERVATION_TTL):
+        """
+        יומן שימוש (append-only) ב-SQLite (WAL), משותף לכל תהליכי הבוט ושורד הפעלה מחדש.
+        כל פעולה נרשמת ביומן ומעדכנת באותה טרנזקציה את הסיכום היומי של המשתמש,
+        כך שבדיקת התקציב היא קריאה של שורה אחת.
+        הכתיבות (reserve/commit/release/add) חוסמות עד timeout וצריכות לרוץ מחוץ ל-event loop;
+        הקריאות משתמשות בחיבור נפרד ולא ממתינות לכותבים (WAL).
+        """
+        self.db_path = db_path or os.getenv("USAGE_DB_PATH", "data/usage.db")
+        self.reservation_ttl = reservation_ttl
+        Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False, isolation_level=None, timeout=10)
+        self._write_lock = threading.Lock()
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS ledger (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id TEXT NOT NULL,
+                day TEXT NOT NULL,
+                action TEXT NOT NULL,
+                amount REAL NOT NULL,
+                reservation_id INTEGER,
+                created_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS reservations (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id TEXT NOT NULL,
+                day TEXT NOT NULL,
+                amount REAL NOT NULL,
+                status TEXT NOT NULL,
+                created_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS reservations_open ON reservations (user_id, status);
+            CREATE TABLE IF NOT EXISTS daily_usage (
+                user_id TEXT NOT NULL,
+                day TEXT NOT NULL,
+                committed REAL NOT NULL DEFAULT 0,
+                reserved REAL NOT NULL DEFAULT 0,
+                PRIMARY KEY (user_id, day)
+            );
+            """
+        )
+        self._reader = sqlite3.connect(self.db_path, check_same_thread=False, isolation_level=None, timeout=10)
+
+    @contextmanager
+    def _transaction(self):
+        """
+        טרנזקציה עם נעילת כתיבה מיידית - בדיקה ועדכון אטומיים גם בין תהליכים
+        """
+        with self._write_lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._conn
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    @staticmethod
+    def _record(conn, user_id: str, day: str, action: str, amount: float, reservation_id: Optional[int] = None,
+                committed: float = 0.0, reserved: float = 0.0) -> None:
+        conn.execute(
+            "INSERT INTO ledger (user_id, day, action, amount, reservation_id, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+            (user_id, day, action, amount, reservation_id, time.time())
+        )
+        conn.execute(
+            """
+            INSERT INTO daily_usage (user_id, day, committed, reserved) VALUES (?, ?, ?, ?)
+            ON CONFLICT(user_id, day) DO UPDATE SET committed = committed + excluded.committed,
+                                                     reserved = max(0, reserved + excluded.reserved)
+            """,
+            (user_id, day, committed, reserved)
+        )
+
+    def _close_reservation(self, conn, reservation_id: int, status: str, actual_cost: float = 0.0) -> bool:
+        row = conn.execute(
+            "SELECT user_id, day, amount FROM reservations WHERE id = ? AND status = 'open'", (reservation_id,)
+        ).fetchone()
+        if row is None:
+            return False
+        user_id, day, amount = row
+        conn.execute("UPDATE reservations SET status = ? WHERE id = ?", (status, reservation_id))
+        # העלות בפועל נרשמת ביום של ההזמנה, כדי שהסיכום היומי יישאר עקבי גם בחצות
+        self._record(conn, user_id, day, status, actual_cost if status == "committed" else amount,
+                     reservation_id, committed=actual_cost, reserved=-amount)
+        return True
+
+    def _expire(self, conn, user_id: str) -> None:
+        stale = conn.execute(
+            "SELECT id FROM reservations WHERE user_id = ? AND status = 'open' AND created_at < ?",
+            (user_id, time.time() - self.reservation_ttl)
+        ).fetchall()
+        for (reservation_id,) in stale:
+            self._close_reservation(conn, reservation_id, "expired")
+
+    def get(self, user_id: str) -> Tuple[float, float]:
+        """
+        העלות שנצברה היום והסכום השמור להזמנות פתוחות
+        """
+        row = self._reader.execute(
+            "SELECT committed, reserved FROM daily_usage WHERE user_id = ? AND day = ?", (user_id, _today())
+        ).fetchone()
+        return (row[0], row[1]) if row else (0.0, 0.0)
+
+    def reserve(self, user_id: str, amount: float, daily_limit: float) -> Optional[int]:
+        """
+        שמירת העלות המשוערת מתוך התקציב היומי - מחזיר מזהה הזמנה, או None אם אין מספיק תקציב
+        """
+        day = _today()
+        with self._transaction() as conn:
+            self._expire(conn, user_id)
+            row = conn.execute(
+                "SELECT committed, reserved FROM daily_usage WHERE user_id = ? AND day = ?", (user_id, day)
+            ).fetchone()
+            committed, reserved = row or (0.0, 0.0)
+            if committed + reserved + amount > daily_limit + 1e-9:
+                return None
+            reservation_id = conn.execute(
+                "INSERT INTO reservations (user_id, day, amount, status, created_at) VALUES (?, ?, ?, 'open', ?)",
+                (user_id, day, amount, time.time())
+            ).lastrowid
+            self._record(conn, user_id, day, "reserved", amount, reservation_id, reserved=amount)
+            return reservation_id
+
+    def commit(self, reservation_id: int, actual_cost: float) -> bool:
+        """
+        סגירת הזמנה עם העלות בפועל (יכולה להיות גבוהה או נמוכה מההערכה)
+        """
+        with self._transaction() as conn:
+            return self._close_reservation(conn, reservation_id, "committed", actual_cost)
+
+    def release(self, reservation_id: int) -> bool:
+        """
+        ביטול הזמנה שלא נוצלה (למשל שגיאה בקריאה ל-GPT)
+        """
+        with self._transaction() as conn:
+            return self._close_reservation(conn, reservation_id, "released")
+
+    def daily_totals(self, day: Optional[str] = None) -> Dict[str, float]:
+        """
+        העלות של כל המשתמשים ביום מסוים (ברירת מחדל: היום)
+        """
+        rows = self._reader.execute(
+            "SELECT user_id, committed FROM daily_usage WHERE day = ?", (day or _today(),)
+        ).fetchall()
+        return dict(rows)
+
+    def close(self) -> None:
+        self._reader.close()
+        self._conn.close()
@@ -0,0 +1,109 @@
+import os
+import sqlite3
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+from utils.lazy_import import lazy_import
+
+pd = lazy_import("pandas")
+
+# סוגי התראות: מחיר מעל / מתחת לסף, תנועה יומית באחוזים, ידיעות חדשות
+ALERT_KINDS = ("above", "below", "move", "news")
+SUBSCRIPTION_COLUMNS = ["id", "user_id", "chat_id", "ticker", "kind", "threshold", "triggered"]
+
+
+class WatchlistStore:
+    def __init__(self, db_path: Optional[str] = None):
+        """
+        רשימות מעקב והתראות של המשתמשים ב-SQLite (WAL) - משותף לכל תהליכי הבוט.
+        triggered שומר אם התנאי כבר התקיים בסבב הקודם, כך שנשלחים רק שינויים.
+        """
+        self.db_path = db_path or os.getenv("WATCHLIST_DB_PATH", "data/watchlists.db")
+        Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False, isolation_level=None, timeout=10)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS subscriptions (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id TEXT NOT NULL,
+                chat_id INTEGER NOT NULL,
+                ticker TEXT NOT NULL,
+                kind TEXT NOT NULL,
+                threshold REAL NOT NULL DEFAULT 0,
+                triggered INTEGER NOT NULL DEFAULT 0,
+                created_at REAL NOT NULL,
+                UNIQUE (user_id, ticker, kind, threshold)
+            );
+            CREATE INDEX IF NOT EXISTS subscriptions_ticker ON subscriptions (ticker);
+            CREATE TABLE IF NOT EXISTS news_cursors (
+                ticker TEXT PRIMARY KEY,
+                last_published TEXT NOT NULL
+            );
+            """
+        )
+
+    def add(self, user_id: str, chat_id: int, ticker: str, kind: str, threshold: float = 0.0) -> bool:
+        """
+        הוספת התראה - False אם בדיוק אותה התראה כבר קיימת
+        """
+        cursor = self._conn.execute(
+            "INSERT OR IGNORE INTO subscriptions (user_id, chat_id, ticker, kind, threshold, created_at) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (user_id, chat_id, ticker.upper(), kind, threshold, time.time())
+        )
+        return cursor.rowcount > 0
+
+    def remove(self, user_id: str, ticker: str) -> int:
+        """
+        הסרת כל ההתראות של המשתמש על מניה
+        """
+        cursor = self._conn.execute(
+            "DELETE FROM subscriptions WHERE user_id = ? AND ticker = ?", (user_id, ticker.upper())
+        )
+        return cursor.rowcount
+
+    def user_subscriptions(self, user_id: str) -> List[Dict]:
+        rows = self._conn.execute(
+            "SELECT ticker, kind, threshold FROM subscriptions WHERE user_id = ? ORDER BY ticker, kind, threshold",
+            (user_id,)
+        ).fetchall()
+        return [{"ticker": ticker, "kind": kind, "threshold": threshold} for ticker, kind, threshold in rows]
+
+    def subscriptions(self) -> "pd.DataFrame":
+        """
+        כל ההתראות כטבלה אחת - לבדיקה וקטורית בכל סבב
+        """
+        rows = self._conn.execute(f"SELECT {', '.join(SUBSCRIPTION_COLUMNS)} FROM subscriptions").fetchall()
+        frame = pd.DataFrame(rows, columns=SUBSCRIPTION_COLUMNS)
+        frame["threshold"] = frame["threshold"].astype(float)
+        frame["triggered"] = frame["triggered"].astype(bool)
+        return frame
+
+    def set_triggered(self, ids: Iterable[int], triggered: bool) -> None:
+        """
+        עדכון מצב של כל ההתראות שהשתנו בסבב - בטרנזקציה אחת
+        """
+        self._conn.execute("BEGIN")
+        try:
+            self._conn.executemany(
+                "UPDATE subscriptions SET triggered = ? WHERE id = ?", ((int(triggered), int(i)) for i in ids)
+            )
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+        self._conn.execute("COMMIT")
+
+    def news_cursor(self, ticker: str) -> Optional[str]:
+        row = self._conn.execute("SELECT last_published FROM news_cursors WHERE ticker = ?", (ticker,)).fetchone()
+        return row[0] if row else None
+
+    def set_news_cursor(self, ticker: str, last_published: str) -> None:
+        self._conn.execute(
+            "INSERT OR REPLACE INTO news_cursors (ticker, last_published) VALUES (?, ?)", (ticker, last_published)
+        )
+
+    def close(self) -> None:
+        self._conn.close()